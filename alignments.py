@@ -0,0 +1,176 @@
+"""
+Curation of alt locus alignments downloaded from NCBI.
+
+NCBI provides one GFF file for every alt locus (named by the GenBank
+accession of the alt locus, e.g. KI270824.1_...gff). The first alignment
+record of each file is written to <out_dir>/<alt locus id>.alignment on the
+format used by merge_alt_using_cigar:
+
+    main start,main end,alt start,alt end,cigar
+
+(coordinates as in the GFF, 1-based with inclusive end). Files are read line
+by line (only until the first record) in a pool of worker processes, and the
+lengths of the cigar are checked against the coordinates and against the
+sequence lengths in the chrom sizes file. Files with invalid or no
+alignments are reported and not written.
+"""
+
+import glob
+import os
+import sys
+
+
+def read_chrom_sizes(chrom_sizes_file_name):
+    """
+    :return: dict{sequence id: length}
+    """
+    sizes = {}
+    with open(chrom_sizes_file_name) as f:
+        for line in f:
+            columns = line.split()
+            if columns:
+                sizes[columns[0]] = int(columns[1])
+    return sizes
+
+
+def alt_ids_by_accession(sizes):
+    """
+    :return: dict{accession (e.g. KI270824v1): alt locus id (e.g. chr10_KI270824v1_alt)}
+    """
+    return {name.split("_")[1]: name for name in sizes if "alt" in name}
+
+
+def accession_from_file_name(file_name):
+    # KI270824.1_... .gff -> KI270824v1
+    return os.path.basename(file_name).replace("gff", "").split("_")[0].replace(".", "v")
+
+
+def _attributes(column):
+    attributes = {}
+    for attribute in column.split(";"):
+        if "=" in attribute:
+            key, value = attribute.split("=", 1)
+            attributes[key.strip()] = value
+    return attributes
+
+
+def parse_alignment_gff(lines):
+    """
+    :param lines: Lines of an NCBI alignment GFF
+    :return: (main start, main end, alt start, alt end, cigar) of the first
+        alignment record, or None if there is no alignment
+    """
+    for line in lines:
+        if line.startswith("#") or not line.strip():
+            continue
+        columns = line.rstrip("\n").split("\t")
+        attributes = _attributes(columns[8])
+        if "Gap" not in attributes or "Target" not in attributes:
+            return None
+        target = attributes["Target"].split()
+        cigar = attributes["Gap"].split("#")[0].strip()
+        return (int(columns[3]), int(columns[4]),
+                int(target[1]), int(target[2]), cigar)
+    return None
+
+
+def validate_alignment(alignment, main_chr, alt_id, sizes):
+    """
+    :return: Error message, or None if the alignment is valid
+    """
+    from offsetbasedgraph.cigar_align import cigar_lens
+    from sequencestore import parse_cigar
+    main_start, main_end, alt_start, alt_end, cigar = alignment
+    try:
+        main_length, alt_length = cigar_lens(parse_cigar(cigar))
+    except ValueError as e:
+        return str(e)
+    if main_length != main_end - main_start + 1:
+        return "cigar length on main (%d) does not match %d-%d" % (
+            main_length, main_start, main_end)
+    if alt_length != alt_end - alt_start + 1:
+        return "cigar length on alt (%d) does not match %d-%d" % (
+            alt_length, alt_start, alt_end)
+    if main_start < 1 or main_end > sizes.get(main_chr, 0):
+        return "%d-%d is outside %s" % (main_start, main_end, main_chr)
+    if alt_start < 1 or alt_end > sizes[alt_id]:
+        return "%d-%d is outside %s" % (alt_start, alt_end, alt_id)
+    return None
+
+
+def curate_file(file_name, sizes, alt_ids):
+    """
+    :param sizes: dict from read_chrom_sizes
+    :param alt_ids: dict from alt_ids_by_accession
+    :return: (alt locus id, alignment line or None, error message or None)
+    """
+    accession = accession_from_file_name(file_name)
+    alt_id = alt_ids.get(accession)
+    if alt_id is None:
+        return accession, None, "not in chrom sizes"
+
+    with open(file_name) as f:
+        alignment = parse_alignment_gff(f)
+    if alignment is None:
+        return alt_id, None, "no alignments"
+
+    error = validate_alignment(alignment, alt_id.split("_")[0], alt_id, sizes)
+    if error is not None:
+        return alt_id, None, error
+    return alt_id, "%d,%d,%d,%d,%s" % alignment, None
+
+
+_worker_state = {}
+
+
+def _init_worker(sizes):
+    _worker_state["sizes"] = sizes
+    _worker_state["alt_ids"] = alt_ids_by_accession(sizes)
+
+
+def _curate_file_task(file_name):
+    return curate_file(file_name, _worker_state["sizes"],
+                       _worker_state["alt_ids"])
+
+
+def _write_alignments(file_names, results, out_dir):
+    # Writes alignment file for each result from curate_file, and removes
+    # files (from earlier runs) of alt loci that are skipped.
+    # Returns number of alignments written
+    n_written = 0
+    for file_name, (alt_id, line, error) in zip(file_names, results):
+        out_file_name = os.path.join(out_dir, "%s.alignment" % alt_id)
+        if error is not None:
+            sys.stderr.write("Skipping %s (%s): %s\n" % (file_name, alt_id, error))
+            if os.path.isfile(out_file_name):
+                os.remove(out_file_name)
+                sys.stderr.write("Removed %s\n" % out_file_name)
+            continue
+        with open(out_file_name, "w") as f:
+            f.write(line + "\n")
+        print("%s,%s" % (alt_id, line.rsplit(",", 1)[0]))
+        n_written += 1
+    return n_written
+
+
+def curate_alignment_files(args):
+    sizes = read_chrom_sizes(args.chrom_sizes_file_name)
+    file_names = sorted(glob.glob(os.path.join(args.gff_dir, "*.gff")))
+    if not os.path.isdir(args.out_dir):
+        os.makedirs(args.out_dir)
+
+    if args.processes > 1:
+        import multiprocessing
+        # Workers are terminated when leaving the with block (e.g. if
+        # writing an alignment fails)
+        with multiprocessing.Pool(args.processes, _init_worker, (sizes,)) as pool:
+            n_written = _write_alignments(
+                file_names, pool.imap(_curate_file_task, file_names), args.out_dir)
+            pool.close()
+            pool.join()
+    else:
+        _init_worker(sizes)
+        n_written = _write_alignments(
+            file_names, map(_curate_file_task, file_names), args.out_dir)
+    sys.stderr.write("Wrote %d of %d alignments to %s\n" %
+                     (n_written, len(file_names), args.out_dir))
@@ -0,0 +1,338 @@
+"""
+Compact array-backed alternative to offsetbasedgraph's Translation.
+
+A Translation stores, for every region path, a list of Interval objects
+(one Python object per piece). ArrayTranslation stores each direction as
+sorted integer arrays with one row per piece:
+
+    source block, alternative, source offset, target block, target offset
+
+where alternative numbers the intervals a block is translated to, and the
+source offset is where the piece starts in the source block. Block ids are
+interned in a sorted names table. Rows are sorted by (source block, alternative,
+source offset), so a position is translated with binary searches.
+
+translate_position, translate_interval and translate give the same results
+as Translation. The graphs are stored as arrays too, and Graph objects are
+only created if graph1/graph2 are used.
+"""
+
+import numpy as np
+
+FIELDS = ("src_block", "alt", "src_offset", "tgt_block", "tgt_offset")
+ZIP_MAGIC = b"PK"
+
+
+def load_translation(file_name):
+    """
+    Read Translation (pickle, or segmented file from create_graph --segmented)
+    or ArrayTranslation (npz) from file
+    """
+    from segmentedgraph import is_segmented_file, read_segmented_graph
+    with open(file_name, "rb") as f:
+        magic = f.read(len(ZIP_MAGIC))
+    if magic == ZIP_MAGIC:
+        return ArrayTranslation.from_file(file_name)
+    if is_segmented_file(file_name):
+        return read_segmented_graph(file_name)
+    from offsetbasedgraph import Translation
+    return Translation.from_file(file_name)
+
+
+class _Direction(object):
+    """Piece arrays for one direction of the translation"""
+
+    def __init__(self, arrays, n_names):
+        self.arrays = arrays
+        for field in FIELDS:
+            setattr(self, field, arrays[field])
+        # First row and end offset (in last target block) of each group,
+        # where a group is one alternative for one source block
+        new_group = np.ones(len(self.src_block), dtype=bool)
+        new_group[1:] = (np.diff(self.src_block) != 0) | (np.diff(self.alt) != 0)
+        self.group_starts = np.append(np.flatnonzero(new_group),
+                                      len(self.src_block))
+        self.group_end_offsets = arrays["group_end_offsets"]
+        group_blocks = self.src_block[self.group_starts[:-1]]
+        # Groups of block b are block_groups[b]:block_groups[b+1]
+        self.block_groups = np.searchsorted(group_blocks, np.arange(n_names + 1))
+
+    def groups(self, block):
+        return range(self.block_groups[block], self.block_groups[block + 1])
+
+    def find_row(self, group, offset):
+        start, end = self.group_starts[group], self.group_starts[group + 1]
+        row = start + np.searchsorted(self.src_offset[start:end], offset,
+                                      side="right") - 1
+        assert row >= start, "No offset %d in translation" % offset
+        return row
+
+
+class ArrayTranslation(object):
+
+    def __init__(self, arrays):
+        """
+        :param arrays: dict of arrays (as created by from_translation)
+        """
+        self.arrays = arrays
+        # Sorted block names (utf8), so that a name is found by binary search
+        self.names = arrays["names"]
+        self.name_is_int = arrays["name_is_int"]
+        self._directions = [
+            _Direction({f: arrays["%s_%s" % (d, f)] for f in
+                        FIELDS + ("group_end_offsets",)}, len(self.names))
+            for d in ("a_to_b", "b_to_a")]
+        self.block_lengths = None
+        self._graphs = [None, None]
+
+    @staticmethod
+    def _key(name):
+        return str(name).encode("utf8")
+
+    def _name(self, i):
+        name = self.names[i].decode("utf8")
+        return int(name) if self.name_is_int[i] else name
+
+    def _lookup(self, name):
+        # Returns index of name, or None if not in names
+        key = self._key(name)
+        i = np.searchsorted(self.names, key)
+        if i < len(self.names) and self.names[i] == key:
+            return int(i)
+        return None
+
+    @classmethod
+    def from_translation(cls, trans):
+        """
+        Create ArrayTranslation from a Translation
+        """
+        graphs = (trans.graph1, trans.graph2)
+        all_names = set()
+        for graph in graphs:
+            all_names.update(graph.blocks)
+        for trans_dict in (trans._a_to_b, trans._b_to_a):
+            for block, intervals in trans_dict.items():
+                all_names.add(block)
+                for interval in intervals:
+                    all_names.update(interval.region_paths)
+        all_names = sorted(all_names, key=cls._key)
+        index = {name: i for i, name in enumerate(all_names)}
+
+        arrays = {}
+        for d, trans_dict, target_graph in (
+                ("a_to_b", trans._a_to_b, trans.graph2),
+                ("b_to_a", trans._b_to_a, trans.graph1)):
+            rows = []
+            group_end_offsets = []
+            for block in sorted(trans_dict, key=cls._key):
+                for alt, interval in enumerate(trans_dict[block]):
+                    src_offset = 0
+                    for i, rp in enumerate(interval.region_paths):
+                        tgt_offset = interval.start_position.offset if i == 0 else 0
+                        rows.append((index[block], alt, src_offset,
+                                     index[rp], tgt_offset))
+                        src_offset += target_graph.blocks[rp].length() - tgt_offset
+                    group_end_offsets.append(interval.end_position.offset)
+
+            rows = np.array(rows, dtype=np.int64).reshape(-1, len(FIELDS))
+            for i, field in enumerate(FIELDS):
+                dtype = np.int64 if field.endswith("offset") else np.int32
+                arrays["%s_%s" % (d, field)] = rows[:, i].astype(dtype)
+            arrays["%s_group_end_offsets" % d] = np.array(group_end_offsets,
+                                                          dtype=np.int64)
+
+        for g, graph in enumerate(graphs):
+            # Length of each block in names (0 if not in graph)
+            lengths = np.zeros(len(all_names), dtype=np.int64)
+            for block in graph.blocks:
+                lengths[index[block]] = graph.blocks[block].length()
+            arrays["graph%d_lengths" % (g + 1)] = lengths
+            edges = [(index[b], index[t]) for b in graph.blocks
+                     for t in graph.adj_list[b]]
+            arrays["graph%d_edges" % (g + 1)] = np.array(
+                edges, dtype=np.int32).reshape(-1, 2)
+
+        arrays["names"] = np.array([cls._key(n) for n in all_names])
+        arrays["name_is_int"] = np.array([isinstance(n, int) for n in all_names],
+                                         dtype=bool)
+        return cls(arrays)
+
+    def to_file(self, file_name):
+        with open(file_name, "wb") as f:
+            np.savez(f, **self.arrays)
+
+    @classmethod
+    def from_file(cls, file_name):
+        data = np.load(file_name)
+        return cls({key: data[key] for key in data.files})
+
+    def _graph(self, g):
+        # Graph object for graph1 (g=0) or graph2 (g=1), created on first use
+        if self._graphs[g] is None:
+            from offsetbasedgraph import Block, Graph
+            prefix = "graph%d_" % (g + 1)
+            lengths = self.arrays[prefix + "lengths"]
+            blocks = {self._name(i): Block(int(lengths[i]))
+                      for i in np.flatnonzero(lengths)}
+            adj_list = {}
+            for b, t in self.arrays[prefix + "edges"]:
+                adj_list.setdefault(self._name(b), []).append(self._name(t))
+            self._graphs[g] = Graph(blocks, adj_list)
+        return self._graphs[g]
+
+    @property
+    def graph1(self):
+        return self._graph(0)
+
+    @property
+    def graph2(self):
+        return self._graph(1)
+
+    def copy(self):
+        """
+        ArrayTranslation with the same arrays (as Translation.copy). The
+        arrays are never changed, so they are not copied
+        """
+        return ArrayTranslation(self.arrays)
+
+    def _get_other_graph(self, inverse):
+        return self.graph1 if inverse else self.graph2
+
+    def _groups(self, block, inverse):
+        # Returns range of groups (alternatives) block is translated to
+        direction = self._directions[1 if inverse else 0]
+        i = self._lookup(block)
+        if i is None:
+            return range(0)
+        return direction.groups(i)
+
+    def translate_position(self, position, inverse=False):
+        """
+        Translates a position (as Translation.translate_position)
+
+        :return: list of Positions
+        """
+        from offsetbasedgraph import Position
+        groups = self._groups(position.region_path_id, inverse)
+        if len(groups) == 0:
+            return [position]
+
+        direction = self._directions[1 if inverse else 0]
+        positions = []
+        for group in groups:
+            row = direction.find_row(group, position.offset)
+            positions.append(Position(
+                self._name(direction.tgt_block[row]),
+                int(direction.tgt_offset[row] + position.offset -
+                    direction.src_offset[row])))
+        return positions
+
+    def _translations(self, rp, inverse=False):
+        """
+        :return: list of Intervals rp is translated to (as Translation._translations)
+        """
+        from offsetbasedgraph import Interval
+        graph = self._get_other_graph(inverse)
+        groups = self._groups(rp, inverse)
+        if len(groups) == 0:
+            lengths = self.arrays["graph%d_lengths" % (1 if inverse else 2)]
+            length = int(lengths[self._lookup(rp)])
+            interval = Interval(0, length, [rp], graph)
+            interval.set_length_cache(length)
+            return [interval]
+
+        direction = self._directions[1 if inverse else 0]
+        intervals = []
+        for group in groups:
+            start, end = direction.group_starts[group], \
+                direction.group_starts[group + 1]
+            region_paths = [self._name(b) for b in direction.tgt_block[start:end]]
+            intervals.append(Interval(
+                int(direction.tgt_offset[start]),
+                int(direction.group_end_offsets[group]),
+                region_paths, graph))
+        return intervals
+
+    def translate_rp(self, rp, inverse=False):
+        return self._translations(rp, inverse)
+
+    def _find_rps_to_add_within_translated_interval(self, *args):
+        from offsetbasedgraph import Translation
+        return Translation._find_rps_to_add_within_translated_interval(
+            self, *args)
+
+    def translate_interval(self, interval, inverse=False):
+        """
+        Translate interval (as Translation.translate_interval)
+
+        :return: MultiPathInterval
+        """
+        from offsetbasedgraph import Interval, Position
+        from offsetbasedgraph.multipathinterval import \
+            GeneralMultiPathInterval, SimpleMultipathInterval, \
+            SingleMultiPathInterval
+        graph = self._get_other_graph(inverse)
+        if not any(len(self._groups(rp, inverse))
+                   for rp in interval.region_paths):
+            return SingleMultiPathInterval(interval, graph)
+
+        new_starts = self.translate_position(interval.start_position, inverse)
+        if interval.length() == 0:
+            return SimpleMultipathInterval(
+                [Interval(sp, sp, [sp.region_path_id], graph)
+                 for sp in new_starts])
+
+        end = interval.end_position
+        new_ends = self.translate_position(
+            Position(end.region_path_id, end.offset - 1), inverse)
+        if len(self._groups(end.region_path_id, inverse)):
+            for new_end in new_ends:
+                new_end.offset += 1
+        else:
+            new_ends = [end]
+
+        new_region_paths = []
+        if len(new_starts) == len(new_ends):
+            region_paths = [[] for _ in new_starts]
+            for rp in interval.region_paths:
+                for i, intervalt in enumerate(self._translations(rp, inverse)):
+                    region_paths[i].extend(intervalt.region_paths)
+            # Only the region paths from start to end of each alternative
+            for rps, start, end in zip(region_paths, new_starts, new_ends):
+                start_index = rps.index(start.region_path_id)
+                end_index = rps.index(end.region_path_id)
+                new_region_paths.extend(rps[start_index:end_index + 1])
+        else:
+            for rp in interval.region_paths:
+                for intervalt in self._translations(rp, inverse):
+                    new_region_paths.extend(
+                        self._find_rps_to_add_within_translated_interval(
+                            rp, intervalt, interval, inverse))
+
+        if len(new_starts) == 1 and len(new_ends) == 1:
+            return SingleMultiPathInterval(
+                Interval(new_starts[0], new_ends[0], new_region_paths, graph))
+        return GeneralMultiPathInterval(new_starts, new_ends,
+                                        new_region_paths, graph)
+
+    def translate(self, obj):
+        """
+        Translate Interval or Position (as Translation.translate). Only for
+        use where there is a one-to-one translation
+        """
+        from offsetbasedgraph import Interval, Position
+        if isinstance(obj, Interval):
+            ret = self.translate_interval(obj).get_single_path_intervals()
+        elif isinstance(obj, Position):
+            ret = self.translate_position(obj)
+        else:
+            raise ValueError("Cannot translate object of type %s. "
+                             "Only Position and Interval are supported" % type(obj))
+        assert len(ret) == 1
+        return ret[0]
+
+
+def compact_translation(args):
+    trans = load_translation(args.translation_file_name)
+    ArrayTranslation.from_translation(trans).to_file(args.out_file_name)
+    print("Array translation stored in %s" % args.out_file_name)
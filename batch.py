@@ -0,0 +1,119 @@
+"""
+Run many subcommands in one process.
+
+The manifest is a JSONL file with one job per line:
+
+    {"id": "chr1_KI270762v1_alt", "command": "print_gene_notations",
+     "args": ["data/graph.trans", "data/genes.txt", "chr1_KI270762v1_alt",
+              "data/grch38_alt_loci.txt"]}
+
+args are given as on the command line. id is optional (the job number is
+used if not given). Translations, genes and graphs loaded by one job are
+reused by later jobs in the same process. With more than one process, each
+worker process keeps its own loaded state.
+
+For every job, output is written to <out_dir>/<id>.out and status (ok or
+failed, time used and error message) to <out_dir>/<id>.status.
+"""
+
+import contextlib
+import json
+import os
+import time
+import traceback
+from profiling import profiler
+
+
+def read_manifest(file_name):
+    """
+    :return: list of jobs (dicts with id, command and args)
+    """
+    jobs = []
+    with open(file_name) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            job = json.loads(line)
+            assert "command" in job, "Job without command: %s" % line
+            job.setdefault("id", "job%d" % len(jobs))
+            job.setdefault("args", [])
+            jobs.append(job)
+
+    ids = [job["id"] for job in jobs]
+    assert len(set(ids)) == len(ids), "Job ids in manifest must be unique"
+    return jobs
+
+
+def _init_batch_worker():
+    import methods
+    methods.enable_shared_state()
+
+
+def run_job(job, out_dir):
+    """
+    Run a single job, writing its output and status to out_dir
+
+    :return: status dict
+    """
+    from gen_graph_coords import create_parser, load_method
+    out_file_name = os.path.join(out_dir, "%s.out" % job["id"])
+    status = {"id": job["id"], "command": job["command"], "args": job["args"],
+              "output": out_file_name}
+    start_time = time.time()
+    with open(out_file_name, "w") as out:
+        try:
+            with contextlib.redirect_stdout(out), \
+                    contextlib.redirect_stderr(out):
+                args = create_parser().parse_args(
+                    [job["command"]] + [str(a) for a in job["args"]])
+                with profiler.stage(job["command"], job=job["id"]):
+                    load_method(args.func)(args)
+            status["status"] = "ok"
+        except (Exception, SystemExit) as e:
+            # argparse exits on invalid arguments
+            status["status"] = "failed"
+            status["error"] = repr(e)
+            out.write(traceback.format_exc())
+
+    status["time"] = time.time() - start_time
+    with open(os.path.join(out_dir, "%s.status" % job["id"]), "w") as f:
+        json.dump(status, f, indent=1)
+    return status
+
+
+def _run_job_task(task):
+    return run_job(*task)
+
+
+def _print_statuses(statuses):
+    # Prints the status of each job as it finishes. Returns the number of
+    # failed jobs
+    n_failed = 0
+    for status in statuses:
+        if status["status"] != "ok":
+            n_failed += 1
+        print("%s: %s (%.1f s)" % (status["id"], status["status"],
+                                   status["time"]))
+    return n_failed
+
+
+def run_batch(args):
+    jobs = read_manifest(args.manifest_file_name)
+    if not os.path.isdir(args.out_dir):
+        os.makedirs(args.out_dir)
+
+    tasks = [(job, args.out_dir) for job in jobs]
+    if args.processes > 1:
+        import multiprocessing
+        with multiprocessing.Pool(args.processes, _init_batch_worker) as pool:
+            n_failed = _print_statuses(pool.imap_unordered(_run_job_task,
+                                                           tasks))
+            pool.close()
+            pool.join()
+    else:
+        _init_batch_worker()
+        n_failed = _print_statuses(map(_run_job_task, tasks))
+
+    print("%d of %d jobs finished successfully" % (len(jobs) - n_failed,
+                                                    len(jobs)))
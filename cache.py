@@ -0,0 +1,144 @@
+"""
+Simple on-disk cache for results that are expensive to compute
+(e.g. graphs created by merging alt loci using NCBI alignments).
+
+Values are stored as compressed pickles, one file per key. Keys are created
+from the content of the input files (see file_hash) and the version of
+offsetbasedgraph, so that changed input files or a new library version never
+give a stale result. If the cache has a maximum size, the least recently
+used entries are removed when the size is exceeded.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import zlib
+
+CACHE_FILE_SUFFIX = ".cache"
+
+
+def file_hash(file_name):
+    """
+    :return: sha1 hex digest of the content of the file
+    """
+    h = hashlib.sha1()
+    with open(file_name, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def library_version():
+    """
+    :return: Version of the offsetbasedgraph package (part of all cache keys)
+    """
+    try:
+        from importlib.metadata import version
+        return version("offsetbasedgraph")
+    except Exception:
+        return "unknown"
+
+
+class DiskCache(object):
+
+    def __init__(self, cache_dir, max_size=None):
+        """
+        :param cache_dir: Directory to store cached values in
+        :param max_size: Maximum total size of cache in bytes (None for no limit)
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    @staticmethod
+    def key(*parts):
+        """
+        Create a cache key from strings (e.g. file hashes and ids).
+        The offsetbasedgraph version is always part of the key.
+        """
+        parts = (library_version(),) + parts
+        return hashlib.sha1("\0".join(str(p) for p in parts).encode("utf8")).hexdigest()
+
+    def _file_name(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_FILE_SUFFIX)
+
+    def get(self, key, default=None):
+        file_name = self._file_name(key)
+        try:
+            with open(file_name, "rb") as f:
+                data = f.read()
+        except (IOError, OSError):
+            return default
+
+        # Mark as recently used
+        try:
+            os.utime(file_name, None)
+        except OSError:
+            pass
+
+        try:
+            return pickle.loads(zlib.decompress(data))
+        except (zlib.error, pickle.UnpicklingError, EOFError):
+            # Corrupt entry (e.g. a disk error). Removed so that the value is
+            # computed and stored again
+            try:
+                os.remove(file_name)
+            except OSError:
+                pass
+            return default
+
+    def put(self, key, value):
+        data = zlib.compress(
+            pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 6)
+
+        # Write to temporary file first so that readers (e.g. other
+        # processes) never see a partially written file
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_name, self._file_name(key))
+        except BaseException:
+            try:
+                os.remove(tmp_name)
+            except OSError:
+                pass
+            raise
+        self.evict()
+
+    def entries(self):
+        """
+        :return: list of (last used time, size, file name) for all entries
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(CACHE_FILE_SUFFIX):
+                continue
+            file_name = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(file_name)
+            except OSError:
+                continue  # Removed by another process
+            entries.append((stat.st_mtime, stat.st_size, file_name))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove least recently used entries until cache is below max size"""
+        if self.max_size is None:
+            return
+
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, file_name in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(file_name)
+            except OSError:
+                pass
+            total -= size
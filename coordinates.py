@@ -0,0 +1,162 @@
+"""
+Conversion of graph positions back to linear GRCh38 coordinates.
+
+A CoordinateTable stores, for every block in the graph created by
+create_graph, where the block starts on GRCh38 in the hierarchical scheme
+(position on the main chromosome for blocks on main or merged, position on
+the alt locus for blocks only on an alt locus). In the sequential scheme,
+every block is its own sequence starting at offset 0 (as in the data-coordinate
+tooltips made by VisualizeHtml._coordinate).
+
+Block ids are stored sorted, so that a block is found with a binary search
+(numpy.searchsorted), and many positions can be converted in one call.
+"""
+
+import sys
+import numpy as np
+
+HIERARCHICAL = "hierarchical"
+SEQUENTIAL = "sequential"
+NOT_CONVERTED = "NA"
+
+
+class CoordinateTable(object):
+
+    def __init__(self, block_ids, block_lengths, sequence_ids, sequence_offsets):
+        """
+        :param block_ids: Sorted array of block ids in the graph
+        :param block_lengths: Length of each block
+        :param sequence_ids: GRCh38 sequence (hierarchical scheme) of each block
+        :param sequence_offsets: Offset on the GRCh38 sequence where block starts
+        """
+        self.block_ids = np.asarray(block_ids, dtype=str)
+        self.block_lengths = np.asarray(block_lengths, dtype=np.int64)
+        self.sequence_ids = np.asarray(sequence_ids, dtype=str)
+        self.sequence_offsets = np.asarray(sequence_offsets, dtype=np.int64)
+
+    @classmethod
+    def from_translation(cls, trans):
+        """
+        :param trans: Translation from GRCh38 to the graph (from create_graph)
+        """
+        from offsetbasedgraph import Graph, Position
+        graph = trans.graph2
+        block_ids = sorted(str(b) for b in graph.blocks)
+        blocks = {str(b): b for b in graph.blocks}
+        lengths = []
+        sequence_ids = []
+        sequence_offsets = []
+        for block_id in block_ids:
+            block = blocks[block_id]
+            lengths.append(graph.blocks[block].length())
+            positions = trans.translate_position(Position(block, 0), True)
+            # Main chromosome if block is on it, else alt locus
+            main = [p for p in positions
+                    if Graph.block_origin(p.region_path_id) == "main"]
+            position = main[0] if main else positions[0]
+            sequence_ids.append(str(position.region_path_id))
+            sequence_offsets.append(position.offset)
+
+        return cls(block_ids, lengths, sequence_ids, sequence_offsets)
+
+    def to_file(self, file_name):
+        with open(file_name, "wb") as f:
+            np.savez(f, block_ids=self.block_ids,
+                     block_lengths=self.block_lengths,
+                     sequence_ids=self.sequence_ids,
+                     sequence_offsets=self.sequence_offsets)
+
+    @classmethod
+    def from_file(cls, file_name):
+        data = np.load(file_name)
+        return cls(data["block_ids"], data["block_lengths"],
+                   data["sequence_ids"], data["sequence_offsets"])
+
+    def _find_blocks(self, blocks, offsets):
+        # Returns index of each block in table and whether position is valid
+        blocks = np.asarray(blocks, dtype=str)
+        indexes = np.searchsorted(self.block_ids, blocks)
+        indexes = np.minimum(indexes, len(self.block_ids) - 1)
+        valid = (self.block_ids[indexes] == blocks) & (offsets >= 0) & \
+            (offsets < self.block_lengths[indexes])
+        return indexes, valid
+
+    def to_linear(self, blocks, offsets, scheme=HIERARCHICAL):
+        """
+        Convert graph positions to linear coordinates
+
+        :param blocks: Block id of each position
+        :param offsets: Offset of each position in its block
+        :param scheme: hierarchical or sequential
+        :return: (sequence ids, offsets, valid), where valid is False for
+            positions not in the graph
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        indexes, valid = self._find_blocks(blocks, offsets)
+        if scheme == SEQUENTIAL:
+            return np.asarray(blocks, dtype=str), offsets, valid
+
+        assert scheme == HIERARCHICAL, "Unknown coordinate scheme %s" % scheme
+        return (self.sequence_ids[indexes],
+                self.sequence_offsets[indexes] + offsets, valid)
+
+
+def _read_chunks(lines, chunk_size):
+    # Yields lists of (line, block, offset) for lines "block<tab>offset..."
+    chunk = []
+    for line in lines:
+        if line.startswith("#") or not line.strip():
+            continue
+        columns = line.rstrip("\n").split("\t")
+        chunk.append((line.rstrip("\n"), columns[0], int(columns[1])))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def convert_positions(table, lines, out, scheme=HIERARCHICAL,
+                      chunk_size=100000):
+    """
+    Convert positions from lines on the form "block<tab>offset" and write each
+    line to out followed by sequence id and offset
+
+    :return: number of positions not in graph
+    """
+    n_not_converted = 0
+    for chunk in _read_chunks(lines, chunk_size):
+        sequences, offsets, valid = table.to_linear(
+            [c[1] for c in chunk], [c[2] for c in chunk], scheme)
+        for i, (line, _, _) in enumerate(chunk):
+            if valid[i]:
+                out.write("%s\t%s\t%d\n" % (line, sequences[i], offsets[i]))
+            else:
+                out.write("%s\t%s\t%s\n" % (line, NOT_CONVERTED, NOT_CONVERTED))
+                n_not_converted += 1
+    return n_not_converted
+
+
+def create_coordinate_table(args):
+    from arraytranslation import load_translation
+    trans = load_translation(args.translation_file_name)
+    table = CoordinateTable.from_translation(trans)
+    table.to_file(args.out_file_name)
+    print("Coordinates of %d blocks stored in %s" % (len(table.block_ids),
+                                                     args.out_file_name))
+
+
+def graph_to_linear(args):
+    table = CoordinateTable.from_file(args.table_file_name)
+    f = sys.stdin if args.in_file_name == "-" else open(args.in_file_name)
+    out = sys.stdout if args.out_file_name == "-" else \
+        open(args.out_file_name, "w")
+    n_not_converted = convert_positions(table, f, out, args.scheme)
+    if f is not sys.stdin:
+        f.close()
+    if out is not sys.stdout:
+        out.close()
+
+    if n_not_converted:
+        sys.stderr.write("%d positions not in graph (written with %s)\n" %
+                         (n_not_converted, NOT_CONVERTED))
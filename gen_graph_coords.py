@@ -11,9 +11,14 @@ python3 gen_graph_coords.py grch38.chrom.sizes-small grch38_alt_loci_small.txt g
 
 import sys
 import argparse
-from methods import *
+import importlib
+from profiling import profiler
+from results import result_store
 
-# Dict struct for holding all arguments taken by the interface
+# Dict struct for holding all arguments taken by the interface.
+# Methods are given as "module.function" and are only imported when the
+# subcommand is run, so that light commands do not pay for importing
+# offsetbasedgraph, numpy, etc.
 
 CHROM_SIZES_DESCRIPTION = 'Name of file with chrom sizes, used to build graph (e.g. data/grch38.chrom.sizes).' + \
                           ' Should contain two columns, chrom/alt name and size.'
@@ -31,9 +36,13 @@ interface = \
                     ('chrom_sizes_file_name', CHROM_SIZES_DESCRIPTION),
                     ('alt_locations_file_name', 'File containing alternative '
                                                 'loci info (e.g. data/grch38_alt_loci.txt)'),
-                    ('out_file_name', 'Name of file to store graph and translation objects insize')
+                    ('out_file_name', 'Name of file to store graph and translation objects insize'),
+                    ('--segmented', 'Merge one main chromosome (with its alt loci) at a time and '
+                                    'append it to out_file_name, to bound memory usage. '
+                                    'The file is read as the same graph.',
+                     {'action': 'store_true'})
                 ],
-            'method': create_graph
+            'method': 'methods.create_graph'
         },
 
     'check_duplicate_genes':
@@ -44,7 +53,7 @@ interface = \
                     ('translation_file_name', 'Translation file created by running create_graph'),
                     ('genes_file_name', '')
                 ],
-            'method': check_duplicate_genes
+            'method': 'methods.check_duplicate_genes'
         },
 
     'create_complex_graph':
@@ -55,7 +64,7 @@ interface = \
                     ('chrom_sizes_file_name', CHROM_SIZES_DESCRIPTION),
                     ('out_file_name', 'File to store resulting translation object in')
                 ],
-            'method': merge_all_alignments
+            'method': 'methods.merge_all_alignments'
         },
 
     'analyse_multipath_genes':
@@ -72,9 +81,20 @@ interface = \
                                                 '(e.g. data/grch38_alt_loci.txt)'),
                     ('ncbi_alignments_dir', 'Directory containing NCBI alignment files (e.g. data/alt_alignments)'),
                     ('genes_file_name', 'Name of gene file (e.g. data/genes/genes_refseq.txt)'),
-                    ('interval_type', 'Type of multipath interval (critical/fuzzy)'),
+                    ('interval_type', 'Type of multipath interval (critical/fuzzy), or similarity '
+                                      'to compare exon overlap of alt and main genes'),
+                    ('--processes', 'Number of alt loci to analyse in parallel (fuzzy only)',
+                     {'type': int, 'default': 1}),
+                    ('--cache_dir', 'Directory for caching the merged graph (and translated '
+                                    'fuzzy genes) for each alt locus between runs',
+                     {'default': None}),
+                    ('--cache_size', 'Maximum size of cache in MB. Least recently '
+                                     'used entries are removed', {'type': int, 'default': 2000}),
+                    ('--sequence_store', 'Read sequences from this store (created by '
+                                         'create_sequence_store) instead of UCSC',
+                     {'default': None}),
                 ],
-            'method': analyse_multipath_genes2
+            'method': 'methods.analyse_multipath_genes2'
         },
     'visualize_alt_locus':
         {
@@ -88,9 +108,11 @@ interface = \
                               ' will be visualized '
                               '(e.g. data/genes/genes_refseq.txt)'),
                     ('alt_locations_file_name', 'File containing alternative loci info (e.g. data/grch38_alt_loci.txt)'),
-                    ('alt_locus', ALT_LOCUS_DESCRIPTION)
+                    ('alt_locus', ALT_LOCUS_DESCRIPTION),
+                    ('--cache_dir', 'Directory for caching the layout of the graph '
+                                    'around the alt locus', {'default': None})
                 ],
-            'method': visualize_alt_locus
+            'method': 'methods.visualize_alt_locus'
         },
 
     'visualize_alt_locus_wrapper':
@@ -100,9 +122,39 @@ interface = \
                     'Not recomended to run.',
             'arguments':
                 [
-                    ('alt_locus', 'Alt locus id (e. g. chr2_KI270774v1_alt)')
+                    ('alt_locus', 'Alt locus id (e. g. chr2_KI270774v1_alt)'),
+                    ('--cache_dir', 'Directory for caching the graph for each alt locus',
+                     {'default': 'data/tmp/cache'}),
+                    ('--cache_size', 'Maximum size of cache in MB', {'type': int, 'default': 2000}),
                 ],
-            'method': visualize_alt_locus_wrapper
+            'method': 'methods.visualize_alt_locus_wrapper'
+        },
+
+    'visualization_server':
+        {
+            'help': 'Serve visualizations (as visualize_alt_locus_wrapper) and gene searches '
+                    '(as html_gene_search) over http for python_runner.php. Identical '
+                    'visualization requests share one computation, and the number of '
+                    'computations running and waiting is limited.',
+            'arguments':
+                [
+                    ('--port', 'Port to listen on (localhost)', {'type': int, 'default': 8095}),
+                    ('--max_concurrent', 'Maximum number of visualizations computed at once',
+                     {'type': int, 'default': 2}),
+                    ('--max_queue', 'Maximum number of visualizations waiting. '
+                                    'Requests are rejected when the queue is full',
+                     {'type': int, 'default': 20}),
+                    ('--timeout', 'Seconds a request waits for its visualization',
+                     {'type': int, 'default': 300}),
+                    ('--alt_locations_file_name', 'File containing alternative loci info',
+                     {'default': 'data/grch38_alt_loci.txt'}),
+                    ('--cache_dir', 'Directory for caching the graph for each alt locus',
+                     {'default': 'data/tmp/cache'}),
+                    ('--index_file_name', 'Gene index created by create_gene_index',
+                     {'default': 'data/gene_index.json'}),
+                ],
+            'example_run': 'python3 gen_graph_coords.py visualization_server --max_concurrent 2',
+            'method': 'visualizationserver.visualization_server'
         },
 
     'html_alt_loci_select':
@@ -110,12 +162,40 @@ interface = \
             'help': 'Produce html for alt loci select box (only used by web tool)',
             'arguments':
                 [],
-            'method': html_alt_loci_select
+            'method': 'webtool.html_alt_loci_select'
+        },
+    'html_gene_search':
+        {
+            'help': 'Print genes with names starting with a prefix as html links to their alt loci',
+            'arguments':
+                [
+                    ('prefix', 'Start of gene name (or name2), case insensitive'),
+                    ('--index_file_name', 'Gene index created by create_gene_index',
+                     {'default': 'data/gene_index.json'}),
+                    ('--limit', 'Maximum number of genes', {'type': int, 'default': 20})
+                ],
+            'method': 'webtool.html_gene_search'
+        },
+    'create_gene_index':
+        {
+            'help': 'Create index from gene names to the alt loci they are on or parallel to '
+                    '(used by the web tool to search for genes)',
+            'arguments':
+                [
+                    ('translation_file_name', 'Translation file created by running create_graph'),
+                    ('genes_file_name', 'Tab-separated file with genes'),
+                    ('alt_locations_file_name', 'File containing alternative loci'),
+                    ('out_file_name', 'Index file (json)')
+                ],
+            'example_run': 'python3 gen_graph_coords.py create_gene_index data/graph.trans '
+                           'data/genes/genes_refseq.txt data/grch38_alt_loci.txt data/gene_index.json',
+            'method': 'geneindex.create_gene_index'
         },
 
     'print_gene_notations':
         {
-            'help': 'Print gene notation for single- and multipath genes on a specific alternative locus.',
+            'help': 'Write notation on GRCh38 and on the graph of the genes on an alternative locus '
+                    'and in its region on the main chromosome, as tsv.',
             'arguments':
                 [
                     ('translation_file_name', 'File name of translation from '
@@ -123,15 +203,18 @@ interface = \
                                               'that genes should be represented on'),
                     ('alt_locations_file_name', 'Alt locations file name '
                                                 '(e.g. data/grch38_alt_loci.txt'),
-                    ('alt_locus', ALT_LOCUS_DESCRIPTION),
+                    ('alt_locus', ALT_LOCUS_DESCRIPTION + ', or all for every alt locus'),
                     ('genes', 'Name of gene file containing genes '
                               'that will be printed (e.g. data/genes/genes_refseq.txt). '
                               'Note: Only genes within the alt locus area will be printed.'),
+                    ('--out_file_name', 'Output file (default: stdout)', {'default': '-'}),
+                    ('--processes', 'Number of alt loci to translate in parallel',
+                     {'type': int, 'default': 1})
                 ],
             'example_run': 'python3 gen_graph_coords.py print_gene_notations '
-                           'g data/grch38_alt_loci.txt chr2_KI270774v1_alt '
-                           'data/genes/genes_refseq.txt',
-            'method': print_gene_notations
+                           'g data/grch38_alt_loci.txt all '
+                           'data/genes/genes_refseq.txt --out_file_name notations.tsv --processes 4',
+            'method': 'methods.print_gene_notations'
         },
     'compute_average_flank_length':
         {
@@ -142,37 +225,265 @@ interface = \
                                                 '(e.g. data/grch38_alt_loci.txt'),
                 ],
             'example_run': 'python3 gen_grah_coords.py compute_average_flank_length',
-            'method': compute_average_flank_length
+            'method': 'methods.compute_average_flank_length'
+        },
+    'generate_synthetic_data':
+        {
+            'help': 'Generate synthetic chrom sizes, alt loci, alignment and gene files '
+                    'for scale testing',
+            'arguments':
+                [
+                    ('out_dir', 'Directory to write the synthetic data set to'),
+                    ('--n_chromosomes', 'Number of main chromosomes', {'type': int, 'default': 2}),
+                    ('--chrom_size', 'Length of each main chromosome', {'type': int, 'default': 10000000}),
+                    ('--alt_loci_per_chromosome', 'Number of alt loci on each chromosome',
+                     {'type': int, 'default': 10}),
+                    ('--min_locus_length', 'Minimum length of an alt locus region on main',
+                     {'type': int, 'default': 10000}),
+                    ('--max_locus_length', 'Maximum length of an alt locus region on main',
+                     {'type': int, 'default': 200000}),
+                    ('--overlap', 'Probability (0-1) that an alt locus overlaps the previous one',
+                     {'type': float, 'default': 0.0}),
+                    ('--cigar_operations', 'Number of operations in each alignment cigar',
+                     {'type': int, 'default': 11}),
+                    ('--genes_per_locus', 'Number of genes on each alt locus and parallel main region',
+                     {'type': int, 'default': 10}),
+                    ('--sequence_cache_dir', 'If set, write sequences here (e.g. data/tmp) '
+                                             'so that they are not fetched from UCSC',
+                     {'default': None}),
+                    ('--seed', 'Random seed', {'type': int, 'default': 0})
+                ],
+            'example_run': 'python3 gen_graph_coords.py generate_synthetic_data '
+                           'data/synthetic --alt_loci_per_chromosome 1305 '
+                           '--overlap 0.5 --cigar_operations 10001',
+            'method': 'methods.generate_synthetic_data'
+        },
+    'compact_translation':
+        {
+            'help': 'Convert a translation file (e.g. created by create_graph) to a compact '
+                    'array-based file. The compact file is smaller and faster to read, and can '
+                    'be used instead of the translation file by print_gene_notations, '
+                    'check_duplicate_genes, translate_intervals, create_coordinate_table and '
+                    'visualize_alt_locus',
+            'arguments':
+                [
+                    ('translation_file_name', 'Translation file'),
+                    ('out_file_name', 'File to store compact translation in')
+                ],
+            'method': 'arraytranslation.compact_translation'
+        },
+    'translate_intervals':
+        {
+            'help': 'Translate intervals in a BED or GFF file from GRCh38 to the graph. '
+                    'Each record is written followed by a tab and the graph interval '
+                    '(NA if the record is outside the graph)',
+            'arguments':
+                [
+                    ('translation_file_name', 'Translation file created by running '
+                                              'create_graph'),
+                    ('in_file_name', 'BED or GFF file (may be gzipped, - for stdin)'),
+                    ('out_file_name', 'Output file (- for stdout)'),
+                    ('--format', 'bed or gff (default: guessed from file name)',
+                     {'default': None, 'choices': ['bed', 'gff']}),
+                    ('--processes', 'Number of worker processes', {'type': int, 'default': 1}),
+                    ('--chunk_size', 'Maximum number of records translated in one batch',
+                     {'type': int, 'default': 100000})
+                ],
+            'example_run': 'python3 gen_graph_coords.py translate_intervals '
+                           'data/graph.trans data/genes.bed genes_graph.tsv --processes 4',
+            'method': 'liftover.translate_intervals'
+        },
+    'create_coordinate_table':
+        {
+            'help': 'Store the GRCh38 coordinate of every block in the graph, used by graph_to_linear',
+            'arguments':
+                [
+                    ('translation_file_name', 'Translation file created by running '
+                                              'create_graph'),
+                    ('out_file_name', 'File to store coordinate table in')
+                ],
+            'method': 'coordinates.create_coordinate_table'
+        },
+    'graph_to_linear':
+        {
+            'help': 'Convert graph positions to linear coordinates. Each line in the input '
+                    'should start with block id and offset (tab separated), and is written '
+                    'followed by sequence id and offset (NA if not in graph)',
+            'arguments':
+                [
+                    ('table_file_name', 'Coordinate table created by create_coordinate_table'),
+                    ('in_file_name', 'File with graph positions (- for stdin)'),
+                    ('out_file_name', 'Output file (- for stdout)'),
+                    ('--scheme', 'hierarchical (GRCh38 chromosomes and alt loci) or '
+                                 'sequential (blocks)',
+                     {'default': 'hierarchical', 'choices': ['hierarchical', 'sequential']})
+                ],
+            'example_run': 'python3 gen_graph_coords.py graph_to_linear graph.coordinates '
+                           'positions.tsv positions_grch38.tsv',
+            'method': 'coordinates.graph_to_linear'
+        },
+    'create_sequence_store':
+        {
+            'help': 'Store GRCh38 sequences from a FASTA file (e.g. hg38.fa) in a 2-bit '
+                    'packed, memory mapped file, used by analyse_multipath_genes --sequence_store',
+            'arguments':
+                [
+                    ('fasta_file_name', 'FASTA file with chromosomes and alt loci (- for stdin)'),
+                    ('out_file_name', 'File to store sequences in (index is written to '
+                                      '<out_file_name>.json)')
+                ],
+            'example_run': 'python3 gen_graph_coords.py create_sequence_store hg38.fa data/hg38.2bit',
+            'method': 'sequencestore.create_sequence_store'
+        },
+    'curate_alignment_files':
+        {
+            'help': 'Write the first alignment of every alt locus GFF file downloaded from NCBI '
+                    'to <out_dir>/<alt locus id>.alignment, checking the cigar against the '
+                    'coordinates and the chrom sizes',
+            'arguments':
+                [
+                    ('gff_dir', 'Directory with one NCBI alignment GFF file per alt locus'),
+                    ('chrom_sizes_file_name', 'Tab-separated file with chrom names and sizes'),
+                    ('out_dir', 'Directory to write alignment files to (e.g. data/alt_alignments)'),
+                    ('--processes', 'Number of worker processes', {'type': int, 'default': 1})
+                ],
+            'example_run': 'python3 gen_graph_coords.py curate_alignment_files ~/alignments '
+                           'data/grch38.chrom.sizes data/alt_alignments --processes 8',
+            'method': 'alignments.curate_alignment_files'
+        },
+    'extract_region_genes':
+        {
+            'help': 'Write a genes file for every alt locus, with the genes on the alt locus and '
+                    'the genes inside its region on the main chromosome',
+            'arguments':
+                [
+                    ('genes_file_name', 'Tab-separated file with genes (with header)'),
+                    ('alt_locations_file_name', 'File containing alternative loci'),
+                    ('out_dir', 'Directory to write genes_<alt locus id>.txt files to')
+                ],
+            'example_run': 'python3 gen_graph_coords.py extract_region_genes data/genes/genes_refseq.txt '
+                           'data/grch38_alt_loci.txt data/region_genes',
+            'method': 'regiongenes.extract_region_genes'
+        },
+    'graph_to_gfa':
+        {
+            'help': 'Write the graph in a translation file as GFA1, with a path for every '
+                    'GRCh38 chromosome and alt locus',
+            'arguments':
+                [
+                    ('translation_file_name', 'Translation file created by running '
+                                              'create_graph or merge_all_alignments'),
+                    ('out_file_name', 'GFA file (- for stdout)')
+                ],
+            'example_run': 'python3 gen_graph_coords.py graph_to_gfa data/graph.trans graph.gfa',
+            'method': 'gfa.graph_to_gfa'
+        },
+    'gfa_to_graph':
+        {
+            'help': 'Read graph and paths from a GFA1 file (e.g. written by graph_to_gfa) '
+                    'and store them as a translation file',
+            'arguments':
+                [
+                    ('gfa_file_name', 'GFA file (- for stdin)'),
+                    ('out_file_name', 'File to store resulting translation object in')
+                ],
+            'method': 'gfa.gfa_to_graph'
+        },
+    'batch':
+        {
+            'help': 'Run many jobs (subcommands) in one process, so that translations, '
+                    'genes and graphs are only loaded once. The manifest is a JSONL file with '
+                    'one job per line, e.g. {"id": "job1", "command": "visualize_alt_locus_wrapper", '
+                    '"args": ["chr1_KI270762v1_alt"]}. Output and status of each job is '
+                    'written to <out_dir>/<id>.out and <out_dir>/<id>.status',
+            'arguments':
+                [
+                    ('manifest_file_name', 'JSONL file with jobs'),
+                    ('out_dir', 'Directory to write output and status of each job to'),
+                    ('--processes', 'Number of worker processes. Each worker keeps its own '
+                                    'loaded translations and genes',
+                     {'type': int, 'default': 1})
+                ],
+            'example_run': 'python3 gen_graph_coords.py batch jobs.jsonl batch_out --processes 4',
+            'method': 'batch.run_batch'
+        },
+    'diff_results':
+        {
+            'help': 'Print results that differ between two runs stored with --results',
+            'arguments':
+                [
+                    ('results_file_name', 'SQLite database given to --results'),
+                    ('--run1', 'Id of first run (default: the run before run2)', {'type': int}),
+                    ('--run2', 'Id of second run (default: latest run)', {'type': int})
+                ],
+            'example_run': 'python3 gen_graph_coords.py diff_results results.sqlite',
+            'method': 'results.diff_results'
         }
 }
 
-# Create parser
-parser = argparse.ArgumentParser(
-    description='Interact with a graph created from GRCh38')
-subparsers = parser.add_subparsers(help='Subcommands')
+def load_method(method):
+    """
+    Import and return the function given as "module.function"
+    """
+    module_name, function_name = method.rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        description='Interact with a graph created from GRCh38')
+    parser.add_argument('--profile', default=None,
+                        help='Write wall time, cpu time and process peak memory usage '
+                             '(and its increase) of each stage to this file')
+    parser.add_argument('--profile_format', default='json', choices=['json', 'chrome'],
+                        help='Format of profile file. chrome gives the Chrome trace '
+                             'event format (open in chrome://tracing)')
+    parser.add_argument('--results', default=None,
+                        help='Store per-gene and per-locus results of the experiments '
+                             'in this SQLite database (see diff_results)')
+    subparsers = parser.add_subparsers(help='Subcommands')
 
-for command in interface:
-    example = ""
-    if "example_run" in interface[command]:
-        example = "\nExample: " + interface[command]["example_run"]
+    for command in interface:
+        example = ""
+        if "example_run" in interface[command]:
+            example = "\nExample: " + interface[command]["example_run"]
 
-    subparser = subparsers.add_parser(command,
-                            help=interface[command]["help"] + example)
-    for argument, help in interface[command]["arguments"]:
-        subparser.add_argument(argument, help=help)
-    subparser.set_defaults(func=interface[command]["method"])
+        subparser = subparsers.add_parser(command,
+                                help=interface[command]["help"] + example)
+        for argument in interface[command]["arguments"]:
+            # Optional third element holds extra keyword arguments (e.g. type, default)
+            options = argument[2] if len(argument) > 2 else {}
+            subparser.add_argument(argument[0], help=argument[1], **options)
+        subparser.set_defaults(func=interface[command]["method"], command=command)
 
-if len(sys.argv) == 1:
-    parser.print_help()
-    sys.exit(1)
+    return parser
 
-args = parser.parse_args()
-if hasattr(args, 'func'):
-    args.func(args)
-else:
-    parser.help()
 
+def main(argv):
+    parser = create_parser()
+    if len(argv) == 0:
+        parser.print_help()
+        sys.exit(1)
 
+    args = parser.parse_args(argv)
+    if hasattr(args, 'func'):
+        if args.profile is not None:
+            profiler.enable()
+        if args.results is not None:
+            result_store.enable(args.results, args.command, argv)
+        try:
+            with profiler.stage(args.func.split(".")[-1]):
+                load_method(args.func)(args)
+        except BaseException:
+            result_store.close("failed")
+            raise
+        result_store.close("ok")
+        if args.profile is not None:
+            profiler.to_file(args.profile, args.profile_format)
+    else:
+        parser.print_help()
 
 
-sys.exit()
+if __name__ == "__main__":
+    main(sys.argv[1:])
+    sys.exit()
@@ -0,0 +1,176 @@
+"""
+Index from gene names to the alt loci they are on or parallel to.
+
+For every gene on an alt locus, or on the main chromosome inside the region
+of an alt locus (as the parallel genes of create_gene_dicts), the index
+stores the alt locus and the transcription region of the gene translated to
+the graph created by create_graph. Genes are found by name and name2, case
+insensitive.
+
+The index is stored as json with the keys (lower case names) in sorted
+order, so that exact and prefix lookups are a binary search (bisect) in the
+list of keys. Querying only uses the standard library, so the index can be
+used by the web tool (see webtool.py). load_gene_index keeps loaded indexes,
+so a long-running process only reads the file once.
+"""
+
+import bisect
+import csv
+import json
+import os
+from collections import namedtuple
+
+GeneLocation = namedtuple("GeneLocation", ["name", "name2", "alt_locus", "chrom",
+                                           "start", "end", "notation"])
+
+
+class GeneIndex(object):
+
+    def __init__(self, keys, postings, entries):
+        """
+        :param keys: Sorted list of lower case gene names
+        :param postings: For each key, list of entry indexes
+        :param entries: List of GeneLocations (or lists with the same fields)
+        """
+        self.keys = keys
+        self.postings = postings
+        self.entries = [GeneLocation(*entry) for entry in entries]
+
+    @classmethod
+    def from_locations(cls, locations):
+        postings = {}
+        for i, location in enumerate(locations):
+            for name in set((location.name.lower(), location.name2.lower())):
+                if name:
+                    postings.setdefault(name, []).append(i)
+        keys = sorted(postings)
+        return cls(keys, [postings[key] for key in keys], locations)
+
+    @classmethod
+    def from_file(cls, file_name):
+        with open(file_name) as f:
+            d = json.load(f)
+        return cls(d["keys"], d["postings"], d["entries"])
+
+    def to_file(self, file_name):
+        with open(file_name, "w") as f:
+            json.dump({"keys": self.keys, "postings": self.postings,
+                       "entries": [list(entry) for entry in self.entries]}, f)
+
+    def _prefix_range(self, prefix):
+        prefix = prefix.lower()
+        first = bisect.bisect_left(self.keys, prefix)
+        # All keys starting with prefix sort before prefix + a max character
+        last = bisect.bisect_left(self.keys, prefix + "\uffff", first)
+        return first, last
+
+    def lookup(self, name):
+        """
+        :return: GeneLocations of genes with name or name2 equal to name
+        """
+        i = bisect.bisect_left(self.keys, name.lower())
+        if i == len(self.keys) or self.keys[i] != name.lower():
+            return []
+        return [self.entries[j] for j in self.postings[i]]
+
+    def complete(self, prefix, limit=10):
+        """
+        :return: At most limit names (as in the genes file) starting with prefix
+        """
+        first, last = self._prefix_range(prefix)
+        names = []
+        for i in range(first, min(last, first + limit)):
+            entry = self.entries[self.postings[i][0]]
+            names.append(entry.name if entry.name.lower() == self.keys[i]
+                         else entry.name2)
+        return names
+
+    def search(self, prefix, limit=10):
+        """
+        :return: GeneLocations of at most limit genes with a name starting
+            with prefix
+        """
+        first, last = self._prefix_range(prefix)
+        found = []
+        seen = set()
+        for i in range(first, last):
+            for j in self.postings[i]:
+                if j not in seen:
+                    seen.add(j)
+                    found.append(self.entries[j])
+                    if len(found) == limit:
+                        return found
+        return found
+
+
+_loaded = {}
+
+
+def load_gene_index(file_name):
+    """
+    :return: GeneIndex in file_name, read only once (or when the file
+        has changed)
+    """
+    # One index per file, replaced when the file has changed
+    key = os.path.abspath(file_name)
+    mtime = os.path.getmtime(file_name)
+    if key not in _loaded or _loaded[key][0] != mtime:
+        _loaded.pop(key, None)
+        _loaded[key] = (mtime, GeneIndex.from_file(file_name))
+    return _loaded[key][1]
+
+
+def gene_locations(tables, gene_rows, alt_loci):
+    """
+    :param tables: dict from liftover.create_tables
+    :param gene_rows: Rows of a genes file (dicts)
+    :param alt_loci: dict from webtool.read_alt_loci_positions
+    :return: list of GeneLocations
+    """
+    regions = {}
+    for alt_id, info in alt_loci.items():
+        regions.setdefault(info["main_chr"], []).append((alt_id, info))
+
+    genes = []
+    for row in gene_rows:
+        chrom = row["chrom"]
+        if chrom not in tables:
+            continue
+        start, end = int(row["txStart"]), int(row["txEnd"])
+        if chrom in alt_loci:
+            genes.append((row, chrom))
+        for alt_id, info in regions.get(chrom, []):
+            if info["start"] <= start <= info["end"] or \
+                    info["start"] <= end <= info["end"]:
+                genes.append((row, alt_id))
+
+    by_chrom = {}
+    for i, (row, _) in enumerate(genes):
+        by_chrom.setdefault(row["chrom"], []).append(i)
+    notations = [None] * len(genes)
+    for chrom, indexes in by_chrom.items():
+        rows = [genes[i][0] for i in indexes]
+        chrom_notations = tables[chrom].notations(
+            [int(row["txStart"]) for row in rows],
+            [int(row["txEnd"]) for row in rows])
+        for i, notation in zip(indexes, chrom_notations):
+            notations[i] = notation
+
+    return [GeneLocation(row["name"], row.get("name2") or "", alt_id,
+                         row["chrom"], int(row["txStart"]), int(row["txEnd"]),
+                         notation)
+            for (row, alt_id), notation in zip(genes, notations)]
+
+
+def create_gene_index(args):
+    from arraytranslation import load_translation
+    from liftover import create_tables
+    from webtool import read_alt_loci_positions
+    tables = create_tables(load_translation(args.translation_file_name))
+    alt_loci = read_alt_loci_positions(args.alt_locations_file_name)
+    with open(args.genes_file_name) as f:
+        rows = list(csv.DictReader(f, delimiter="\t"))
+    index = GeneIndex.from_locations(gene_locations(tables, rows, alt_loci))
+    index.to_file(args.out_file_name)
+    print("Indexed %d genes (%d names) in %s" % (
+        len(index.entries), len(index.keys), args.out_file_name))
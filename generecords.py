@@ -0,0 +1,140 @@
+"""
+Compact, immutable gene records.
+
+offsetbasedgraph's Gene holds an Interval (with two Position objects and a
+region path list) for the transcription region, the coding region and every
+exon. Some of the library's translation methods change these intervals
+(translate_single_gene_to_aligned_graph changes the end position of the
+transcription region), so genes used to be copied before every translation.
+
+A GeneRecord only stores the columns of the genes file (ints and tuples of
+ints) in __slots__, and cannot be changed. transcription_region,
+coding_region and exons return new Interval objects on every access, so a
+record can be given directly to the library's translation methods without
+copying it.
+"""
+
+import csv
+from collections import defaultdict
+
+
+class GeneRecord(object):
+
+    __slots__ = ("name", "chrom", "strand", "start", "end",
+                 "cds_start", "cds_end", "exon_starts", "exon_ends")
+
+    def __init__(self, name, chrom, strand, start, end, cds_start, cds_end,
+                 exon_starts, exon_ends):
+        values = (name, chrom, strand, start, end, cds_start, cds_end,
+                  tuple(exon_starts), tuple(exon_ends))
+        for slot, value in zip(self.__slots__, values):
+            object.__setattr__(self, slot, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("GeneRecord is immutable")
+
+    def __reduce__(self):
+        return (GeneRecord, tuple(getattr(self, slot) for slot in self.__slots__))
+
+    @classmethod
+    def from_dict(cls, attr_dict):
+        """
+        Create GeneRecord from a row of a genes file (as Gene.from_dict)
+        """
+        return cls(attr_dict["name"], attr_dict["chrom"], attr_dict["strand"],
+                   int(attr_dict["txStart"]), int(attr_dict["txEnd"]),
+                   int(attr_dict["cdsStart"]), int(attr_dict["cdsEnd"]),
+                   [int(i) for i in attr_dict["exonStarts"].split(",")[:-1]],
+                   [int(i) for i in attr_dict["exonEnds"].split(",")[:-1]])
+
+    @property
+    def transcription_region(self):
+        from offsetbasedgraph import Interval
+        return Interval(self.start, self.end, [self.chrom])
+
+    @property
+    def coding_region(self):
+        from offsetbasedgraph import Interval
+        return Interval(self.cds_start, self.cds_end, [self.chrom])
+
+    @property
+    def exons(self):
+        from offsetbasedgraph import Interval
+        return [Interval(start, end, [self.chrom]) for start, end
+                in zip(self.exon_starts, self.exon_ends)]
+
+    @property
+    def transcript_length(self):
+        return sum(end - start for start, end
+                   in zip(self.exon_starts, self.exon_ends))
+
+    def length(self):
+        return self.end - self.start
+
+    def to_gene(self):
+        """
+        :return: offsetbasedgraph Gene with the same intervals
+        """
+        from offsetbasedgraph.gene import Gene
+        return Gene(self.name, self.transcription_region, self.exons,
+                    self.coding_region, self.strand)
+
+    def translate(self, trans):
+        """
+        :return: Translated Gene (as Gene.translate)
+        """
+        from offsetbasedgraph.gene import Gene
+        return Gene(self.name, trans.translate(self.transcription_region),
+                    [trans.translate(exon) for exon in self.exons],
+                    self.coding_region, self.strand)
+
+    def __eq__(self, other):
+        return isinstance(other, GeneRecord) and all(
+            getattr(self, slot) == getattr(other, slot)
+            for slot in self.__slots__ if slot != "name")
+
+    def __hash__(self):
+        return hash((self.chrom, self.start, self.end, self.exon_starts))
+
+    def __str__(self):
+        return "GeneRecord(%s: %s %d-%d, %d exons)" % (
+            self.name, self.chrom, self.start, self.end, len(self.exon_starts))
+
+
+def read_gene_records(file_name):
+    """
+    :return: list of GeneRecords from a genes file (on the format of UCSC)
+    """
+    with open(file_name) as f:
+        return [GeneRecord.from_dict(row)
+                for row in csv.DictReader(f, delimiter="\t")]
+
+
+def create_gene_dicts(genes, alt_loci_fn):
+    """
+    Same as offsetbasedgraph.graphutils.create_gene_dicts, using the
+    columns of the records instead of creating intervals
+
+    :return: alt loci dict, name dict, parallel dict
+    """
+    from offsetbasedgraph.graphutils import get_alt_loci_positions
+    gene_name_dict = defaultdict(list)
+    alt_loci_genes = defaultdict(list)
+    chrom_genes = defaultdict(list)
+    for g in genes:
+        gene_name_dict[g.name].append(g)
+        if "alt" in g.chrom:
+            alt_loci_genes[g.chrom].append(g)
+        else:
+            chrom_genes[g.chrom].append(g)
+
+    alt_infos = get_alt_loci_positions(alt_loci_fn)
+    parallel_genes = defaultdict(list)  # Genes on main path
+    for alt_locus in alt_loci_genes:
+        alt_info = alt_infos[alt_locus]
+        for g in chrom_genes[alt_locus.split("_")[0]]:
+            if alt_info["start"] <= g.start <= alt_info["end"] or \
+                    alt_info["start"] <= g.end <= alt_info["end"]:
+                parallel_genes[alt_locus].append(g)
+
+    return alt_loci_genes, gene_name_dict, parallel_genes
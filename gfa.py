@@ -0,0 +1,216 @@
+"""
+Export and import of graphs in GFA1 format.
+
+A graph (graph2 of a translation created by create_graph or
+merge_all_alignments) is written as:
+
+    S   block id   *   LN:i:length      (one segment per block)
+    L   from   +   to   +   0M          (one link per edge)
+    P   sequence   block1+,block2+,...   *
+
+with one path for every GRCh38 sequence (chromosome or alt locus) in graph1
+of the translation, going through the blocks it is translated to. Sequences
+are not written (the graphs do not store them). Lines are written one at a
+time, so the GFA text is never held in memory.
+
+read_gfa parses the file in chunks of lines, collects segments and links in
+arrays and creates the Graph from these. translation_from_gfa creates the
+translation from the paths, so that a graph can be reloaded without
+building it again.
+"""
+
+import itertools
+from array import array
+import sys
+import numpy as np
+
+CHUNK_SIZE = 100000
+
+
+def _path_intervals(trans):
+    # Yields (sequence, region paths) for every sequence in graph1
+    for sequence in trans.graph1.blocks:
+        intervals = trans._translations(sequence)
+        assert len(intervals) == 1, \
+            "%s is not translated to a single interval" % sequence
+        interval = intervals[0]
+        last_length = trans.graph2.blocks[interval.region_paths[-1]].length()
+        assert interval.start_position.offset == 0 and \
+            interval.end_position.offset == last_length, \
+            "%s does not cover whole blocks" % sequence
+        yield sequence, interval.region_paths
+
+
+def write_gfa(trans, out):
+    """
+    Write graph2 of trans, with paths for the sequences in graph1, to out
+
+    :return: (number of segments, links, paths)
+    """
+    graph = trans.graph2
+    out.write("H\tVN:Z:1.0\n")
+    n_links = 0
+    for block in graph.blocks:
+        out.write("S\t%s\t*\tLN:i:%d\n" % (block, graph.blocks[block].length()))
+    for block in graph.blocks:
+        for target in graph.adj_list[block]:
+            out.write("L\t%s\t+\t%s\t+\t0M\n" % (block, target))
+            n_links += 1
+    n_paths = 0
+    for sequence, region_paths in _path_intervals(trans):
+        out.write("P\t%s\t%s\t*\n" % (
+            sequence, ",".join("%s+" % rp for rp in region_paths)))
+        n_paths += 1
+    return len(graph.blocks), n_links, n_paths
+
+
+def _segment_index(name, index, segment_names, segment_lengths):
+    # Index of the segment, added (with unknown length -1) when the name is
+    # first seen. Links may come before the segments they connect
+    i = index.get(name)
+    if i is None:
+        i = index[name] = len(segment_names)
+        segment_names.append(name)
+        segment_lengths.append(-1)
+    return i
+
+
+def _parse_chunk(lines, index, segment_names, segment_lengths,
+                 sources, targets, paths):
+    for line in lines:
+        if line[0] == "S":
+            columns = line.rstrip("\n").split("\t")
+            length = None
+            for tag in columns[3:]:
+                if tag.startswith("LN:i:"):
+                    length = int(tag[5:])
+            if length is None:
+                if columns[2] == "*":
+                    raise ValueError("Segment %s has no sequence or LN tag"
+                                     % columns[1])
+                length = len(columns[2])
+            i = _segment_index(columns[1], index, segment_names,
+                               segment_lengths)
+            segment_lengths[i] = length
+        elif line[0] == "L":
+            columns = line.rstrip("\n").split("\t")
+            if columns[2] != "+" or columns[4] != "+":
+                raise ValueError("Only links between forward segments are "
+                                 "supported (%s)" % line.strip())
+            if columns[5] not in ("*", "0M"):
+                raise ValueError("Only links without overlap are supported "
+                                 "(%s)" % line.strip())
+            sources.append(_segment_index(columns[1], index, segment_names,
+                                          segment_lengths))
+            targets.append(_segment_index(columns[3], index, segment_names,
+                                          segment_lengths))
+        elif line[0] == "P":
+            columns = line.rstrip("\n").split("\t")
+            steps = columns[2].split(",")
+            if any(step[-1] != "+" for step in steps):
+                raise ValueError("Only paths on forward segments are "
+                                 "supported (%s)" % columns[1])
+            paths.append((columns[1], [step[:-1] for step in steps]))
+
+
+def read_gfa(lines, chunk_size=CHUNK_SIZE):
+    """
+    Segment lengths and link endpoints (as segment indexes) are collected
+    in arrays, not as tuples and strings per link
+
+    :param lines: Iterable of GFA1 lines (e.g. a file)
+    :return: (Graph, list of paths as (name, list of segment names))
+    """
+    from offsetbasedgraph import Block, Graph
+    index = {}
+    segment_names = []
+    segment_lengths = array("q")
+    sources = array("q")
+    targets = array("q")
+    paths = []
+    lines = iter(lines)
+    while True:
+        chunk = list(itertools.islice(lines, chunk_size))
+        if not chunk:
+            break
+        _parse_chunk(chunk, index, segment_names, segment_lengths,
+                     sources, targets, paths)
+
+    lengths = np.frombuffer(segment_lengths, dtype=np.int64)
+    missing = np.flatnonzero(lengths < 0)
+    if len(missing):
+        raise ValueError("Link to missing segment %s"
+                         % segment_names[missing[0]])
+
+    # Group links by source segment
+    sources = np.frombuffer(sources, dtype=np.int64)
+    targets = np.frombuffer(targets, dtype=np.int64)
+    order = np.argsort(sources, kind="stable")
+    sources = sources[order]
+    targets = targets[order]
+    bounds = np.searchsorted(sources, np.arange(len(segment_names) + 1))
+
+    blocks = {name: Block(int(length))
+              for name, length in zip(segment_names, lengths)}
+    adj_list = {}
+    for i in np.flatnonzero(np.diff(bounds)):
+        adj_list[segment_names[i]] = [segment_names[t] for t
+                                      in targets[bounds[i]:bounds[i + 1]]]
+    return Graph(blocks, adj_list), paths
+
+
+def translation_from_gfa(graph, paths):
+    """
+    Create translation from the sequences (paths) to graph, as created
+    by create_graph
+
+    :return: Translation
+    """
+    from offsetbasedgraph import Block, Graph, Interval, Translation
+    sequence_graph = Graph(
+        {name: Block(sum(graph.blocks[rp].length() for rp in region_paths))
+         for name, region_paths in paths}, {})
+
+    a_to_b = {}
+    occurrences = {block: [] for block in graph.blocks}
+    for name, region_paths in paths:
+        a_to_b[name] = [Interval(0, graph.blocks[region_paths[-1]].length(),
+                                 region_paths, graph)]
+        offset = 0
+        for rp in region_paths:
+            length = graph.blocks[rp].length()
+            occurrences[rp].append(
+                Interval(offset, offset + length, [name], sequence_graph))
+            offset += length
+
+    # Blocks shared by main and alt loci are translated to main first
+    b_to_a = {}
+    for block, intervals in occurrences.items():
+        b_to_a[block] = sorted(
+            intervals, key=lambda i: Graph.block_origin(i.region_paths[0]) != "main")
+
+    trans = Translation(a_to_b, b_to_a, graph=sequence_graph)
+    trans.graph2 = graph
+    return trans
+
+
+def graph_to_gfa(args):
+    from arraytranslation import load_translation
+    trans = load_translation(args.translation_file_name)
+    out = sys.stdout if args.out_file_name == "-" else \
+        open(args.out_file_name, "w")
+    n_segments, n_links, n_paths = write_gfa(trans, out)
+    if out is not sys.stdout:
+        out.close()
+    sys.stderr.write("Wrote %d segments, %d links and %d paths\n" %
+                     (n_segments, n_links, n_paths))
+
+
+def gfa_to_graph(args):
+    f = sys.stdin if args.gfa_file_name == "-" else open(args.gfa_file_name)
+    graph, paths = read_gfa(f)
+    if f is not sys.stdin:
+        f.close()
+    trans = translation_from_gfa(graph, paths)
+    trans.to_file(args.out_file_name)
+    print("Graph and translation object stored in %s" % args.out_file_name)
@@ -0,0 +1,298 @@
+"""
+Translation of linear GRCh38 intervals (BED/GFF records) to graph intervals.
+
+The translation created by create_graph maps every chromosome (and alt locus)
+to a single interval on the graph, going through a list of region paths.
+For each chromosome, this is stored as a table of region path starts
+(counted in linear coordinates), so that a batch of intervals can be
+translated with numpy.searchsorted instead of one Translation.translate call
+per interval. The result is the same as Translation.translate(interval).notation().
+
+Input is read in chunks of at most chunk_size lines from a single chromosome,
+so memory usage does not depend on the size of the input file.
+"""
+
+import collections
+import gzip
+import sys
+import numpy as np
+
+NOT_TRANSLATED = "NA"
+
+
+class RegionPathTable(object):
+    """
+    Region paths that a linear chromosome is translated to
+    """
+
+    def __init__(self, region_paths, lengths, start_offset):
+        """
+        :param region_paths: Region path ids in the graph (in order)
+        :param lengths: Length of each region path
+        :param start_offset: Offset in first region path where the
+            chromosome starts
+        """
+        self.region_paths = list(region_paths)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        self.offsets = np.zeros(len(lengths), dtype=np.int64)
+        self.offsets[0] = start_offset
+        # Linear position where each region path starts
+        self.starts = np.zeros(len(lengths), dtype=np.int64)
+        self.starts[1:] = np.cumsum(lengths[:-1] - self.offsets[:-1])
+        self.length = int(np.sum(lengths) - start_offset)
+
+    @classmethod
+    def from_translation(cls, trans, chromosome):
+        intervals = trans._translations(chromosome)
+        assert len(intervals) == 1, \
+            "%s is not translated to a single interval" % chromosome
+        interval = intervals[0]
+        # Same region path lengths as used by Translation.translate_position
+        if trans.block_lengths is not None:
+            lengths = [trans.block_lengths[rp] for rp in interval.region_paths]
+        else:
+            lengths = [trans._translations(rp, inverse=True)[0].length()
+                       for rp in interval.region_paths]
+        return cls(interval.region_paths, lengths,
+                   interval.start_position.offset)
+
+    def _locate(self, starts, ends):
+        # Returns first and last region path index, start and end offsets
+        # and whether each interval is on the chromosome
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        # Translate inclusive end, except for empty intervals
+        last = np.where(ends > starts, ends - 1, starts)
+        first_rp = np.searchsorted(self.starts, starts, side="right") - 1
+        last_rp = np.searchsorted(self.starts, last, side="right") - 1
+        start_offsets = starts - self.starts[first_rp] + self.offsets[first_rp]
+        end_offsets = last - self.starts[last_rp] + self.offsets[last_rp] + \
+            (ends > starts)
+        valid = (starts >= 0) & (starts <= last) & (last < self.length)
+        return first_rp, last_rp, start_offsets, end_offsets, valid
+
+    def notations(self, starts, ends):
+        """
+        :param starts: Array of start positions (0-based)
+        :param ends: Array of end positions (exclusive)
+        :return: List of graph notations (as Interval.notation())
+        """
+        first_rp, last_rp, start_offsets, end_offsets, valid = \
+            self._locate(starts, ends)
+        notations = []
+        for i in range(len(first_rp)):
+            if not valid[i]:
+                notations.append(NOT_TRANSLATED)
+                continue
+            notations.append("%d, %d, [%s]" % (
+                start_offsets[i], end_offsets[i],
+                ', '.join(self.region_paths[first_rp[i]:last_rp[i] + 1])))
+        return notations
+
+    def region_paths_of(self, starts, ends):
+        """
+        :return: List of region paths each interval goes through
+            (None for intervals not on the chromosome)
+        """
+        first_rp, last_rp, _, _, valid = self._locate(starts, ends)
+        return [self.region_paths[first_rp[i]:last_rp[i] + 1] if valid[i]
+                else None for i in range(len(first_rp))]
+
+    def intervals(self, starts, ends, graph=None):
+        """
+        :return: List of Intervals on graph (as Translation.translate(interval))
+        """
+        from offsetbasedgraph import Interval
+        first_rp, last_rp, start_offsets, end_offsets, valid = \
+            self._locate(starts, ends)
+        assert np.all(valid), "Intervals outside chromosome"
+        return [Interval(int(start_offsets[i]), int(end_offsets[i]),
+                         self.region_paths[first_rp[i]:last_rp[i] + 1], graph)
+                for i in range(len(first_rp))]
+
+
+def create_tables(trans):
+    """
+    :return: dict{chromosome: RegionPathTable} for all blocks in trans.graph1
+    """
+    return {chromosome: RegionPathTable.from_translation(trans, chromosome)
+            for chromosome in trans.graph1.blocks}
+
+
+def translate_genes(tables, genes, graph=None):
+    """
+    Translate genes (GeneRecords) with one call per chromosome for all
+    transcription regions and one for all exons
+
+    :return: list of Genes (as gene.translate(trans))
+    """
+    from offsetbasedgraph.gene import Gene
+    translated = [None] * len(genes)
+    by_chrom = collections.defaultdict(list)
+    for i, gene in enumerate(genes):
+        by_chrom[gene.chrom].append(i)
+
+    for chrom, indexes in by_chrom.items():
+        table = tables[chrom]
+        regions = table.intervals([genes[i].start for i in indexes],
+                                  [genes[i].end for i in indexes], graph)
+        exon_starts = [s for i in indexes for s in genes[i].exon_starts]
+        exon_ends = [e for i in indexes for e in genes[i].exon_ends]
+        exons = table.intervals(exon_starts, exon_ends, graph)
+        n = 0
+        for i, region in zip(indexes, regions):
+            gene = genes[i]
+            n_exons = len(gene.exon_starts)
+            translated[i] = Gene(gene.name, region, exons[n:n + n_exons],
+                                 gene.coding_region, gene.strand)
+            n += n_exons
+    return translated
+
+
+def parse_record(line, file_format):
+    """
+    :return: (chromosome, start, end) with 0-based start and exclusive end,
+        or None for header/comment lines
+    """
+    if line.startswith(("#", "track", "browser")) or not line.strip():
+        return None
+    columns = line.split("\t")
+    if file_format == "gff":
+        # 1-based, inclusive coordinates
+        return columns[0], int(columns[3]) - 1, int(columns[4])
+    return columns[0], int(columns[1]), int(columns[2])
+
+
+def read_chunks(lines, file_format, chunk_size):
+    """
+    Yields (chromosome, lines, starts, ends) with at most chunk_size
+    consecutive records from the same chromosome
+    """
+    chromosome = None
+    chunk = ([], [], [])
+    for line in lines:
+        record = parse_record(line, file_format)
+        if record is None:
+            continue
+        if record[0] != chromosome or len(chunk[0]) >= chunk_size:
+            if chunk[0]:
+                yield (chromosome,) + chunk
+            chromosome = record[0]
+            chunk = ([], [], [])
+        chunk[0].append(line.rstrip("\n"))
+        chunk[1].append(record[1])
+        chunk[2].append(record[2])
+
+    if chunk[0]:
+        yield (chromosome,) + chunk
+
+
+def translate_chunk(tables, chunk):
+    """
+    :return: (output lines (input line followed by graph notation),
+        number of records not translated)
+    """
+    chromosome, lines, starts, ends = chunk
+    if chromosome in tables:
+        notations = tables[chromosome].notations(starts, ends)
+    else:
+        notations = [NOT_TRANSLATED] * len(lines)
+    out_lines = ["%s\t%s\n" % (line, notation)
+                 for line, notation in zip(lines, notations)]
+    return out_lines, notations.count(NOT_TRANSLATED)
+
+
+_worker_tables = None
+
+
+def _init_worker(tables):
+    global _worker_tables
+    _worker_tables = tables
+
+
+def _translate_chunk_task(chunk):
+    return translate_chunk(_worker_tables, chunk)
+
+
+def _open(file_name, mode="r"):
+    # Files ending with .gz are gzipped
+    if file_name.endswith(".gz"):
+        return gzip.open(file_name, mode + "t")
+    return open(file_name, mode)
+
+
+def guess_format(file_name):
+    name = file_name[:-3] if file_name.endswith(".gz") else file_name
+    if name.endswith((".gff", ".gff3", ".gtf")):
+        return "gff"
+    return "bed"
+
+
+def translate_records(tables, lines, out, file_format="bed",
+                      chunk_size=100000, processes=1):
+    """
+    Translate records from lines and write them to out in the same order
+
+    :return: (number of records, number of records not translated)
+    """
+    n_records = 0
+    n_not_translated = 0
+
+    def write(result):
+        out_lines, n = result
+        out.writelines(out_lines)
+        return n
+
+    chunks = read_chunks(lines, file_format, chunk_size)
+    if processes > 1:
+        # Keep at most two chunks per process in memory (Pool.imap would
+        # read the whole input before returning)
+        import multiprocessing
+        # Workers (and queued chunks) are terminated when leaving the with
+        # block, e.g. if a line can not be parsed or a chunk fails
+        with multiprocessing.Pool(processes, _init_worker, (tables,)) as pool:
+            pending = collections.deque()
+            for chunk in chunks:
+                n_records += len(chunk[1])
+                pending.append(pool.apply_async(_translate_chunk_task, (chunk,)))
+                if len(pending) >= 2 * processes:
+                    n_not_translated += write(pending.popleft().get())
+            while pending:
+                n_not_translated += write(pending.popleft().get())
+            pool.close()
+            pool.join()
+    else:
+        for chunk in chunks:
+            n_records += len(chunk[1])
+            n_not_translated += write(translate_chunk(tables, chunk))
+
+    return n_records, n_not_translated
+
+
+def translate_intervals(args):
+    from arraytranslation import load_translation
+    from profiling import profiler
+
+    with profiler.stage("load translation"):
+        trans = load_translation(args.translation_file_name)
+        tables = create_tables(trans)
+
+    file_format = args.format or guess_format(args.in_file_name)
+    with profiler.stage("translation"):
+        f = sys.stdin if args.in_file_name == "-" else _open(args.in_file_name)
+        out = sys.stdout if args.out_file_name == "-" else \
+            _open(args.out_file_name, "w")
+        try:
+            n_records, n_not_translated = translate_records(
+                tables, f, out, file_format, args.chunk_size, args.processes)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+            if out is not sys.stdout:
+                out.close()
+
+    sys.stderr.write("Translated %d records" % (n_records - n_not_translated))
+    if n_not_translated:
+        sys.stderr.write(" (%d records outside the graph written with %s)" %
+                         (n_not_translated, NOT_TRANSLATED))
+    sys.stderr.write("\n")
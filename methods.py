@@ -1,32 +1,123 @@
 from offsetbasedgraph import Graph, Translation
 from offsetbasedgraph.gene import GeneList
+import os
 import sys
+import time
+from contextlib import contextmanager
 
 from offsetbasedgraph.graphutils import *
+from profiling import profiler
+from progress import ProgressReporter
+from cache import DiskCache, file_hash
+from sharedgraph import LoadedGraphs
+from nametable import NameTable
+from arraytranslation import load_translation
+from generecords import read_gene_records, create_gene_dicts
+from results import result_store
+from webtool import read_alt_loci_positions
+
+# Translations, genes and graphs loaded by earlier jobs when running
+# several jobs in one process (see batch.py). None when not enabled.
+_shared_state = None
+
+
+def enable_shared_state():
+    global _shared_state
+    _shared_state = {}
+
+
+def _shared(key, create):
+    # Returns create(), reusing the result of earlier calls with the same
+    # key if shared state is enabled
+    if _shared_state is None:
+        return create()
+    if key not in _shared_state:
+        _shared_state[key] = create()
+    return _shared_state[key]
+
+
+def _shared_file(kind, file_name, create):
+    # As _shared, for data of a kind read from file_name. When the file has
+    # changed (e.g. written again by create_graph in an earlier job), the
+    # data is read again and replaces the data read earlier
+    if _shared_state is None:
+        return create()
+    key = (kind, os.path.abspath(file_name))
+    mtime = os.path.getmtime(file_name)
+    if key not in _shared_state or _shared_state[key][0] != mtime:
+        _shared_state.pop(key, None)  # Free earlier data before reading
+        _shared_state[key] = (mtime, create())
+    return _shared_state[key][1]
+
+
+def _file_key(file_name):
+    # Cache key parts for a file, changing when the file is written again
+    return os.path.abspath(file_name), os.path.getmtime(file_name)
+
+
+def _load_translation(file_name):
+    return _shared_file("translation", file_name,
+                        lambda: load_translation(file_name))
+
+
+def _load_genes(file_name):
+    # GeneRecords are immutable, so jobs can share them without copying
+    return _shared_file("genes", file_name,
+                        lambda: read_gene_records(file_name))
 
 
 def create_graph(args):
-    graph = create_initial_grch38_graph(args.chrom_sizes_file_name)
-    numeric_graph, name_translation = convert_to_numeric_graph(graph)
-    new_numeric_graph, numeric_translation = connect_without_flanks(
-        numeric_graph, args.alt_locations_file_name, name_translation)
-    name_graph, new_name_translation = convert_to_text_graph(
-        new_numeric_graph, name_translation, numeric_translation)
-    final_translation = name_translation + numeric_translation + new_name_translation
-    final_translation.graph2 = name_graph
-
-    final_translation.to_file(args.out_file_name)
+    with profiler.stage("graph creation"):
+        names = NameTable.from_chrom_sizes(args.chrom_sizes_file_name)
+    if getattr(args, "segmented", False):
+        from segmentedgraph import create_segmented_graph
+        create_segmented_graph(names, args.alt_locations_file_name,
+                               args.out_file_name)
+        return
+
+    with profiler.stage("flank merge"):
+        new_numeric_graph, numeric_translation = connect_without_flanks(
+            names.graph2, args.alt_locations_file_name, names)
+    with profiler.stage("text conversion"):
+        final_translation = names.text_translation(
+            new_numeric_graph, numeric_translation)
+
+    with profiler.stage("write translation"):
+        final_translation.to_file(args.out_file_name)
     print("Graph and translation object stored in %s" % (args.out_file_name))
 
 
 def check_duplicate_genes(args):
     genes_file_name = args.genes_file_name
-    final_trans = Translation.from_file(args.translation_file_name)
-    genes = get_gene_objects_as_intervals(genes_file_name, final_trans.graph1)
-    analyze_genes_on_merged_graph(genes, final_trans)
+    with profiler.stage("load translation"):
+        final_trans = _load_translation(args.translation_file_name)
+    with profiler.stage("gene load"):
+        genes = _load_genes(genes_file_name)
+    with profiler.stage("translation and comparison"):
+        matchings, records = _gene_matchings(genes, final_trans)
+    print(matchings)
+    for match in matchings.matches:
+        record = records[id(match.alt_gene)]
+        result_store.add_gene(record.chrom, record, "score", match.score,
+                              text=match.category)
     # print(genes_file_name)
 
 
+def _gene_matchings(genes, translation):
+    # Same as offsetbasedgraph.graphutils.analyze_genes_on_merged_graph
+    # (without writing the translated genes to file). Returns GeneMatchings
+    # and dict from id of translated gene to gene
+    from offsetbasedgraph.genematcher import GeneMatchings
+    translation.block_lengths = None
+    translated = [gene.translate(translation) for gene in genes]
+    graph = translated[0].transcription_region.graph
+    graph.critical_blocks = graph.find_all_critical_blocks()
+    alt_genes = GeneList([t for g, t in zip(genes, translated) if "alt" in g.chrom])
+    main_genes = GeneList([t for g, t in zip(genes, translated) if "alt" not in g.chrom])
+    records = {id(t): g for g, t in zip(genes, translated)}
+    return GeneMatchings(alt_genes, main_genes), records
+
+
 def merge_alignment(args):
     # For every alt loci, create complex graph,translate genes and analyse them
     text_graph = create_initial_grch38_graph(args.chrom_sizes_file_name)
@@ -84,87 +175,159 @@ def merge_all_alignments(args):
     full_trans.to_file(args.out_file_name)
 
 
-def visualize_alt_locus_wrapper(args, quiet=False):
+def _create_alt_locus_graph(chrom_sizes_file_name, alt_locations_file_name,
+                            alt_locus):
+    # Returns translation from GRCh38 to a graph where only
+    # the flanks of alt_locus are merged
+    with profiler.stage("graph creation"):
+        names = NameTable.from_chrom_sizes(chrom_sizes_file_name)
 
-    if not quiet:
-        print("<div style='display: none'>")
+    with profiler.stage("flank merge"):
+        new_numeric_graph, numeric_translation = connect_without_flanks(
+            names.graph2, alt_locations_file_name, names, [alt_locus])
 
-    # Finds correct gene file etc
-    chrom = args.alt_locus.split("_")[0]
-    args.genes = "data/genes/genes_refseq_%s.txt" % (chrom)
+    with profiler.stage("text conversion"):
+        final_translation = names.text_translation(
+            new_numeric_graph, numeric_translation)
 
-    # Create graph only for this alt loci
-    graph = create_initial_grch38_graph("data/grch38.chrom.sizes")
-    #graph.to_file("graph_non_connected")
-    #graph = Graph.from_file("graph_non_connected")
+    return final_translation
 
-    #print("Convert to numeric")
-    numeric_graph, name_translation = convert_to_numeric_graph(graph)
-    #name_translation.to_file("name_trans_non_connected")
 
-    #print("Convert without flanks")
-    new_numeric_graph, numeric_translation = connect_without_flanks(
-        numeric_graph, "data/grch38_alt_loci.txt", name_translation, [args.alt_locus])
+def visualization_genes_file(alt_locus):
+    # Genes file used by visualize_alt_locus_wrapper
+    chrom = alt_locus.split("_")[0]
+    return "data/genes/genes_refseq_%s.txt" % (chrom)
 
-    name_graph, new_name_translation = convert_to_text_graph(
-        new_numeric_graph, name_translation, numeric_translation)
 
-    final_translation = name_translation + numeric_translation + new_name_translation
-    final_translation.graph2 = name_graph
-    #final_translation.to_file("tmp_trans")
+def visualize_alt_locus_wrapper(args, quiet=False):
 
-    args.translation_file_name = final_translation
+    if not quiet:
+        print("<div style='display: none'>")
+
+    # Finds correct gene file etc
+    args.genes = visualization_genes_file(args.alt_locus)
+    chrom_sizes_file_name = "data/grch38.chrom.sizes"
     args.alt_locations_file_name = 'data/grch38_alt_loci.txt'
 
+    # Create graph only for this alt loci (or get it from cache). The graph
+    # is not kept in shared state, as there is one for every alt locus
+    cache = _open_cache(args, "data/tmp/cache")
+    graph_key = ("flank_merged_graph", args.alt_locus,
+                 file_hash(chrom_sizes_file_name),
+                 file_hash(args.alt_locations_file_name))
+
+    final_translation = None
+    if cache is not None:
+        key = cache.key(*graph_key)
+        final_translation = cache.get(key)
+
+    if final_translation is None:
+        final_translation = _create_alt_locus_graph(
+            chrom_sizes_file_name, args.alt_locations_file_name, args.alt_locus)
+        if cache is not None:
+            cache.put(key, final_translation)
+    args.translation_file_name = final_translation
+
     if not quiet:
         print("</div>")
     #return
-    visualize_alt_locus(args, True, quiet)
+    visualize_alt_locus(args, True, quiet, cache=cache, graph_key=graph_key)
+
+
+def _select_genes_to_visualize(genes, tables, min_length=100, max_genes=40):
+    # Returns the first max_genes genes longer than min_length that are not
+    # on multiple alt loci in the graph. Uses the gene columns and the region
+    # paths in tables, so that only the selected genes need to be translated
+    selected = []
+    for gene in genes:
+        if gene.length() <= min_length:
+            continue
+        region_paths = tables[gene.chrom].region_paths_of(
+            [gene.start], [gene.end])[0]
+        alt_loci = set(rp for rp in region_paths
+                       if Graph.block_origin(rp) == "alt")
+        if len(alt_loci) > 1:
+            continue
+        selected.append(gene)
+        if len(selected) >= max_genes:
+            break
+    return selected
 
 
-def visualize_alt_locus(args, skip_wrapping=False, quiet=False):
-    from offsetbasedgraph.graphutils import GeneList, \
-        create_gene_dicts, create_subgraph_around_alt_locus
+def _create_locus_layout(trans, alt_locus, alt_locations_file_name):
+    # Layout of the subgraph around the alt locus (see visualizationlayout.py)
+    from offsetbasedgraph.graphutils import create_subgraph_around_alt_locus
+    from visualizationlayout import LocusLayout
+    orig_trans = trans.copy()
+    subgraph, trans, start_position = create_subgraph_around_alt_locus(
+        trans.graph2, trans, alt_locus, 200000, alt_loci_fn=alt_locations_file_name)
+    start_position = orig_trans.translate_position(start_position, True)[0]
+    return LocusLayout.from_graph(subgraph, start_position)
+
+
+def _locus_layout(trans, args, cache=None, graph_key=None):
+    # Returns LocusLayout for args.alt_locus, computed once for each graph
+    # (kept in the DiskCache and in the shared state). graph_key identifies
+    # the graph when args.translation_file_name is a Translation object
+    if cache is None and _shared_state is None:
+        graph_key = None
+    elif graph_key is None and not isinstance(args.translation_file_name, Translation):
+        # Not hashing the translation file, which can be large
+        graph_key = ("translation", os.path.getsize(args.translation_file_name)) \
+            + _file_key(args.translation_file_name)
+    if graph_key is None:
+        return _create_locus_layout(trans, args.alt_locus,
+                                    args.alt_locations_file_name)
+
+    key_parts = ("visualization_layout", args.alt_locus,
+                 file_hash(args.alt_locations_file_name)) + tuple(graph_key)
+
+    def create_layout():
+        layout = None
+        if cache is not None:
+            key = cache.key(*key_parts)
+            layout = cache.get(key)
+        if layout is None:
+            layout = _create_locus_layout(trans, args.alt_locus,
+                                          args.alt_locations_file_name)
+            if cache is not None:
+                cache.put(key, layout)
+        return layout
+
+    return _shared(key_parts, create_layout)
+
+
+def visualize_alt_locus(args, skip_wrapping=False, quiet=False, cache=None,
+                        graph_key=None):
+    from liftover import RegionPathTable, translate_genes
 
     if not isinstance(args.translation_file_name, Translation):
-        trans = Translation.from_file(args.translation_file_name)
+        with profiler.stage("load translation"):
+            trans = _load_translation(args.translation_file_name)
     else:
         trans = args.translation_file_name
 
     graph = trans.graph2
-    orig_trans = trans.copy()
+    with profiler.stage("layout"):
+        layout = _locus_layout(trans, args, cache or _open_cache(args), graph_key)
 
     # Find all genes on this graph
-    genes = GeneList(get_gene_objects_as_intervals(args.genes)).gene_list
-
-    alt_loci_genes, gene_name_dict, main_genes = create_gene_dicts(genes, alt_loci_fn=args.alt_locations_file_name)
-    genes = main_genes[args.alt_locus] + alt_loci_genes[args.alt_locus]
-    genes = [g.translate(trans) for g in genes]
-    subgraph, trans, start_position = create_subgraph_around_alt_locus(graph, trans, args.alt_locus, 200000, alt_loci_fn=args.alt_locations_file_name)
-
-    start_position = orig_trans.translate_position(start_position, True)[0]
-
-    genes = [g for g in genes if not g.multiple_alt_loci() and g.transcription_region.length() > 100]
-
-
-    if len(genes) > 40:
-        genes = genes[0:40]
-
-    levels = Graph.level_dict(subgraph.blocks)
-
-    # Find start block by choosing a block having no edges in
-    start = None
-    for b in subgraph.blocks:
-        if len(subgraph.reverse_adj_list[b]) == 0:
-            start = b
-            break
-
-    assert start is not None
+    with profiler.stage("gene load"):
+        genes = _load_genes(args.genes)
+
+        alt_loci_genes, gene_name_dict, main_genes = create_gene_dicts(genes, alt_loci_fn=args.alt_locations_file_name)
+        genes = main_genes[args.alt_locus] + alt_loci_genes[args.alt_locus]
+    with profiler.stage("gene selection"):
+        tables = {chrom: RegionPathTable.from_translation(trans, chrom)
+                  for chrom in set(g.chrom for g in genes)}
+        genes = _select_genes_to_visualize(genes, tables)
+    with profiler.stage("translation"):
+        genes = translate_genes(tables, genes, graph)
 
     from visualizehtml import VisualizeHtml
-    subgraph.start_block = start
-    max_offset = sum([subgraph.blocks[b].length() for b in subgraph.blocks])
-    v = VisualizeHtml(subgraph, 0, max_offset, 0, levels, "", 800, genes, start_position)
+    with profiler.stage("gene overlay"):
+        v = VisualizeHtml(None, 0, layout.total_length, 0, None, "", 800, genes,
+                          layout=layout)
 
     if quiet:
         return
@@ -175,62 +338,347 @@ def visualize_alt_locus(args, skip_wrapping=False, quiet=False):
         print(v.get_wrapped_html())
 
 
-def _analyse_multipath_genes_on_graph(genes_list, genes_against, graph):
+def _translate_genes(genes, translate_func, description):
+    # Translates genes with translate_func while reporting progress
+    progress = ProgressReporter(description, len(genes))
+    translated = []
+    for gene in genes:
+        translated.append(translate_func(gene))
+        progress.update()
+    progress.finish()
+    return translated
+
+
+def _analyse_multipath_genes_on_graph(genes_list, genes_against, graph,
+                                      alt_id=None, records=None):
     # Takes a list of mp genes and a graph
     # Returns number of equal exons and equal genes
+    # Number of matches of each gene is stored in result_store (with the
+    # gene in records at the same index)
     equal = 0
     equal_exons = 0
-    n = 1
-    for g in genes_list:
-        if n % 1000 == 0:
-            print("Checked %d genes" % n)
-        n += 1
+    progress = ProgressReporter("Comparing genes", len(genes_list))
+    for i, g in enumerate(genes_list):
+        progress.update()
+        gene_equal = 0
+        gene_equal_exons = 0
 
         for g2 in genes_against:
             if g is g2:
                 continue
 
             if g == g2:
-                equal += 1
+                gene_equal += 1
 
             if g.faster_equal_critical_intervals(g2):
-                equal_exons += 1
+                gene_equal_exons += 1
+
+        equal += gene_equal
+        equal_exons += gene_equal_exons
+        if records is not None:
+            result_store.add_gene(alt_id, records[i], "equal", gene_equal)
+            result_store.add_gene(alt_id, records[i], "equal_exons", gene_equal_exons)
 
+    progress.finish()
     return equal, equal_exons
 
 
+DEFAULT_CACHE_SIZE = 2000  # MB
+
+
+def _open_cache(args, default_dir=None):
+    # Returns DiskCache from args.cache_dir and args.cache_size (or None)
+    cache_dir = getattr(args, "cache_dir", default_dir)
+    if cache_dir is None:
+        return None
+    max_size = getattr(args, "cache_size", DEFAULT_CACHE_SIZE)
+    return DiskCache(cache_dir, max_size * 1024 * 1024)
+
+
+def _sequences_key(sequence_store):
+    # Cache key parts for where sequences are read from
+    if sequence_store is None:
+        return ()
+    return ("sequence_store", sequence_store.checksum)
+
+
+def _open_sequence_store(file_name):
+    # Returns SequenceStore (memory mapped), or None if file_name is None
+    if file_name is None:
+        return None
+    from sequencestore import SequenceStore
+    return _shared_file("sequence_store", file_name,
+                        lambda: SequenceStore.from_file(file_name))
+
+
+def _merge_alt_locus(graphs, alt_id, ncbi_alignments_dir,
+                     cache=None, chrom_sizes_key="", sequence_store=None):
+    # Returns translation and complex graph for alt locus merged using
+    # cigar. Uses cache (if given) keyed by the alignment and chrom sizes files.
+    # graphs is a LoadedGraphs or SharedGraph (see sharedgraph.py). The
+    # graphs only have the blocks of the alt locus and main chromosome.
+    # Sequences are read from sequence_store (see sequencestore.py) if given
+    alignment_file = os.path.join(ncbi_alignments_dir, "%s.alignment" % alt_id)
+    key = None
+    if cache is not None and os.path.isfile(alignment_file):
+        key = cache.key("merged_locus_graph", NameTable.ID_SCHEME, alt_id, file_hash(alignment_file),
+                        chrom_sizes_key, *_sequences_key(sequence_store))
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    graph, name_trans = graphs.locus_graphs(alt_id)
+    if sequence_store is not None:
+        from sequencestore import merge_alt_using_sequence_store
+        trans, complex_graph = merge_alt_using_sequence_store(
+            graph, name_trans, alt_id, ncbi_alignments_dir, sequence_store)
+    else:
+        trans, complex_graph = merge_alt_using_cigar(
+            graph, name_trans, alt_id, ncbi_alignments_dir)
+    if key is not None:
+        cache.put(key, (trans, complex_graph))
+    return trans, complex_graph
+
+
+def _analyse_fuzzy_genes_for_alt(alt_id, genes_here, genes_main,
+                                 graphs, ncbi_alignments_dir,
+                                 cache=None, genes_key="", chrom_sizes_key="",
+                                 sequence_store=None):
+    # Returns number of genes on alt locus with identical fuzzy
+    # multipath interval representation as a gene on main
+    from offsetbasedgraph.graphutils import _analyse_fuzzy_genes_on_graph
+    print("Analysing genes on alt locus %s" % alt_id)
+    if not (genes_here and genes_main):
+        return 0
+
+    with profiler.stage("cigar merge", alt_locus=alt_id):
+        trans, complex_graph = _merge_alt_locus(
+            graphs, alt_id, ncbi_alignments_dir, cache, chrom_sizes_key,
+            sequence_store)
+
+    alignment_file = os.path.join(ncbi_alignments_dir, "%s.alignment" % alt_id)
+    key = None
+    cached = None
+    if cache is not None and os.path.isfile(alignment_file):
+        key = cache.key("fuzzy_genes", NameTable.ID_SCHEME, alt_id, file_hash(alignment_file),
+                        chrom_sizes_key, genes_key, *_sequences_key(sequence_store))
+        cached = cache.get(key)
+
+    with profiler.stage("translation", alt_locus=alt_id):
+        if cached is not None:
+            genes_against_translated, genes_here_translated = cached
+        else:
+            full_trans = graphs.locus_graphs(alt_id)[1].compose(trans)
+
+            # Find candidates on main path to check against:
+            genes_against_translated = _translate_genes(
+                genes_main,
+                lambda g: translate_to_fuzzy_interval(g, full_trans),
+                "Translating main genes")
+            genes_here_translated = _translate_genes(
+                genes_here,
+                lambda g: translate_to_fuzzy_interval(g, full_trans),
+                "Translating alt genes")
+            if key is not None:
+                cache.put(key, (genes_against_translated,
+                                genes_here_translated))
+
+    with profiler.stage("comparison", alt_locus=alt_id):
+        return _analyse_fuzzy_genes_on_graph(
+            genes_here_translated,
+            genes_against_translated,
+            complex_graph)
+
+
+# State shared by all tasks in a worker process (set by _init_fuzzy_worker)
+_fuzzy_worker_state = {}
+
+
+def _init_fuzzy_worker(graphs, ncbi_alignments_dir, cache,
+                       genes_key, chrom_sizes_key, sequence_store_file_name=None):
+    # graphs is a handle to a SharedGraph when run in a worker process
+    if isinstance(graphs, tuple):
+        from sharedgraph import SharedGraph
+        graphs = SharedGraph.attach(graphs)
+    _fuzzy_worker_state["sequence_store"] = _open_sequence_store(
+        sequence_store_file_name)
+    _fuzzy_worker_state["graphs"] = graphs
+    _fuzzy_worker_state["ncbi_alignments_dir"] = ncbi_alignments_dir
+    _fuzzy_worker_state["cache"] = cache
+    _fuzzy_worker_state["genes_key"] = genes_key
+    _fuzzy_worker_state["chrom_sizes_key"] = chrom_sizes_key
+
+
+def _fuzzy_locus_task(task):
+    alt_id, genes_here, genes_main = task
+    state = _fuzzy_worker_state
+    return alt_id, _analyse_fuzzy_genes_for_alt(
+        alt_id, genes_here, genes_main, state["graphs"],
+        state["ncbi_alignments_dir"], state["cache"], state["genes_key"],
+        state["chrom_sizes_key"], state["sequence_store"])
+
+
 def analyze_fuzzy_genes(args):
-    genes = get_gene_objects_as_intervals(args.genes_file_name)
-    text_graph = create_initial_grch38_graph(args.chrom_sizes_file_name)
-    return fuzzy_gene_analysis(genes, text_graph, args.ncbi_alignments_dir,
-                               args.alt_locations_file_name)
+    # Map: analyse each alt locus separately (in parallel if processes > 1)
+    # Reduce: sum number of genes with identical representation
+    processes = getattr(args, "processes", 1)
+    cache = _open_cache(args)
+    with profiler.stage("gene load"):
+        genes = _load_genes(args.genes_file_name)
+        alt_loci_genes, gene_name_dict, main_genes = create_gene_dicts(
+            genes, args.alt_locations_file_name)
+    with profiler.stage("graph creation"):
+        names = NameTable.from_chrom_sizes(args.chrom_sizes_file_name)
+
+    init_args = (args.ncbi_alignments_dir, cache,
+                 file_hash(args.genes_file_name),
+                 file_hash(args.chrom_sizes_file_name),
+                 getattr(args, "sequence_store", None))
+    tasks = [(b, alt_loci_genes[b], main_genes[b])
+             for b in names.names if "alt" in b]
+
+    equal_total = 0
+    with profiler.stage("fuzzy analysis"):
+        if processes > 1:
+            # Workers attach to graph in shared memory instead of getting a copy
+            import multiprocessing
+            from sharedgraph import SharedGraph
+            shared_graph = SharedGraph.from_name_table(
+                names).to_shared_memory()
+            try:
+                # Workers are terminated when leaving the with block (if a
+                # task raises), and shared memory is always freed
+                with multiprocessing.Pool(
+                        processes, _init_fuzzy_worker,
+                        (shared_graph.handle(),) + init_args) as pool:
+                    results = list(pool.imap_unordered(_fuzzy_locus_task, tasks))
+                    pool.close()
+                    pool.join()
+            finally:
+                shared_graph.unlink()
+        else:
+            _init_fuzzy_worker(LoadedGraphs(names.graph2, names), *init_args)
+            results = map(_fuzzy_locus_task, tasks)
+
+        for alt_id, n_equal in results:
+            equal_total += n_equal
+            result_store.add_locus(alt_id, "equal", n_equal)
+
+    result_store.add_locus(None, "equal", equal_total)
+    print("RESULTS:")
+    print("%d genes on alternative loci have identical representation "
+          "as at least one gene from the main chromosome." % equal_total)
+    print("In total %d genes on alt loci" % len(alt_loci_genes))
+
+
+def analyse_similarity(args):
+    # For every alt locus, compares the exons of alt and main transcripts on
+    # the merged graph and prints the distribution of the best Jaccard score
+    # of each alt transcript (see similarity.py)
+    import numpy as np
+    from similarity import block_offsets, exon_segments, \
+        similarity_matrices, best_match_histogram, N_BINS
+    with profiler.stage("gene load"):
+        genes = _load_genes(args.genes_file_name)
+        alt_loci_genes, gene_name_dict, main_genes = create_gene_dicts(
+            genes, args.alt_locations_file_name)
+    with profiler.stage("graph creation"):
+        names = NameTable.from_chrom_sizes(args.chrom_sizes_file_name)
+    graphs = LoadedGraphs(names.graph2, names)
+
+    cache = _open_cache(args)
+    chrom_sizes_key = file_hash(args.chrom_sizes_file_name)
+    sequence_store = _open_sequence_store(getattr(args, "sequence_store", None))
+    bins = ["%.1f-%.1f" % (i / N_BINS, (i + 1) / N_BINS) for i in range(N_BINS)]
+    print("\t".join(["alt_locus", "alt_transcripts", "main_transcripts",
+                     "overlapping_pairs", "identical"] + bins))
+    histogram_total = np.zeros(N_BINS, dtype=np.int64)
+    n_pairs_total = 0
+    n_identical_total = 0
+    for b in names.names:
+        if "alt" not in b or not (alt_loci_genes[b] and main_genes[b]):
+            continue
+
+        locus_start = time.time()
+        with profiler.stage("cigar merge", alt_locus=b):
+            trans, complex_graph = _merge_alt_locus(
+                graphs, b, args.ncbi_alignments_dir, cache,
+                chrom_sizes_key, sequence_store)
+            full_trans = names.compose(trans)
+
+        with profiler.stage("translation", alt_locus=b):
+            offsets = block_offsets(complex_graph)
+            alt_segments, main_segments = [
+                _translate_genes(
+                    locus_genes,
+                    lambda g: exon_segments(
+                        [full_trans.translate(exon) for exon in g.exons],
+                        complex_graph, offsets),
+                    description)
+                for locus_genes, description in
+                ((alt_loci_genes[b], "Translating alt genes"),
+                 (main_genes[b], "Translating main genes"))]
+
+        with profiler.stage("comparison", alt_locus=b):
+            overlap, jaccard = similarity_matrices(alt_segments, main_segments)
+            histogram = best_match_histogram(jaccard)
+            n_pairs = int(np.count_nonzero(overlap))
+            n_identical = int(np.count_nonzero(jaccard.max(axis=1) == 1))
+
+        print("\t".join(str(v) for v in
+                        [b, len(alt_segments), len(main_segments), n_pairs,
+                         n_identical] + list(histogram)))
+        result_store.add_locus(b, "overlapping_pairs", n_pairs)
+        result_store.add_locus(b, "identical", n_identical)
+        result_store.add_locus(b, "time", time.time() - locus_start)
+        best = jaccard.argmax(axis=1)
+        for i, gene in enumerate(alt_loci_genes[b]):
+            result_store.add_gene(b, gene, "best_jaccard", jaccard[i, best[i]],
+                                  text=main_genes[b][best[i]].name)
+            result_store.add_gene(b, gene, "best_overlap", int(overlap[i, best[i]]))
+        histogram_total += histogram
+        n_pairs_total += n_pairs
+        n_identical_total += n_identical
+
+    print("RESULTS:")
+    print(" Number of alt and main transcript pairs sharing exon bases: %d" % n_pairs_total)
+    print(" Number of genes on alt loci with identical exons to a gene on main: %d" % n_identical_total)
+    print(" Best Jaccard score of genes on alt loci: %s" % ", ".join(
+        "%s: %d" % (label, n) for label, n in zip(bins, histogram_total)))
 
 
 def analyse_multipath_genes2(args):
     if args.interval_type == "fuzzy":
         return analyze_fuzzy_genes(args)
+    if args.interval_type == "similarity":
+        return analyse_similarity(args)
     assert args.interval_type == "critical"
-    from offsetbasedgraph.graphutils import create_gene_dicts, \
+    from offsetbasedgraph.graphutils import \
         translate_single_gene_to_aligned_graph
     print("Reading genes")
-    genes = get_gene_objects_as_intervals(args.genes_file_name)
+    with profiler.stage("gene load"):
+        genes = _load_genes(args.genes_file_name)
 
-    alt_loci_genes, gene_name_dict, main_genes = create_gene_dicts(
-        genes,
-        alt_loci_fn=args.alt_locations_file_name)
+        alt_loci_genes, gene_name_dict, main_genes = create_gene_dicts(
+            genes,
+            alt_loci_fn=args.alt_locations_file_name)
 
     # alt loci genes are only genes on alt loci (nothing on main)
     # exon_dict contains only genes on main, index by offset of first exon
 
     # For every alt loci, create complex graph, translate genes and analyse them
-    text_graph = create_initial_grch38_graph(args.chrom_sizes_file_name)
-    graph, name_trans = grch38_graph_to_numeric(text_graph)
+    with profiler.stage("graph creation"):
+        names = NameTable.from_chrom_sizes(args.chrom_sizes_file_name)
+    graphs = LoadedGraphs(names.graph2, names)
 
+    cache = _open_cache(args)
+    chrom_sizes_key = file_hash(args.chrom_sizes_file_name)
+    sequence_store = _open_sequence_store(getattr(args, "sequence_store", None))
     equal_total = 0
     equal_exons_total = 0
     n_a = 1
-    print(text_graph.blocks.keys())
-    for b in text_graph.blocks:
+    print(names.graph1.blocks.keys())
+    for b in names.names:
         if "alt" in b:
             sys.stdout.flush()
 
@@ -240,36 +688,38 @@ def analyse_multipath_genes2(args):
                 print("Skipping", b)
                 continue
 
-            trans, complex_graph = merge_alt_using_cigar(graph, name_trans, b, ncbi_alignments_dir=args.ncbi_alignments_dir)
-            full_trans = name_trans + trans
+            locus_start = time.time()
+            with profiler.stage("cigar merge", alt_locus=b):
+                trans, complex_graph = _merge_alt_locus(
+                    graphs, b, args.ncbi_alignments_dir, cache,
+                    chrom_sizes_key, sequence_store)
+                full_trans = names.compose(trans)
 
             # Find candidates on main path to check against:
-            genes_against = [g.copy() for g in main_genes[b]]
-            genes_against_translated = []
-            n = 0
-            for mg in genes_against:
-                n += 1
-                genes_against_translated.append(translate_single_gene_to_aligned_graph(mg, full_trans).interval)
-                sys.stdout.write('\r  Translating main genes: ' + str(round(100 * n / len(genes_against))) + ' % finished ' + ' ' * 20)
-                sys.stdout.flush()
-
-            print()
-
-            genes_here_translated = []
-            n = 0
-            for mg in genes_here:
-                n += 1
-                genes_here_translated.append(translate_single_gene_to_aligned_graph(mg, full_trans).interval)
-                sys.stdout.write('\r  Translating alt genes: ' + str(round(100 * n / len(genes_here))) + ' % finished ' + ' ' * 20)
-                sys.stdout.flush()
-            print()
-            equal, equal_exons = _analyse_multipath_genes_on_graph(
-                genes_here_translated,
-                genes_against_translated,
-                complex_graph)
+            with profiler.stage("translation", alt_locus=b):
+                genes_against_translated = _translate_genes(
+                    main_genes[b],
+                    lambda g: translate_single_gene_to_aligned_graph(g, full_trans).interval,
+                    "Translating main genes")
+
+                genes_here_translated = _translate_genes(
+                    genes_here,
+                    lambda g: translate_single_gene_to_aligned_graph(g, full_trans).interval,
+                    "Translating alt genes")
+
+            with profiler.stage("comparison", alt_locus=b):
+                equal, equal_exons = _analyse_multipath_genes_on_graph(
+                    genes_here_translated,
+                    genes_against_translated,
+                    complex_graph, b, genes_here)
             equal_total += equal
             equal_exons_total += equal_exons
+            result_store.add_locus(b, "equal", equal)
+            result_store.add_locus(b, "equal_exons", equal_exons)
+            result_store.add_locus(b, "time", time.time() - locus_start)
 
+    result_store.add_locus(None, "equal", equal_total)
+    result_store.add_locus(None, "equal_exons", equal_exons_total)
     print("SUM:")
     print("Equal: %d, equal exons: %d" % (equal_total, equal_exons_total))
 
@@ -278,45 +728,111 @@ def analyse_multipath_genes2(args):
     print(" Number of genes with only identical exones (not start and end position): %d" % equal_exons_total)
 
 
-def html_alt_loci_select(args):
-    # Prints all regions as an html select field
-    html_out = """<select name='region'
-               class='form-control' style='width: 320px;'>"""
-    from offsetbasedgraph.graphutils import get_alt_loci_positions
-    loci = get_alt_loci_positions("data/grch38_alt_loci.txt")
-    from collections import OrderedDict
-    loci = OrderedDict(sorted(loci.items(), key=lambda t: t[0]))
+NOTATION_COLUMNS = ["alt_locus", "gene", "chrom", "start", "end",
+                    "notation", "graph_notation"]
 
-    for locus in loci:
-        region = loci[locus]
-        if region["end"] - region["start"] < 40000000000:
-            html_out += "<option value='%s'>%s (%s:%d-%d)</option>" % \
-                        (locus,
-                         locus,
-                         region["main_chr"], \
-                         region["start"], region["end"])
-    html_out += "</select>"
-    print(html_out)
 
+def _load_region_path_tables(file_name):
+    # liftover tables for all chromosomes of translation in file_name
+    from liftover import create_tables
+    return _shared_file("region_path_tables", file_name,
+                        lambda: create_tables(_load_translation(file_name)))
 
-def print_gene_notations(args):
-    print("Processing genes")
-    genes_file_name = args.genes
-    trans = Translation.from_file(args.translation_file_name)
 
+def _gene_notation_rows(tables, alt_id, genes):
+    # Returns rows (NOTATION_COLUMNS) with the notation of each gene on
+    # GRCh38 and on the graph (as g.translate(trans).transcription_region)
+    from liftover import NOT_TRANSLATED
+    graph_notations = [NOT_TRANSLATED] * len(genes)
+    by_chrom = {}
+    for i, g in enumerate(genes):
+        by_chrom.setdefault(g.chrom, []).append(i)
+    for chrom, indexes in by_chrom.items():
+        if chrom not in tables:
+            continue
+        notations = tables[chrom].notations([genes[i].start for i in indexes],
+                                            [genes[i].end for i in indexes])
+        for i, notation in zip(indexes, notations):
+            graph_notations[i] = notation
+    return [(alt_id, g.name, g.chrom, g.start, g.end,
+             "%d, %d, [%s]" % (g.start, g.end, g.chrom), graph_notation)
+            for g, graph_notation in zip(genes, graph_notations)]
 
-    genes = get_gene_objects_as_intervals(genes_file_name, trans.graph1)
-    alt_loci_genes, gene_name_dict, main_genes = create_gene_dicts(genes, alt_loci_fn=args.alt_locations_file_name)
-    genes = main_genes[args.alt_locus]
 
-    print("Original genes on GRCh38")
-    print("----------------------------")
-    for g in genes:
-        print("%s: %s" % (g.name, g.transcription_region.notation()))
+_notation_worker_tables = None
+
+
+def _init_notation_worker(tables):
+    global _notation_worker_tables
+    _notation_worker_tables = tables
+
+
+def _notation_locus_task(task):
+    alt_id, genes = task
+    return alt_id, genes, _gene_notation_rows(_notation_worker_tables, alt_id, genes)
 
-    print("Genes on graph")
 
-    genes = [g.translate(trans) for g in genes]
+@contextmanager
+def _open_output(file_name):
+    # Yields file_name opened for writing, or stdout if file_name is "-"
+    if file_name == "-":
+        yield sys.stdout
+    else:
+        with open(file_name, "w") as f:
+            yield f
+
+
+def _write_notation_rows(out, results):
+    # Writes (and stores) rows of results from _notation_locus_task.
+    # Returns number of genes
+    n_genes = 0
+    for alt_id, locus_genes, rows in results:
+        out.writelines("\t".join(str(v) for v in row) + "\n" for row in rows)
+        for g, row in zip(locus_genes, rows):
+            result_store.add_gene(alt_id, g, "notation", text=row[5])
+            result_store.add_gene(alt_id, g, "graph_notation", text=row[6])
+        n_genes += len(rows)
+    return n_genes
+
+
+def print_gene_notations(args):
+    # Writes notation of the genes on each alt locus and in its region on
+    # main, on GRCh38 and on the graph, as tsv (one alt locus at a time)
+    with profiler.stage("load translation"):
+        tables = _load_region_path_tables(args.translation_file_name)
+
+    with profiler.stage("gene load"):
+        genes = _load_genes(args.genes)
+        alt_loci_genes, gene_name_dict, main_genes = create_gene_dicts(genes, alt_loci_fn=args.alt_locations_file_name)
+    if args.alt_locus == "all":
+        alt_loci = sorted(read_alt_loci_positions(args.alt_locations_file_name))
+    else:
+        alt_loci = [args.alt_locus]
+    tasks = [(alt_id, alt_loci_genes.get(alt_id, []) + main_genes.get(alt_id, []))
+             for alt_id in alt_loci]
+
+    processes = getattr(args, "processes", 1)
+    n_genes = 0
+    with _open_output(getattr(args, "out_file_name", "-")) as out, \
+            profiler.stage("translation"):
+        out.write("\t".join(NOTATION_COLUMNS) + "\n")
+        if processes > 1:
+            import multiprocessing
+            # Workers are terminated when leaving the with block (if a
+            # task or a write raises)
+            with multiprocessing.Pool(processes, _init_notation_worker,
+                                      (tables,)) as pool:
+                n_genes = _write_notation_rows(
+                    out, pool.imap(_notation_locus_task, tasks))
+                pool.close()
+                pool.join()
+        else:
+            _init_notation_worker(tables)
+            n_genes = _write_notation_rows(
+                out, map(_notation_locus_task, tasks))
+    sys.stderr.write("Wrote notations of %d genes on %d alt loci\n" %
+                     (n_genes, len(alt_loci)))
+
 
 def compute_average_flank_length(args):
     from offsetbasedgraph.GRCH38 import AltLoci
@@ -330,3 +846,22 @@ def compute_average_flank_length(args):
 
     print(np.mean(lengths))
 
+
+
+def generate_synthetic_data(args):
+    from synthetic import create_synthetic_data
+    files = create_synthetic_data(
+        args.out_dir,
+        n_chromosomes=args.n_chromosomes,
+        chrom_size=args.chrom_size,
+        alt_loci_per_chromosome=args.alt_loci_per_chromosome,
+        min_locus_length=args.min_locus_length,
+        max_locus_length=args.max_locus_length,
+        overlap=args.overlap,
+        cigar_operations=args.cigar_operations,
+        genes_per_locus=args.genes_per_locus,
+        sequence_cache_dir=args.sequence_cache_dir,
+        seed=args.seed)
+
+    for name, file_name in sorted(files.items()):
+        print("%s: %s" % (name, file_name))
@@ -0,0 +1,183 @@
+"""
+Graphs with integer block ids and block names in a side table.
+
+The graph creation pipeline used to create a GRCh38 graph with chromosome
+names as block ids, convert it to a graph with integer ids
+(convert_to_numeric_graph or grch38_graph_to_numeric), work on that, and
+convert the result back to names (convert_to_text_graph), composing the
+name translations with the result. Each of these steps translates the whole
+graph.
+
+A NameTable gives every GRCh38 sequence an integer id (0, 1, ... in the order
+of the chrom sizes file, the same ids as convert_to_numeric_graph), and the
+numeric graph is created directly from it. The NameTable can be used where
+offsetbasedgraph expects the name translation (translate, translate_rp,
+graph1 and graph2), and compose(trans) is used instead of composing it
+with other translations (name_trans + trans). text_translation creates the
+same translation as composing the name translations with the numeric
+translation.
+"""
+
+from offsetbasedgraph import Block, Graph, Interval, Position
+
+
+class NameTable(object):
+
+    # Part of cache keys for results with numeric ids, since these ids
+    # are not the same as those given by grch38_graph_to_numeric
+    ID_SCHEME = "nametable"
+
+    def __init__(self, names, lengths, graph2=None):
+        """
+        :param names: Name of each block. Block i gets id i
+        :param lengths: Length of each block
+        :param graph2: Graph with integer ids (created from lengths if None)
+        """
+        self.names = list(names)
+        self.lengths = list(lengths)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self._graph1 = None
+        self._graph2 = graph2
+
+    @classmethod
+    def from_chrom_sizes(cls, chrom_sizes_file_name):
+        names = []
+        lengths = []
+        with open(chrom_sizes_file_name) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                name, length = line.split("\t")[0:2]
+                names.append(name)
+                lengths.append(int(length))
+        return cls(names, lengths)
+
+    @property
+    def graph1(self):
+        """Graph with names as block ids (as create_initial_grch38_graph)"""
+        if self._graph1 is None:
+            self._graph1 = Graph({name: Block(length) for name, length
+                                  in zip(self.names, self.lengths)}, {})
+        return self._graph1
+
+    @property
+    def graph2(self):
+        """Graph with integer block ids"""
+        if self._graph2 is None:
+            self._graph2 = Graph({i: Block(length) for i, length
+                                  in enumerate(self.lengths)}, {})
+        return self._graph2
+
+    def translate_position(self, position, inverse=False):
+        if inverse:
+            return [Position(self.names[position.region_path_id],
+                             position.offset)]
+        return [Position(self.ids[position.region_path_id], position.offset)]
+
+    def translate_rp(self, rp, inverse=False):
+        if inverse:
+            return [Interval(0, self.lengths[rp], [self.names[rp]], self.graph1)]
+        i = self.ids[rp]
+        return [Interval(0, self.lengths[i], [i], self.graph2)]
+
+    def translate(self, obj):
+        """
+        Translate Interval or Position with names to integer ids
+        """
+        if isinstance(obj, Position):
+            return self.translate_position(obj)[0]
+        if isinstance(obj, Interval):
+            return Interval(self.translate(obj.start_position),
+                            self.translate(obj.end_position),
+                            [self.ids[rp] for rp in obj.region_paths],
+                            self.graph2)
+        raise ValueError("Cannot translate object of type %s" % type(obj))
+
+    def compose(self, trans):
+        """
+        :param trans: Translation from graph2 (e.g. from merge_alt_using_cigar)
+        :return: Object translating from names through trans
+        """
+        if isinstance(trans, NameTable):
+            # merge_alt_using_cigar returns the name translation
+            # when there is no alignment
+            return trans
+        return NamedTranslation(self, trans)
+
+    def text_translation(self, graph, numeric_trans):
+        """
+        Create translation from graph1 to graph with names as block ids.
+        Gives the same translation (and names) as
+        name_trans + numeric_trans + convert_to_text_graph(...)[1]
+
+        :param graph: Graph with integer ids (numeric_trans.graph2)
+        :param numeric_trans: Translation from graph2 to graph
+        """
+        from offsetbasedgraph import Translation
+
+        # Names of blocks in graph (as in convert_to_text_graph)
+        new_names = {}
+        for i, block in enumerate(numeric_trans._b_to_a):
+            rps = []
+            for interval in numeric_trans._b_to_a[block]:
+                rps.extend(interval.region_paths)
+            new_names[block] = str(i) + "".join(self.names[rp] for rp in rps)
+        for block in graph.blocks:
+            if block not in new_names and block not in numeric_trans._a_to_b:
+                new_names[block] = self.names[block]
+
+        graph1 = self.graph1
+        graph2 = Graph(
+            {new_names[b]: Block(graph.blocks[b].length()) for b in graph.blocks},
+            {new_names[b]: [new_names[n] for n in neighbours]
+             for b, neighbours in graph.adj_list.items() if neighbours})
+
+        def renamed(interval, names, new_graph):
+            return Interval(
+                Position(names[interval.start_position.region_path_id],
+                         interval.start_position.offset),
+                Position(names[interval.end_position.region_path_id],
+                         interval.end_position.offset),
+                [names[rp] for rp in interval.region_paths], new_graph)
+
+        a_to_b = {}
+        for i, name in enumerate(self.names):
+            if i in numeric_trans._a_to_b:
+                a_to_b[name] = [renamed(interval, new_names, graph2)
+                                for interval in numeric_trans._a_to_b[i]]
+            else:
+                a_to_b[name] = [Interval(0, self.lengths[i], [name], graph2)]
+
+        b_to_a = {}
+        for block in graph.blocks:
+            new_name = new_names[block]
+            if block in numeric_trans._b_to_a:
+                b_to_a[new_name] = [renamed(interval, self.names, graph1)
+                                    for interval in numeric_trans._b_to_a[block]]
+            else:
+                b_to_a[new_name] = [Interval(0, graph.blocks[block].length(),
+                                             [self.names[block]], graph1)]
+
+        trans = Translation(a_to_b, b_to_a, graph=graph1)
+        trans.graph2 = graph2
+        return trans
+
+
+class NamedTranslation(object):
+    """
+    Translation from names through a NameTable and a numeric translation
+    (see NameTable.compose). Only supports translate (as used when
+    translating genes).
+    """
+
+    def __init__(self, name_table, numeric_trans):
+        self.name_table = name_table
+        self.numeric_trans = numeric_trans
+        self.graph2 = numeric_trans.graph2
+
+    @property
+    def graph1(self):
+        return self.name_table.graph1
+
+    def translate(self, obj):
+        return self.numeric_trans.translate(self.name_table.translate(obj))
@@ -0,0 +1,149 @@
+"""
+Per-stage profiling of wall time, cpu time and peak memory (RSS).
+
+The operating system only gives the peak RSS of the whole process (the
+high-water mark since the process started), not of a stage. For each stage,
+the process peak at the end of the stage (process_peak_rss_kb) and how much
+the stage raised it (peak_rss_increase_kb) are recorded. A stage using less
+memory than an earlier stage has a peak_rss_increase_kb of 0.
+
+Stages are marked in the code with the module level profiler:
+
+    with profiler.stage("flank merge"):
+        ...
+
+The profiler does nothing unless enabled (by the --profile flag in
+gen_graph_coords.py). Results can be written as a simple json trace or
+in the Chrome trace event format (can be opened in chrome://tracing).
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def peak_rss_kb():
+    """
+    :return: Peak resident set size of this process in kilobytes,
+        or None if not available on this platform
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss //= 1024  # Bytes on mac
+    return rss
+
+
+class Profiler(object):
+    """
+    Records wall time, cpu time and process peak RSS for named (possibly
+    nested) stages
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = []
+        self._depth = 0
+        self._start_time = time.time()
+
+    def enable(self):
+        self.enabled = True
+        self.stages = []
+        self._start_time = time.time()
+
+    @contextmanager
+    def stage(self, name, **info):
+        """
+        Context manager for profiling a stage
+
+        :param name: Stage name (e.g. "flank merge")
+        :param info: Extra info stored with the stage (e.g. alt_locus=...)
+        """
+        if not self.enabled:
+            yield
+            return
+
+        record = {"name": name, "depth": self._depth, "info": info,
+                  "start": time.time() - self._start_time}
+        self.stages.append(record)
+        self._depth += 1
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        rss_start = peak_rss_kb()
+        try:
+            yield
+        finally:
+            record["wall_time"] = time.perf_counter() - wall_start
+            record["cpu_time"] = time.process_time() - cpu_start
+            record["process_peak_rss_kb"] = peak_rss_kb()
+            record["peak_rss_increase_kb"] = None if rss_start is None else \
+                record["process_peak_rss_kb"] - rss_start
+            self._depth -= 1
+
+    def summary(self):
+        """
+        :return: dict with total wall time, cpu time and peak RSS increase,
+            and max process peak RSS, per stage name
+        """
+        summary = {}
+        for stage in self.stages:
+            if "wall_time" not in stage:
+                continue
+            s = summary.setdefault(stage["name"], {"count": 0, "wall_time": 0.0,
+                                                   "cpu_time": 0.0,
+                                                   "process_peak_rss_kb": 0,
+                                                   "peak_rss_increase_kb": 0})
+            s["count"] += 1
+            s["wall_time"] += stage["wall_time"]
+            s["cpu_time"] += stage["cpu_time"]
+            s["process_peak_rss_kb"] = max(s["process_peak_rss_kb"],
+                                           stage["process_peak_rss_kb"] or 0)
+            s["peak_rss_increase_kb"] += stage["peak_rss_increase_kb"] or 0
+        return summary
+
+    def to_trace(self):
+        return {"stages": self.stages, "summary": self.summary(),
+                "process_peak_rss_kb": peak_rss_kb()}
+
+    def to_chrome_trace(self):
+        events = []
+        pid = os.getpid()
+        for stage in self.stages:
+            if "wall_time" not in stage:
+                continue
+            args = dict(stage["info"])
+            args["cpu_time"] = stage["cpu_time"]
+            args["process_peak_rss_kb"] = stage["process_peak_rss_kb"]
+            args["peak_rss_increase_kb"] = stage["peak_rss_increase_kb"]
+            events.append({"name": stage["name"], "ph": "X", "pid": pid,
+                           "tid": 0, "ts": int(stage["start"] * 1e6),
+                           "dur": int(stage["wall_time"] * 1e6),
+                           "args": args})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def to_file(self, file_name, trace_format="json"):
+        """
+        Write recorded stages to file
+
+        :param trace_format: json or chrome
+        """
+        if trace_format == "chrome":
+            trace = self.to_chrome_trace()
+        else:
+            assert trace_format == "json", \
+                "Unknown trace format %s" % trace_format
+            trace = self.to_trace()
+
+        with open(file_name, "w") as f:
+            json.dump(trace, f, indent=1, default=str)
+
+
+profiler = Profiler()
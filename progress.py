@@ -0,0 +1,91 @@
+"""
+Progress reporting for long running loops (e.g. translating genes).
+
+The progress line is rewritten at most once every `interval` seconds, so that
+writing to stdout does not slow down the loop it reports on. When the stream
+is not a terminal (e.g. output is redirected to a log file), only a single
+summary line is written when the loop is finished.
+"""
+
+import sys
+import time
+
+
+def _format_seconds(seconds):
+    seconds = int(seconds)
+    return "%d:%02d:%02d" % (seconds // 3600, (seconds % 3600) // 60,
+                             seconds % 60)
+
+
+class ProgressReporter(object):
+    """
+    >>> progress = ProgressReporter("Translating main genes", len(genes))
+    >>> for gene in genes:
+    ...     translate(gene)
+    ...     progress.update()
+    >>> progress.finish()
+    """
+
+    def __init__(self, description, total, unit="genes", interval=0.5,
+                 stream=None, enabled=None):
+        """
+        :param description: Text written in front of the progress
+        :param total: Total number of items (used for percentage and ETA)
+        :param unit: Name of the items (used for throughput)
+        :param interval: Minimum number of seconds between updates
+        :param stream: Stream to write to (default sys.stdout)
+        :param enabled: Whether to write continuous updates. Defaults to
+            True only if stream is a terminal
+        """
+        self.description = description
+        self.total = total
+        self.unit = unit
+        self.interval = interval
+        self.stream = stream if stream is not None else sys.stdout
+        if enabled is None:
+            enabled = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self.enabled = enabled
+        self.n = 0
+        self.start_time = time.monotonic()
+        self._last_report = self.start_time
+
+    def update(self, n=1):
+        self.n += n
+        if not self.enabled:
+            return
+
+        now = time.monotonic()
+        if now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        self.stream.write("\r  " + self._status(now) + " " * 10)
+        self.stream.flush()
+
+    def rate(self, now=None):
+        """
+        :return: Number of items per second so far
+        """
+        if now is None:
+            now = time.monotonic()
+        elapsed = now - self.start_time
+        return self.n / elapsed if elapsed > 0 else 0.0
+
+    def _status(self, now):
+        rate = self.rate(now)
+        percent = 100 * self.n / max(1, self.total)
+        out = "%s: %d %% finished (%.1f %s/s" % (self.description, percent,
+                                                rate, self.unit)
+        if rate > 0 and self.n < self.total:
+            out += ", ETA %s" % _format_seconds((self.total - self.n) / rate)
+        return out + ")"
+
+    def finish(self):
+        """Write summary line with total time and throughput"""
+        now = time.monotonic()
+        line = "  %s: %d %s in %.1f s (%.1f %s/s)" % (
+            self.description, self.n, self.unit, now - self.start_time,
+            self.rate(now), self.unit)
+        if self.enabled:
+            line = "\r" + line + " " * 30
+        self.stream.write(line + "\n")
+        self.stream.flush()
@@ -0,0 +1,93 @@
+"""
+Extraction of the genes in the region of every alt locus.
+
+For every alt locus, a genes file (genes_<alt locus id>.txt) is written with
+all genes on the alt locus and all genes on the main chromosome that lie
+inside the region the alt locus is an alternative to (txStart >= start and
+txEnd <= end).
+
+The genes file is read once. Genes on main chromosomes are sorted by start
+position once per chromosome, and the genes starting inside each region are
+found with numpy.searchsorted for all regions on the chromosome at once,
+instead of scanning all genes for every alt locus.
+"""
+
+import os
+from collections import defaultdict
+import numpy as np
+
+
+def _columns(header):
+    names = header.lstrip("#").rstrip("\n").split("\t")
+    return names.index("chrom"), names.index("txStart"), names.index("txEnd")
+
+
+def read_regions(alt_loci_file_name):
+    """
+    :return: dict{main chromosome: list of (alt locus id, start, end)}
+    """
+    from offsetbasedgraph.graphutils import get_alt_loci_positions
+    regions = defaultdict(list)
+    for alt_id, info in sorted(get_alt_loci_positions(alt_loci_file_name).items()):
+        regions[info["main_chr"]].append((alt_id, info["start"], info["end"]))
+    return regions
+
+
+def genes_in_regions(lines, regions):
+    """
+    :param lines: Lines of a genes file (with header)
+    :param regions: dict from read_regions
+    :return: (header, dict{alt locus id: list of gene lines, in file order})
+    """
+    lines = iter(lines)
+    header = next(lines)
+    chrom_column, start_column, end_column = _columns(header)
+    alt_ids = set(alt_id for chrom in regions for alt_id, _, _ in regions[chrom])
+
+    gene_lines = {alt_id: [] for alt_id in alt_ids}
+    # Per main chromosome: line number, start and end of each gene
+    main_genes = defaultdict(lambda: ([], [], [], []))
+    for line_number, line in enumerate(lines):
+        columns = line.split("\t")
+        chrom = columns[chrom_column]
+        if chrom in alt_ids:
+            gene_lines[chrom].append((line_number, line))
+        elif chrom in regions:
+            numbers, starts, ends, chrom_lines = main_genes[chrom]
+            numbers.append(line_number)
+            starts.append(int(columns[start_column]))
+            ends.append(int(columns[end_column]))
+            chrom_lines.append(line)
+
+    for chrom, (numbers, starts, ends, chrom_lines) in main_genes.items():
+        starts = np.array(starts, dtype=np.int64)
+        ends = np.array(ends, dtype=np.int64)
+        order = np.argsort(starts, kind="stable")
+        sorted_starts = starts[order]
+        region_starts = np.array([start for _, start, _ in regions[chrom]])
+        region_ends = np.array([end for _, _, end in regions[chrom]])
+        first = np.searchsorted(sorted_starts, region_starts, side="left")
+        last = np.searchsorted(sorted_starts, region_ends, side="right")
+        for (alt_id, _, end), i, j in zip(regions[chrom], first, last):
+            candidates = order[i:j]
+            for k in candidates[ends[candidates] <= end]:
+                gene_lines[alt_id].append((numbers[k], chrom_lines[k]))
+
+    return header, {alt_id: [line for _, line in sorted(genes)]
+                    for alt_id, genes in gene_lines.items()}
+
+
+def extract_region_genes(args):
+    regions = read_regions(args.alt_locations_file_name)
+    with open(args.genes_file_name) as f:
+        header, gene_lines = genes_in_regions(f, regions)
+
+    if not os.path.isdir(args.out_dir):
+        os.makedirs(args.out_dir)
+    for alt_id in sorted(gene_lines):
+        with open(os.path.join(args.out_dir, "genes_%s.txt" % alt_id), "w") as f:
+            f.write(header)
+            f.writelines(gene_lines[alt_id])
+    print("Wrote genes for %d alt loci (%d genes) to %s" % (
+        len(gene_lines), sum(len(lines) for lines in gene_lines.values()),
+        args.out_dir))
@@ -0,0 +1,158 @@
+"""
+Store of experiment results in an SQLite database.
+
+Stages of the experiments record results with the module level store:
+
+    result_store.add_locus(alt_id, "equal", equal)
+    result_store.add_gene(alt_id, gene, "notation", text=notation)
+
+The store does nothing unless enabled (by the --results flag in
+gen_graph_coords.py). Every run of a subcommand gets a row in the runs table
+(command, arguments, start and end time, status), and results are stored in
+two tables in long format, with one row per value:
+
+    locus_results(run_id, alt_locus, metric, value)
+    gene_results(run_id, alt_locus, gene, chrom, start, end, metric, value, text)
+
+Totals for a run are stored with alt_locus NULL. Rows are kept in memory and
+inserted with executemany, batch_size rows in one transaction. diff_results
+prints the values that differ between two runs.
+"""
+
+import json
+import sqlite3
+import time
+
+BATCH_SIZE = 10000
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS runs (
+           run_id INTEGER PRIMARY KEY, command TEXT, arguments TEXT,
+           started REAL, finished REAL, status TEXT)""",
+    """CREATE TABLE IF NOT EXISTS locus_results (
+           run_id INTEGER, alt_locus TEXT, metric TEXT, value REAL)""",
+    """CREATE TABLE IF NOT EXISTS gene_results (
+           run_id INTEGER, alt_locus TEXT, gene TEXT, chrom TEXT,
+           start INTEGER, end INTEGER, metric TEXT, value REAL, text TEXT)""",
+    "CREATE INDEX IF NOT EXISTS locus_results_run ON locus_results (run_id)",
+    "CREATE INDEX IF NOT EXISTS gene_results_run ON gene_results (run_id)",
+]
+
+
+class ResultStore(object):
+
+    def __init__(self):
+        self.enabled = False
+        self.run_id = None
+        self.batch_size = BATCH_SIZE
+        self._connection = None
+        self._loci = []
+        self._genes = []
+
+    def enable(self, file_name, command, arguments):
+        """
+        Open (or create) database and start a new run
+
+        :param arguments: Command line arguments of the run (list)
+        """
+        self._connection = sqlite3.connect(file_name)
+        with self._connection:
+            for statement in SCHEMA:
+                self._connection.execute(statement)
+            cursor = self._connection.execute(
+                "INSERT INTO runs (command, arguments, started, status) "
+                "VALUES (?, ?, ?, ?)",
+                (command, json.dumps(arguments), time.time(), "running"))
+        self.run_id = cursor.lastrowid
+        self.enabled = True
+
+    def add_locus(self, alt_locus, metric, value):
+        if not self.enabled:
+            return
+        self._loci.append((self.run_id, alt_locus, metric, value))
+        if len(self._loci) >= self.batch_size:
+            self.flush()
+
+    def add_gene(self, alt_locus, gene, metric, value=None, text=None):
+        """
+        :param gene: GeneRecord
+        """
+        if not self.enabled:
+            return
+        self._genes.append((self.run_id, alt_locus, gene.name, gene.chrom,
+                            gene.start, gene.end, metric, value, text))
+        if len(self._genes) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.enabled:
+            return
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO locus_results VALUES (?, ?, ?, ?)", self._loci)
+            self._connection.executemany(
+                "INSERT INTO gene_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self._genes)
+        self._loci = []
+        self._genes = []
+
+    def close(self, status="ok"):
+        if not self.enabled:
+            return
+        self.flush()
+        with self._connection:
+            self._connection.execute(
+                "UPDATE runs SET finished = ?, status = ? WHERE run_id = ?",
+                (time.time(), status, self.run_id))
+        self._connection.close()
+        self._connection = None
+        self.enabled = False
+
+
+result_store = ResultStore()
+
+
+def read_run_results(connection, run_id):
+    """
+    :return: dict{(alt locus, gene, chrom, start, end, metric): (value, text)}
+        (gene, chrom, start and end are None for locus results)
+    """
+    results = {}
+    for alt_locus, metric, value in connection.execute(
+            "SELECT alt_locus, metric, value FROM locus_results "
+            "WHERE run_id = ?", (run_id,)):
+        results[(alt_locus, None, None, None, None, metric)] = (value, None)
+    for row in connection.execute(
+            "SELECT alt_locus, gene, chrom, start, end, metric, value, text "
+            "FROM gene_results WHERE run_id = ?", (run_id,)):
+        results[row[:6]] = row[6:]
+    return results
+
+
+def diff_results(args):
+    connection = sqlite3.connect(args.results_file_name)
+    # run2 defaults to the latest run, and run1 to the run before run2
+    run2 = args.run2
+    if run2 is None:
+        run2 = connection.execute("SELECT MAX(run_id) FROM runs").fetchone()[0]
+    run1 = args.run1
+    if run1 is None and run2 is not None:
+        run1 = connection.execute("SELECT MAX(run_id) FROM runs WHERE run_id < ?",
+                                  (run2,)).fetchone()[0]
+    assert run1 is not None and run2 is not None, "Need two runs to compare"
+    run_ids = [run1, run2]
+
+    first, second = [read_run_results(connection, run_id) for run_id in run_ids]
+    connection.close()
+    n_different = 0
+    print("alt_locus\tgene\tmetric\trun %d\trun %d" % tuple(run_ids))
+    for key in sorted(set(first) | set(second), key=str):
+        values = first.get(key), second.get(key)
+        if values[0] == values[1]:
+            continue
+        n_different += 1
+        print("\t".join([str(key[0]), str(key[1] or ""), key[5]] +
+                        ["" if v is None else str(v[0] if v[1] is None else v[1])
+                         for v in values]))
+    print("%d values differ between run %d and run %d" %
+          ((n_different,) + tuple(run_ids)))
@@ -0,0 +1,208 @@
+"""
+Graph creation one main chromosome at a time.
+
+create_graph merges the flanks of all alt loci into one graph of the whole
+genome (connect_without_flanks), and all blocks and translations are in
+memory until the result is written. Merging the flanks of an alt locus only
+changes the blocks of its main chromosome and of the alt loci of that
+chromosome, so in segmented mode (create_graph --segmented) each main
+chromosome is merged with its alt loci in a graph with only these blocks,
+and the result (blocks, edges and translation, with integer ids) is appended
+to the output file before the next chromosome is merged. Peak memory is
+given by the largest chromosome.
+
+The result is the same as from the whole-genome merge:
+
+* New block ids are created by Graph._next_id, one more than the largest id
+  in the graph. A placeholder block with the largest id of the rest of the
+  genome is added to each segment graph, so that the same ids are created.
+* The text names given to merged blocks (see NameTable.text_translation)
+  depend on the order of the blocks in the reverse translation dict, which
+  comes from the set union in Translation.__add__. The order of the block ids
+  is kept for the whole genome, and updated the same way for every merge.
+
+The file starts with SEGMENTS_MAGIC, followed by pickled records: the name
+table, one record for each segment and the block order. read_segmented_graph
+creates the same Translation (with names as block ids) as create_graph
+writes, and is used by arraytranslation.load_translation for these files.
+"""
+
+import pickle
+from offsetbasedgraph import Block, Graph, Interval, Translation
+
+SEGMENTS_MAGIC = b"GRAPHSEGMENTS\n"
+
+
+class _RecordingTranslation(Translation):
+    """
+    Translation that updates the block order of the whole genome
+    when added to (as final_trans += trans in merge_flanks)
+    """
+
+    block_order = None
+
+    def __add__(self, other):
+        order = self.block_order
+        order[:] = [rp for rp in set(order).union(set(other._b_to_a.keys()))
+                    if rp not in other._a_to_b]
+        new_trans = Translation.__add__(self, other)
+        # Translation.__add__ creates a Translation, keep recording
+        new_trans.__class__ = _RecordingTranslation
+        new_trans.block_order = order
+        return new_trans
+
+
+def chromosome_segments(alt_loci):
+    """
+    :param alt_loci: list of AltLocus (in file order)
+    :return: list of (main chromosome, alt loci), in the same order
+    """
+    segments = []
+    for alt_locus in alt_loci:
+        if segments and segments[-1][0] == alt_locus.chrom:
+            segments[-1][1].append(alt_locus)
+            continue
+        if any(chrom == alt_locus.chrom for chrom, _ in segments):
+            raise ValueError("Alt loci of %s are not after each other in the "
+                             "alt loci file" % alt_locus.chrom)
+        segments.append((alt_locus.chrom, [alt_locus]))
+    return segments
+
+
+def _interval_rows(trans_dict):
+    return {block: [(interval.start_position.offset,
+                     interval.end_position.offset,
+                     list(interval.region_paths)) for interval in intervals]
+            for block, intervals in trans_dict.items()}
+
+
+def merge_segment(names, alt_loci, placeholder, block_order):
+    """
+    Merge flanks of alt loci on one main chromosome
+
+    :param names: NameTable
+    :param alt_loci: AltLocus objects with the same main chromosome
+    :param placeholder: Largest block id in the rest of the genome
+    :param block_order: Order of reverse translation keys (updated)
+    :return: Segment record
+    """
+    from offsetbasedgraph.graphcreators import merge_flanks
+    ids = [names.ids[alt_loci[0].chrom]] + [names.ids[a.name] for a in alt_loci]
+    blocks = {i: Block(names.lengths[i]) for i in ids}
+    if placeholder >= 0:
+        blocks[placeholder] = Block(1)
+    graph = Graph(blocks, {})
+    trans = _RecordingTranslation(graph=graph)
+    trans.graph2 = graph
+    trans.block_order = block_order
+    for alt_locus in alt_loci:
+        graph, trans = merge_flanks(
+            [alt_locus.main_start_flank, alt_locus.start_flank,
+             alt_locus.main_end_flank, alt_locus.end_flank],
+            trans, graph, names)
+
+    return {"chrom": alt_loci[0].chrom,
+            "ids": ids,
+            "blocks": {b: graph.blocks[b].length() for b in graph.blocks
+                       if b != placeholder},
+            "edges": {b: list(edges) for b, edges in graph.adj_list.items()
+                      if edges and b != placeholder},
+            "a_to_b": _interval_rows(trans._a_to_b),
+            "b_to_a": _interval_rows(trans._b_to_a)}
+
+
+def create_segmented_graph(names, alt_locations_file_name, out_file_name):
+    """
+    Merge alt loci one main chromosome at a time, appending each
+    segment to out_file_name
+    """
+    from offsetbasedgraph.GRCH38 import AltLoci
+    from profiling import profiler
+    from progress import ProgressReporter
+    alt_loci = AltLoci.from_file(alt_locations_file_name).alt_loci
+    segments = chromosome_segments(alt_loci)
+
+    # Initial blocks not merged yet, and largest id of merged segments
+    unmerged = set(range(len(names.names)))
+    merged_max = -1
+    block_order = []
+    progress = ProgressReporter("Merging alt loci", len(alt_loci),
+                                unit="alt loci")
+    with open(out_file_name, "wb") as f:
+        f.write(SEGMENTS_MAGIC)
+        pickle.dump({"names": names.names, "lengths": names.lengths}, f)
+        for chrom, chrom_alt_loci in segments:
+            ids = set([names.ids[chrom]] + [names.ids[a.name] for a in chrom_alt_loci])
+            placeholder = max(max(unmerged - ids, default=-1), merged_max)
+            with profiler.stage("flank merge"):
+                segment = merge_segment(names, chrom_alt_loci, placeholder,
+                                        block_order)
+            with profiler.stage("write segment"):
+                pickle.dump(segment, f, pickle.HIGHEST_PROTOCOL)
+            unmerged -= ids
+            merged_max = max([merged_max] + list(segment["blocks"]))
+            progress.update(len(chrom_alt_loci))
+            del segment
+        pickle.dump({"block_order": block_order}, f, pickle.HIGHEST_PROTOCOL)
+    progress.finish()
+    print("Wrote %d segments to %s" % (len(segments), out_file_name))
+
+
+def is_segmented_file(file_name):
+    with open(file_name, "rb") as f:
+        return f.read(len(SEGMENTS_MAGIC)) == SEGMENTS_MAGIC
+
+
+def _read_records(f):
+    while True:
+        try:
+            yield pickle.load(f)
+        except EOFError:
+            return
+
+
+def read_segmented_graph(file_name):
+    """
+    :return: Translation from GRCh38 to the graph (names as block ids),
+        the same as created by create_graph without --segmented
+    """
+    from nametable import NameTable
+    with open(file_name, "rb") as f:
+        assert f.read(len(SEGMENTS_MAGIC)) == SEGMENTS_MAGIC, \
+            "%s is not a segmented graph file" % file_name
+        records = _read_records(f)
+        header = next(records)
+        names = NameTable(header["names"], header["lengths"])
+        blocks = {}
+        edges = {}
+        a_to_b = {}
+        b_to_a = {}
+        merged = set()
+        block_order = None
+        for record in records:
+            if "block_order" in record:
+                block_order = record["block_order"]
+                continue
+            merged.update(record["ids"])
+            blocks.update(record["blocks"])
+            edges.update(record["edges"])
+            a_to_b.update(record["a_to_b"])
+            b_to_a.update(record["b_to_a"])
+    assert block_order is not None, \
+        "%s is incomplete (no block order at the end)" % file_name
+
+    for i, length in enumerate(names.lengths):
+        if i not in merged:
+            blocks[i] = length
+    graph = Graph({b: Block(length) for b, length in blocks.items()}, edges)
+
+    def intervals(rows, interval_graph):
+        return [Interval(start, end, region_paths, interval_graph)
+                for start, end, region_paths in rows]
+
+    numeric_trans = Translation(
+        {b: intervals(rows, graph) for b, rows in a_to_b.items()},
+        {b: intervals(b_to_a[b], names.graph2) for b in block_order},
+        graph=names.graph2)
+    numeric_trans.graph2 = graph
+    return names.text_translation(graph, numeric_trans)
@@ -0,0 +1,312 @@
+"""
+Memory-mapped, 2-bit packed store of GRCh38 sequences.
+
+Every sequence (chromosome or alt locus) is stored with four bases per byte
+(A=0, C=1, G=2, T=3) in one data file that is memory mapped, so that any
+region can be read in constant time without reading the rest of the genome
+into memory. Runs of other characters (N and other IUPAC codes) are stored
+separately in the index (a json file next to the data file), together with
+the byte offset and length of each sequence. Their code is the character
+(as a byte), so that different characters (e.g. R and Y) are compared as
+different bases, as when comparing strings.
+
+Sequences are stored in upper case. merge_alt_using_cigar compares the
+sequences from UCSC case sensitively, but these are in one case (lower case),
+so upper case sequences give the same mismatches.
+
+merge_alt_using_sequence_store merges an alt locus using its NCBI alignment
+(as merge_alt_using_cigar), but reads the sequences from the store and finds
+mismatches inside M operations by comparing the 2-bit codes with numpy, in
+chunks, instead of comparing strings fetched from UCSC one character at a time.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import numpy as np
+
+SHIFTS = np.array([6, 4, 2, 0], dtype=np.uint8)
+CHUNK_SIZE = 1 << 20
+
+# Code of each byte: 0-3 for ACGT (upper or lower case), and the upper case
+# character for other characters
+_ENCODE = np.frombuffer(bytes(range(256)).upper(), dtype=np.uint8).copy()
+# Character of each code
+LETTERS = _ENCODE.copy()
+for _code, _letter in enumerate(b"ACGT"):
+    _ENCODE[_letter] = _code
+    _ENCODE[_letter + 32] = _code
+    LETTERS[_code] = _letter
+
+
+def _index_file_name(file_name):
+    return file_name + ".json"
+
+
+class SequenceStoreWriter(object):
+    """Writes sequences to a store, one chunk of bases at a time"""
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self._out = open(file_name, "wb")
+        self._checksum = hashlib.sha1()
+        self._offset = 0
+        self.sequences = {}
+        self._name = None
+
+    def start_sequence(self, name):
+        self.end_sequence()
+        if name in self.sequences:
+            raise ValueError("Sequence %s occurs more than once" % name)
+        self._name = name
+        self._length = 0
+        self._runs = []
+        self._remainder = np.zeros(0, dtype=np.uint8)
+
+    def add(self, bases):
+        """
+        :param bases: bytes with the next bases of the current sequence
+        """
+        codes = _ENCODE[np.frombuffer(bases, dtype=np.uint8)]
+        other = np.flatnonzero(codes > 3)
+        if len(other):
+            # Runs of the same character
+            breaks = np.flatnonzero((np.diff(other) != 1) |
+                                    (np.diff(codes[other]) != 0)) + 1
+            starts = other[np.concatenate(([0], breaks))]
+            ends = other[np.concatenate((breaks - 1, [len(other) - 1]))] + 1
+            for start, end in zip(starts, ends):
+                letter = chr(codes[start])
+                start, end = int(start) + self._length, int(end) + self._length
+                if self._runs and self._runs[-1][1:] == [start, letter]:
+                    self._runs[-1][1] = end
+                else:
+                    self._runs.append([start, end, letter])
+            codes[other] = 0
+        self._length += len(codes)
+        codes = np.concatenate((self._remainder, codes))
+        n_full = len(codes) // 4 * 4
+        self._write(codes[:n_full])
+        self._remainder = codes[n_full:]
+
+    def _write(self, codes):
+        packed = np.bitwise_or.reduce(
+            codes.reshape(-1, 4) << SHIFTS, axis=1).astype(np.uint8)
+        data = packed.tobytes()
+        self._out.write(data)
+        self._checksum.update(data)
+
+    def end_sequence(self):
+        if self._name is None:
+            return
+        if len(self._remainder):
+            self._write(np.concatenate((
+                self._remainder,
+                np.zeros(4 - len(self._remainder), dtype=np.uint8))))
+        self.sequences[self._name] = {"offset": self._offset,
+                                      "length": self._length,
+                                      "runs": self._runs}
+        self._offset += (self._length + 3) // 4
+        self._name = None
+
+    def close(self):
+        self.end_sequence()
+        self._out.close()
+        # Checksum of the index too, as runs are not in the data file
+        self._checksum.update(json.dumps(self.sequences, sort_keys=True).encode())
+        with open(_index_file_name(self.file_name), "w") as f:
+            json.dump({"checksum": self._checksum.hexdigest(),
+                       "sequences": self.sequences}, f)
+
+
+def write_store_from_fasta(lines, file_name):
+    """
+    Create store from FASTA lines (e.g. a file), without holding more than
+    one line of sequence in memory
+    """
+    writer = SequenceStoreWriter(file_name)
+    for line in lines:
+        if line.startswith(">"):
+            writer.start_sequence(line[1:].split()[0])
+        else:
+            bases = line.strip().encode("ascii")
+            if bases:
+                writer.add(bases)
+    writer.close()
+    return writer.sequences
+
+
+class SequenceStore(object):
+
+    def __init__(self, data, index):
+        """
+        :param data: uint8 array (memmap) with packed bases
+        :param index: dict as written by SequenceStoreWriter
+        """
+        self.data = data
+        self.checksum = index["checksum"]
+        self.sequences = index["sequences"]
+        self._runs = {}
+
+    @classmethod
+    def from_file(cls, file_name):
+        with open(_index_file_name(file_name)) as f:
+            index = json.load(f)
+        if os.path.getsize(file_name) == 0:
+            return cls(np.zeros(0, dtype=np.uint8), index)
+        return cls(np.memmap(file_name, dtype=np.uint8, mode="r"), index)
+
+    def length(self, name):
+        return self.sequences[name]["length"]
+
+    def _character_runs(self, name):
+        # Start, end and code of runs of non-ACGT characters as arrays
+        if name not in self._runs:
+            runs = self.sequences[name]["runs"]
+            self._runs[name] = (
+                np.array([run[0] for run in runs], dtype=np.int64),
+                np.array([run[1] for run in runs], dtype=np.int64),
+                np.array([ord(run[2]) for run in runs], dtype=np.uint8))
+        return self._runs[name]
+
+    def codes(self, name, start, end):
+        """
+        :return: uint8 array with codes (0-3 for ACGT, the character for
+            others) of sequence name from start to end (0-based, exclusive end)
+        """
+        info = self.sequences[name]
+        if not 0 <= start <= end <= info["length"]:
+            raise IndexError("%d-%d is outside %s (length %d)" %
+                             (start, end, name, info["length"]))
+        packed = self.data[info["offset"] + start // 4:
+                           info["offset"] + (end + 3) // 4]
+        codes = ((np.asarray(packed)[:, None] >> SHIFTS) & 3).ravel()
+        codes = codes[start % 4:start % 4 + end - start].astype(np.uint8)
+
+        run_starts, run_ends, run_codes = self._character_runs(name)
+        first = np.searchsorted(run_ends, start, side="right")
+        last = np.searchsorted(run_starts, end)
+        for run_start, run_end, code in zip(run_starts[first:last],
+                                            run_ends[first:last],
+                                            run_codes[first:last]):
+            codes[max(run_start, start) - start:min(run_end, end) - start] = code
+        return codes
+
+    def sequence(self, name, start, end):
+        """
+        :return: Sequence as str (as get_sequence_ucsc(name, start + 1, end),
+            in upper case)
+        """
+        return LETTERS[self.codes(name, start, end)].tobytes().decode("ascii")
+
+
+def parse_cigar(cigar):
+    """
+    :param cigar: cigar string as in NCBI alignment files (e.g. "M10 I2 M5")
+    :return: list of (code, n)
+    """
+    operations = []
+    for c in cigar.split():
+        if c[0] not in ("M", "D", "I"):
+            raise ValueError("Invalid cigar string. Should only contain "
+                             "letters I, D or M.")
+        operations.append((c[0], int(c[1:])))
+    return operations
+
+
+def _match_cigar(main_codes, alt_codes, chunk_size=CHUNK_SIZE):
+    # M and V (mismatch) operations for two equally long sequences
+    # (as offsetbasedgraph.cigar_align.get_match_cigar)
+    cigar = []
+    for chunk_start in range(0, len(main_codes), chunk_size):
+        equal = main_codes[chunk_start:chunk_start + chunk_size] == \
+            alt_codes[chunk_start:chunk_start + chunk_size]
+        changes = np.flatnonzero(equal[1:] != equal[:-1]) + 1
+        starts = np.concatenate(([0], changes))
+        ends = np.concatenate((changes, [len(equal)]))
+        for start, end in zip(starts, ends):
+            symbol = "M" if equal[start] else "V"
+            if cigar and start == 0 and cigar[-1][0] == symbol:
+                cigar[-1] = (symbol, cigar[-1][1] + int(end - start))
+            else:
+                cigar.append((symbol, int(end - start)))
+    return cigar
+
+
+def clean_cigar(cigar, alt_codes, main_codes, chunk_size=CHUNK_SIZE):
+    """
+    Split M operations in cigar into M (match) and V (mismatch) operations
+    (as offsetbasedgraph.cigar_align.clean_cigar)
+
+    :param cigar: list of (code, n)
+    :param alt_codes: Codes of the aligned part of the alt locus
+    :param main_codes: Codes of the aligned part of main
+    """
+    cleaned_cigar = []
+    alt_offset = 0
+    main_offset = 0
+    for var_type, n in cigar:
+        if var_type == "I":
+            alt_offset += n
+            cleaned_cigar.append((var_type, n))
+        elif var_type == "D":
+            main_offset += n
+            cleaned_cigar.append((var_type, n))
+        else:
+            cleaned_cigar.extend(_match_cigar(
+                main_codes[main_offset:main_offset + n],
+                alt_codes[alt_offset:alt_offset + n], chunk_size))
+            main_offset += n
+            alt_offset += n
+
+    assert (main_offset, alt_offset) == (len(main_codes), len(alt_codes)), \
+        "Cigar lengths %s do not match sequence lengths %s" % (
+            (main_offset, alt_offset), (len(main_codes), len(alt_codes)))
+    return cleaned_cigar
+
+
+def merge_alt_using_sequence_store(graph, name_trans, alt_id,
+                                   ncbi_alignments_dir, store):
+    """
+    Same as offsetbasedgraph's merge_alt_using_cigar, with sequences
+    from store
+
+    :return: (translation, new graph)
+    """
+    from offsetbasedgraph import Interval
+    from offsetbasedgraph.cigar_align import align_cigar
+    alignment_file = os.path.join(ncbi_alignments_dir, "%s.alignment" % alt_id)
+    if not os.path.isfile(alignment_file):
+        print("Could not open alignment file %s" % alignment_file)
+        return name_trans, name_trans.graph2
+
+    with open(alignment_file) as f:
+        d = f.read().split(",")
+    # 1-based, inclusive in alignment file
+    main_start, main_end = int(d[0]) - 1, int(d[1])
+    alt_start, alt_end = int(d[2]) - 1, int(d[3])
+    main_chr = alt_id.split("_")[0]
+
+    cigar = clean_cigar(parse_cigar(d[-1]),
+                        store.codes(alt_id, alt_start, alt_end),
+                        store.codes(main_chr, main_start, main_end))
+    alt_block = name_trans.translate_rp(alt_id)[0].region_paths[0]
+    main_block = name_trans.translate_rp(main_chr)[0].region_paths[0]
+    trans = align_cigar(cigar,
+                        Interval(main_start, main_end, [main_block]),
+                        Interval(alt_start, alt_end, [alt_block]),
+                        graph)
+    new_graph = trans.translate_subgraph(graph)
+    trans.set_graph2(new_graph)
+    return trans, new_graph
+
+
+def create_sequence_store(args):
+    f = sys.stdin if args.fasta_file_name == "-" else open(args.fasta_file_name)
+    sequences = write_store_from_fasta(f, args.out_file_name)
+    if f is not sys.stdin:
+        f.close()
+    print("Stored %d sequences (%d bases) in %s" % (
+        len(sequences), sum(s["length"] for s in sequences.values()),
+        args.out_file_name))
@@ -0,0 +1,224 @@
+"""
+Array-backed GRCh38 graph and name translation for worker processes.
+
+The numeric graph and its NameTable (see nametable.py) are stored as a few
+flat numpy arrays (block names, lengths and edges as offsets/targets, where
+the id of a block is its index). The arrays are placed in one buffer,
+either in multiprocessing.shared_memory or in a file that is memory mapped,
+and worker processes attach to it with read-only views (constant time,
+no copying, no pickling of the graph).
+
+offsetbasedgraph's merge methods need Graph objects. An alt locus is merged
+with its main chromosome only, so the merge is given a graph with only these
+two blocks (locus_graphs()), and the merged graph only has the blocks of the
+alt locus and main chromosome. No process creates a Graph object for the
+whole genome for the merge, and workers that only get results from the
+cache create no Graph objects.
+"""
+
+import json
+import numpy as np
+
+ALIGNMENT = 8
+
+
+def _locus_graphs(name_table, adj_list, alt_id):
+    # Graph with the blocks of alt_id and its main chromosome, and NameTable
+    # translating to it. New blocks get the same ids as when merging
+    # in the whole graph. adj_list(block) gives the edges of a block
+    from offsetbasedgraph import Block, Graph
+    from nametable import NameTable
+    ids = [name_table.ids[alt_id.split("_")[0]], name_table.ids[alt_id]]
+    graph = Graph({b: Block(name_table.lengths[b]) for b in ids},
+                  {b: [t for t in adj_list(b) if t in ids] for b in ids})
+    graph._id = len(name_table.names) - 1
+    return graph, NameTable(name_table.names, name_table.lengths, graph)
+
+
+class LoadedGraphs(object):
+    """
+    Same interface as SharedGraph for a graph and name translation
+    already in memory
+    """
+
+    def __init__(self, graph, name_trans):
+        self._graph = graph
+        self._name_trans = name_trans
+
+    def graph(self):
+        return self._graph
+
+    def name_translation(self):
+        return self._name_trans
+
+    def locus_graphs(self, alt_id):
+        return _locus_graphs(self._name_trans,
+                             lambda b: self._graph.adj_list[b], alt_id)
+
+
+class SharedGraph(object):
+
+    FIELDS = ("names", "lengths", "adj_offsets", "adj_targets")
+
+    def __init__(self, arrays, buffer_owner=None):
+        """
+        :param arrays: dict with arrays for all FIELDS
+        :param buffer_owner: SharedMemory/memmap the arrays are views of
+        """
+        self.arrays = arrays
+        self._buffer_owner = buffer_owner
+        self._handle = None
+        self._graph = None
+        self._name_trans = None
+
+    @classmethod
+    def from_name_table(cls, names, graph=None):
+        """
+        :param names: NameTable
+        :param graph: Graph with the ids in names (names.graph2 if None)
+        """
+        if graph is None:
+            graph = names.graph2
+        n = len(names.names)
+        lengths = np.array([graph.blocks[b].length() for b in range(n)],
+                           dtype=np.int64)
+        edges = [graph.adj_list[b] for b in range(n)]
+        adj_offsets = np.zeros(n + 1, dtype=np.int64)
+        adj_offsets[1:] = np.cumsum([len(e) for e in edges])
+        adj_targets = np.array([t for e in edges for t in e], dtype=np.int64)
+        return cls({"names": np.array(names.names, dtype=str),
+                    "lengths": lengths, "adj_offsets": adj_offsets,
+                    "adj_targets": adj_targets})
+
+    def _layout(self):
+        # List of (field, dtype, shape, byte offset) and total size
+        layout = []
+        offset = 0
+        for field in self.FIELDS:
+            array = self.arrays[field]
+            layout.append((field, array.dtype.str, array.shape, offset))
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        return layout, max(offset, ALIGNMENT)
+
+    def _copy_to(self, buffer, layout):
+        for field, dtype, shape, offset in layout:
+            view = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            view[...] = self.arrays[field]
+
+    @staticmethod
+    def _views(buffer, layout):
+        arrays = {}
+        for field, dtype, shape, offset in layout:
+            view = np.ndarray(tuple(shape), dtype=dtype, buffer=buffer,
+                              offset=offset)
+            view.flags.writeable = False
+            arrays[field] = view
+        return arrays
+
+    def to_shared_memory(self):
+        """
+        Copy arrays to a new shared memory block. The caller should call
+        unlink() on the returned SharedGraph when no process needs it anymore.
+
+        :return: SharedGraph backed by shared memory
+        """
+        from multiprocessing import shared_memory
+        layout, size = self._layout()
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        self._copy_to(shm.buf, layout)
+        shared = SharedGraph(self._views(shm.buf, layout), shm)
+        shared._handle = ("shm", shm.name, layout)
+        return shared
+
+    def to_file(self, file_name):
+        """
+        Write arrays to file_name (and layout to file_name.json) so that they
+        can be memory mapped with from_file
+        """
+        layout, size = self._layout()
+        data = np.zeros(size, dtype=np.uint8)
+        self._copy_to(data, layout)
+        data.tofile(file_name)
+        with open(file_name + ".json", "w") as f:
+            json.dump(layout, f)
+
+    @classmethod
+    def from_file(cls, file_name):
+        with open(file_name + ".json") as f:
+            layout = json.load(f)
+        data = np.memmap(file_name, dtype=np.uint8, mode="r")
+        shared = cls(cls._views(data, layout), data)
+        shared._handle = ("file", file_name, layout)
+        return shared
+
+    def handle(self):
+        """
+        :return: Small picklable object that can be given to attach()
+            in another process
+        """
+        return self._handle
+
+    @classmethod
+    def attach(cls, handle):
+        """
+        Attach to SharedGraph created by to_shared_memory or to_file
+        in another process
+        """
+        kind, name, layout = handle
+        if kind == "file":
+            return cls.from_file(name)
+
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(cls._views(shm.buf, layout), shm)
+
+    def close(self):
+        self.arrays = None
+        if self._buffer_owner is not None and hasattr(self._buffer_owner, "close"):
+            self._buffer_owner.close()
+
+    def unlink(self):
+        shm = self._buffer_owner
+        self.close()
+        shm.unlink()
+
+    def graph(self):
+        """
+        :return: Numeric Graph (created on first call)
+        """
+        if self._graph is None:
+            from offsetbasedgraph import Block, Graph
+            lengths = self.arrays["lengths"]
+            offsets = self.arrays["adj_offsets"]
+            targets = self.arrays["adj_targets"]
+            blocks = {b: Block(int(length)) for b, length in enumerate(lengths)}
+            adj_list = {}
+            for b in range(len(lengths)):
+                if offsets[b + 1] > offsets[b]:
+                    adj_list[b] = [int(t) for t in targets[offsets[b]:offsets[b + 1]]]
+            self._graph = Graph(blocks, adj_list)
+        return self._graph
+
+    def name_translation(self):
+        """
+        :return: NameTable for the graph (created on first call). Its graph2
+            is only created if used
+        """
+        if self._name_trans is None:
+            from nametable import NameTable
+            self._name_trans = NameTable(
+                [str(n) for n in self.arrays["names"]],
+                [int(length) for length in self.arrays["lengths"]])
+        return self._name_trans
+
+    def locus_graphs(self, alt_id):
+        """
+        :return: Graph with only the blocks of alt_id and its main chromosome
+            and NameTable translating to this graph
+        """
+        offsets = self.arrays["adj_offsets"]
+        targets = self.arrays["adj_targets"]
+        return _locus_graphs(
+            self.name_translation(),
+            lambda b: [int(t) for t in targets[offsets[b]:offsets[b + 1]]],
+            alt_id)
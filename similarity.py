@@ -0,0 +1,135 @@
+"""
+Exon overlap similarity between transcripts on a merged graph.
+
+Every block of the graph is given a start position on one line (the blocks
+placed after each other), so that the exons of a transcript translated to
+the graph become a sorted array of disjoint segments on this line. Two
+transcripts share bases only where their exons are on the same (merged)
+blocks.
+
+The overlap between one transcript and all transcripts in a set is found
+with a single numpy.searchsorted of the boundaries of all segments in the
+set into the segments of the transcript (a sweep over the covered length),
+instead of comparing exons pairwise in Python. The Jaccard score of two
+transcripts is overlap / (length1 + length2 - overlap).
+"""
+
+import numpy as np
+
+N_BINS = 10
+
+
+def block_offsets(graph):
+    """
+    :return: dict{block id: start position of block on the line}
+    """
+    offsets = {}
+    offset = 0
+    for block in graph.blocks:
+        offsets[block] = offset
+        offset += graph.blocks[block].length()
+    return offsets
+
+
+def exon_segments(exons, graph, offsets):
+    """
+    :param exons: Intervals on graph
+    :return: (starts, ends) of the merged segments covered by the exons
+    """
+    starts = []
+    ends = []
+    for exon in exons:
+        last = len(exon.region_paths) - 1
+        for i, rp in enumerate(exon.region_paths):
+            start = exon.start_position.offset if i == 0 else 0
+            end = exon.end_position.offset if i == last \
+                else graph.blocks[rp].length()
+            if end > start:
+                starts.append(offsets[rp] + start)
+                ends.append(offsets[rp] + end)
+    if not starts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    order = np.argsort(starts, kind="stable")
+    starts = np.asarray(starts, dtype=np.int64)[order]
+    ends = np.maximum.accumulate(np.asarray(ends, dtype=np.int64)[order])
+    # Merge segments overlapping or touching the previous segment
+    new = np.concatenate(([True], starts[1:] > ends[:-1]))
+    group_ends = np.concatenate((np.flatnonzero(new)[1:] - 1, [len(starts) - 1]))
+    return starts[new], ends[group_ends]
+
+
+class TranscriptSegments(object):
+    """
+    Segments of a list of transcripts, concatenated
+    """
+
+    def __init__(self, segments):
+        """
+        :param segments: List of (starts, ends) from exon_segments
+        """
+        self.n = len(segments)
+        self.starts = np.concatenate(
+            [s for s, _ in segments] + [np.zeros(0, dtype=np.int64)])
+        self.ends = np.concatenate(
+            [e for _, e in segments] + [np.zeros(0, dtype=np.int64)])
+        self.owners = np.repeat(np.arange(self.n),
+                                [len(s) for s, _ in segments])
+        self.lengths = np.bincount(self.owners, self.ends - self.starts,
+                                   minlength=self.n).astype(np.int64)
+
+
+def _covered(starts, ends, prefix, positions):
+    # Length covered by the segments before each position
+    k = np.searchsorted(starts, positions, side="right") - 1
+    inside = np.minimum(positions - starts[np.maximum(k, 0)],
+                        (ends - starts)[np.maximum(k, 0)])
+    return np.where(k >= 0, prefix[np.maximum(k, 0)] + inside, 0)
+
+
+def overlaps(segments, others):
+    """
+    :param segments: (starts, ends) of one transcript
+    :param others: TranscriptSegments
+    :return: Array with number of bases shared with each transcript in others
+    """
+    starts, ends = segments
+    if len(starts) == 0 or len(others.starts) == 0:
+        return np.zeros(others.n, dtype=np.int64)
+    prefix = np.concatenate(([0], np.cumsum(ends - starts)[:-1]))
+    shared = _covered(starts, ends, prefix, others.ends) - \
+        _covered(starts, ends, prefix, others.starts)
+    return np.bincount(others.owners, shared,
+                       minlength=others.n).astype(np.int64)
+
+
+def similarity_matrices(alt_segments, main_segments):
+    """
+    :param alt_segments: List of (starts, ends), one for each alt transcript
+    :param main_segments: List of (starts, ends), one for each main transcript
+    :return: (overlap, jaccard) matrices with one row per alt transcript
+        and one column per main transcript
+    """
+    main = TranscriptSegments(main_segments)
+    overlap = np.zeros((len(alt_segments), main.n), dtype=np.int64)
+    for i, segments in enumerate(alt_segments):
+        overlap[i] = overlaps(segments, main)
+
+    alt_lengths = np.array([np.sum(e - s) for s, e in alt_segments],
+                           dtype=np.int64).reshape(-1, 1)
+    union = alt_lengths + main.lengths - overlap
+    jaccard = np.divide(overlap, union, out=np.zeros(overlap.shape),
+                        where=union > 0)
+    return overlap, jaccard
+
+
+def best_match_histogram(jaccard):
+    """
+    :return: Number of alt transcripts (rows) with best Jaccard score in
+        each of the bins [0, 0.1), [0.1, 0.2), ..., [0.9, 1.0]
+    """
+    if jaccard.shape[0] == 0:
+        return np.zeros(N_BINS, dtype=np.int64)
+    best = jaccard.max(axis=1) if jaccard.shape[1] else \
+        np.zeros(jaccard.shape[0])
+    return np.histogram(best, bins=np.linspace(0, 1, N_BINS + 1))[0]
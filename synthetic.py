@@ -0,0 +1,245 @@
+"""
+Generates synthetic GRCh38-like data sets for scale testing.
+
+The files are written in the same formats as the files in data/
+(chrom sizes, alt loci, preprocessed NCBI alignments and UCSC gene tables),
+so that they can be given directly to the subcommands in gen_graph_coords.py.
+
+Optionally, sequences for all alt loci and the main chromosome regions they
+are aligned against are written to a sequence cache directory using the file
+names expected by offsetbasedgraph.sequences.get_sequence_ucsc, so that
+flank detection and cigar merging can run without fetching sequences from UCSC.
+"""
+
+import os
+import random
+
+GENES_HEADER = "#bin\tname\tchrom\tstrand\ttxStart\ttxEnd\tcdsStart\t" \
+               "cdsEnd\texonCount\texonStarts\texonEnds\tscore\tname2\t" \
+               "cdsStartStat\tcdsEndStat\texonFrames\n"
+
+NUCLEOTIDES = "ACGT"
+
+
+def random_cigar(main_length, n_operations, max_insertion=1000, rng=random):
+    """
+    Creates a random cigar (list of (code, n)) starting and ending with
+    a match and alternating between matches and insertions/deletions.
+
+    :param main_length: Number of base pairs the cigar should cover on main
+    :param n_operations: Number of cigar operations (will be made odd)
+    :param max_insertion: Maximum length of an insertion
+    :return: cigar as list of tuples (code, n)
+    """
+    n_matches = max(1, (n_operations + 1) // 2)
+    n_indels = n_matches - 1
+    codes = [rng.choice("ID") for _ in range(n_indels)]
+    n_deletions = codes.count("D")
+
+    # Distribute the main length on matches and deletions (all >= 1)
+    n_main_parts = n_matches + n_deletions
+    assert main_length >= n_main_parts, \
+        "Main length %d too short for %d cigar operations" % (main_length, n_operations)
+    cuts = sorted(rng.sample(range(1, main_length), n_main_parts - 1))
+    parts = [b - a for a, b in zip([0] + cuts, cuts + [main_length])]
+
+    cigar = []
+    for i in range(n_matches):
+        cigar.append(("M", parts.pop()))
+        if i < n_indels:
+            if codes[i] == "D":
+                cigar.append(("D", parts.pop()))
+            else:
+                cigar.append(("I", rng.randint(1, max_insertion)))
+
+    return cigar
+
+
+def cigar_to_string(cigar):
+    return " ".join("%s%d" % (code, n) for code, n in cigar)
+
+
+def cigar_lengths(cigar):
+    """
+    :return: (length on main, length on alt)
+    """
+    main_length = sum(n for code, n in cigar if code in "MD")
+    alt_length = sum(n for code, n in cigar if code in "MI")
+    return main_length, alt_length
+
+
+def random_sequence(length, rng=random):
+    return "".join(rng.choice(NUCLEOTIDES) for _ in range(length))
+
+
+def alt_sequence_from_cigar(main_seq, cigar, mismatch_rate=0.001, rng=random):
+    """
+    Creates an alt locus sequence from the main sequence it is aligned
+    against. Matches are copied (with some mismatches),
+    insertions are random and deletions are skipped.
+    """
+    out = []
+    main_offset = 0
+    for code, n in cigar:
+        if code == "M":
+            seq = list(main_seq[main_offset:main_offset + n])
+            # Keep first and last base identical so that flanks are found
+            for i in range(1, n - 1):
+                if rng.random() < mismatch_rate:
+                    seq[i] = rng.choice(NUCLEOTIDES.replace(seq[i], ""))
+            out.append("".join(seq))
+            main_offset += n
+        elif code == "D":
+            main_offset += n
+        elif code == "I":
+            out.append(random_sequence(n, rng))
+
+    return "".join(out)
+
+
+def _random_gene_line(name, chrom, start, end, rng):
+    """Returns a UCSC gene line for a random gene inside [start, end)"""
+    n_exons = rng.randint(1, 8)
+    length = end - start
+    tx_length = rng.randint(min(length, 2 * n_exons), length)
+    tx_start = start + rng.randint(0, length - tx_length)
+    tx_end = tx_start + tx_length
+
+    bounds = sorted(rng.sample(range(tx_start + 1, tx_end), 2 * n_exons - 2)) \
+        if tx_length > 2 * n_exons else []
+    bounds = [tx_start] + bounds + [tx_end]
+    exon_starts = bounds[0::2]
+    exon_ends = bounds[1::2]
+
+    return "\t".join([
+        "0", name, chrom, rng.choice("+-"),
+        str(tx_start), str(tx_end), str(tx_start), str(tx_end),
+        str(len(exon_starts)),
+        "".join("%d," % s for s in exon_starts),
+        "".join("%d," % e for e in exon_ends),
+        "0", name, "cmpl", "cmpl",
+        "".join("0," for _ in exon_starts)
+    ]) + "\n"
+
+
+def _place_loci(chrom_size, n_loci, min_locus_length, max_locus_length,
+                overlap, rng):
+    """
+    Returns a sorted list of (start, end) main chromosome regions
+    (0-based, exclusive end). With probability overlap, a locus is placed so
+    that it overlaps the previous locus.
+    """
+    regions = []
+    for i in range(n_loci):
+        length = rng.randint(min_locus_length, max_locus_length)
+        if regions and rng.random() < overlap:
+            prev_start, prev_end = regions[-1]
+            start = rng.randint(prev_start, prev_end - 1)
+        else:
+            start = rng.randint(1, chrom_size - length - 1)
+        start = min(start, chrom_size - length - 1)
+        regions.append((start, start + length))
+
+    return sorted(regions)
+
+
+def create_synthetic_data(out_dir, n_chromosomes=2, chrom_size=10000000,
+                          alt_loci_per_chromosome=10, min_locus_length=10000,
+                          max_locus_length=200000, overlap=0.0,
+                          cigar_operations=11, genes_per_locus=10,
+                          sequence_cache_dir=None, mismatch_rate=0.001,
+                          seed=0):
+    """
+    Writes a synthetic data set to out_dir:
+        chrom.sizes, alt_loci.txt, alt_alignments/*.alignment and genes.txt
+
+    :param n_chromosomes: Number of main chromosomes
+    :param chrom_size: Length of each main chromosome
+    :param alt_loci_per_chromosome: Number of alt loci on each chromosome
+    :param min_locus_length: Minimum length of the main region of an alt locus
+    :param max_locus_length: Maximum length of the main region of an alt locus
+    :param overlap: Probability that an alt locus overlaps the previous one
+    :param cigar_operations: Number of operations in each alignment cigar
+    :param genes_per_locus: Number of genes on each alt locus and on main
+        parallel to each alt locus
+    :param sequence_cache_dir: If set, sequences are written to this
+        directory (e.g. data/tmp) so that they are not fetched from UCSC
+    :param seed: Random seed
+    :return: dict with file names of the created files
+    """
+    rng = random.Random(seed)
+    alignments_dir = os.path.join(out_dir, "alt_alignments")
+    if not os.path.isdir(alignments_dir):
+        os.makedirs(alignments_dir)
+
+    files = {
+        "chrom_sizes": os.path.join(out_dir, "chrom.sizes"),
+        "alt_loci": os.path.join(out_dir, "alt_loci.txt"),
+        "alignments_dir": alignments_dir,
+        "genes": os.path.join(out_dir, "genes.txt")
+    }
+
+    chrom_sizes_lines = []
+    alt_loci_lines = []
+    gene_lines = [GENES_HEADER]
+    n_loci = 0
+    n_genes = 0
+    for c in range(1, n_chromosomes + 1):
+        chrom = "chr%d" % c
+        chrom_sizes_lines.append("%s\t%d\n" % (chrom, chrom_size))
+        regions = _place_loci(chrom_size, alt_loci_per_chromosome,
+                              min_locus_length, max_locus_length,
+                              overlap, rng)
+
+        for start, end in regions:
+            n_loci += 1
+            alt_id = "%s_SYN%06dv1_alt" % (chrom, n_loci)
+            cigar = random_cigar(end - start, cigar_operations, rng=rng)
+            main_length, alt_length = cigar_lengths(cigar)
+            assert main_length == end - start
+
+            # Coordinates in alignment and alt loci files are 1-based, inclusive
+            chrom_sizes_lines.append("%s\t%d\n" % (alt_id, alt_length))
+            alt_loci_lines.append("%s    %s  %d  %d %d    SYNREGION%d  ALT_REF_LOCI_1\n" %
+                                  (alt_id, chrom, start + 1, end, alt_length, n_loci))
+            with open(os.path.join(alignments_dir,
+                                   "%s.alignment" % alt_id), "w") as f:
+                f.write("%d,%d,%d,%d,%s" % (start + 1, end, 1, alt_length,
+                                            cigar_to_string(cigar)))
+
+            if sequence_cache_dir is not None:
+                main_seq = random_sequence(end - start, rng)
+                alt_seq = alt_sequence_from_cigar(main_seq, cigar,
+                                                  mismatch_rate, rng)
+                _write_cached_sequence(sequence_cache_dir, chrom,
+                                       start + 1, end, main_seq)
+                _write_cached_sequence(sequence_cache_dir, alt_id,
+                                       1, alt_length, alt_seq)
+
+            for i in range(genes_per_locus):
+                n_genes += 1
+                gene_lines.append(_random_gene_line(
+                    "SYN_%d" % n_genes, chrom, start, end, rng))
+                gene_lines.append(_random_gene_line(
+                    "SYN_%d_alt" % n_genes, alt_id, 0, alt_length, rng))
+
+    with open(files["chrom_sizes"], "w") as f:
+        f.writelines(chrom_sizes_lines)
+
+    with open(files["alt_loci"], "w") as f:
+        f.writelines(alt_loci_lines)
+
+    with open(files["genes"], "w") as f:
+        f.writelines(gene_lines)
+
+    return files
+
+
+def _write_cached_sequence(sequence_cache_dir, seq_id, start, end, sequence):
+    # Same file name as used by offsetbasedgraph.sequences.get_sequence_ucsc
+    if not os.path.isdir(sequence_cache_dir):
+        os.makedirs(sequence_cache_dir)
+    file_name = os.path.join(sequence_cache_dir, "sequence_%s_%s_%s.fasta" %
+                             (seq_id, start, end))
+    with open(file_name, "w") as f:
+        f.write(sequence)
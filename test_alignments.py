@@ -0,0 +1,119 @@
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from alignments import curate_alignment_files, curate_file, \
+    parse_alignment_gff, read_chrom_sizes, alt_ids_by_accession
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+GFF_LINE = "NC_0000%s.11\tRefSeq\tmatch\t%s\t%s\t.\t+\t.\t" \
+           "ID=aln1;Target=%s %s %s +;gap_count=1;Gap=%s"
+
+
+def _gff_file_name(alt_id):
+    # chr10_KI270824v1_alt -> KI270824.1_alignments.gff
+    return alt_id.split("_")[1].replace("v", ".") + "_alignments.gff"
+
+
+class TestCurateAlignments(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.gff_dir = os.path.join(cls.tmp_dir, "gff")
+        os.mkdir(cls.gff_dir)
+        cls.sizes = read_chrom_sizes(os.path.join(DATA_DIR, "grch38.chrom.sizes"))
+
+        # GFF files as downloaded from NCBI for the curated alignments
+        # (alt loci without alignment have empty files, and get no file now)
+        cls.expected = {}
+        cls.without_alignment = []
+        for file_name in sorted(glob.glob(
+                os.path.join(DATA_DIR, "alt_alignments", "*.alignment")))[:10]:
+            alt_id = os.path.basename(file_name)[:-len(".alignment")]
+            with open(file_name) as f:
+                text = f.read()
+            with open(os.path.join(cls.gff_dir, _gff_file_name(alt_id)), "w") as f:
+                f.write("##gff-version 3\n#!processor NCBI annotwriter\n")
+                if not text:
+                    f.write("NC_000010.11\tRefSeq\tregion\t1\t10\t.\t+\t.\tID=a\n")
+                    cls.without_alignment.append(alt_id)
+                    continue
+                d = text.split(",")
+                f.write(GFF_LINE % (alt_id.split("_")[0][3:], d[0], d[1],
+                                    alt_id.split("_")[1].replace("v", "."),
+                                    d[2], d[3], d[4]))
+            cls.expected[alt_id] = text
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def _curate(self, out_dir, processes):
+        args = lambda: None
+        args.gff_dir = self.gff_dir
+        args.chrom_sizes_file_name = os.path.join(DATA_DIR, "grch38.chrom.sizes")
+        args.out_dir = out_dir
+        args.processes = processes
+        curate_alignment_files(args)
+
+    def test_same_as_curated_files(self):
+        for processes in (1, 2):
+            out_dir = os.path.join(self.tmp_dir, "out%d" % processes)
+            # Alignments written by earlier runs are removed if skipped now
+            os.mkdir(out_dir)
+            for alt_id in self.without_alignment:
+                with open(os.path.join(out_dir, "%s.alignment" % alt_id), "w") as f:
+                    f.write("1,2,1,2,M2\n")
+            self._curate(out_dir, processes)
+            self.assertEqual(sorted(os.listdir(out_dir)),
+                             sorted("%s.alignment" % a for a in self.expected))
+            for alt_id, text in self.expected.items():
+                with open(os.path.join(out_dir, "%s.alignment" % alt_id)) as f:
+                    self.assertEqual(f.read(), text)
+
+    def test_invalid_alignments(self):
+        alt_ids = alt_ids_by_accession(self.sizes)
+        alt_id = sorted(self.expected)[0]
+        d = self.expected[alt_id].split(",")
+        accession = alt_id.split("_")[1].replace("v", ".")
+        file_name = os.path.join(self.tmp_dir, _gff_file_name(alt_id))
+
+        cases = [(d[0], int(d[1]) + 1, d[2], d[3], d[4]),  # Wrong length
+                 (d[0], d[1], d[2], d[3], d[4].replace("M", "X", 1))]
+        for case in cases:
+            with open(file_name, "w") as f:
+                f.write(GFF_LINE % ((alt_id.split("_")[0][3:],) + case[:2] +
+                                    (accession,) + case[2:]))
+            result_id, line, error = curate_file(file_name, self.sizes, alt_ids)
+            self.assertEqual(result_id, alt_id)
+            self.assertIsNone(line)
+            self.assertIsNotNone(error)
+
+        # Outside main chromosome
+        with open(file_name, "w") as f:
+            f.write(GFF_LINE % ((alt_id.split("_")[0][3:],) + tuple(d[:2]) +
+                                (accession,) + tuple(d[2:])))
+        sizes = dict(self.sizes)
+        sizes[alt_id.split("_")[0]] = int(d[1]) - 1
+        self.assertIn("outside", curate_file(file_name, sizes, alt_ids)[2])
+
+    def test_no_alignment(self):
+        self.assertIsNone(parse_alignment_gff(["##gff-version 3\n"]))
+        self.assertIsNone(parse_alignment_gff(
+            ["NC_000010.11\tRefSeq\tregion\t1\t10\t.\t+\t.\tID=a\n"]))
+
+    def test_data_scripts_import_without_side_effects(self):
+        empty_dir = os.path.join(self.tmp_dir, "empty")
+        os.mkdir(empty_dir)
+        subprocess.check_call(
+            [sys.executable, "-c", "import various_data_generation_scripts"],
+            cwd=empty_dir, env=dict(os.environ, PYTHONPATH=DATA_DIR))
+        self.assertEqual(os.listdir(empty_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from offsetbasedgraph import Interval, Position, Translation
+from offsetbasedgraph.graphcreators import create_initial_grch38_graph, \
+    grch38_graph_to_numeric, merge_alt_using_cigar
+import methods
+from arraytranslation import ArrayTranslation, load_translation
+from coordinates import CoordinateTable
+from liftover import create_tables
+from synthetic import create_synthetic_data
+
+
+class TestArrayTranslation(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_dir = os.getcwd()
+        cls.tmp_dir = tempfile.mkdtemp()
+        os.chdir(cls.tmp_dir)
+        cls.files = create_synthetic_data(
+            "synthetic", n_chromosomes=2, chrom_size=100000,
+            alt_loci_per_chromosome=3, min_locus_length=1000,
+            max_locus_length=5000, overlap=0.5, cigar_operations=9,
+            genes_per_locus=2, sequence_cache_dir="data/tmp")
+        args = lambda: None
+        args.chrom_sizes_file_name = cls.files["chrom_sizes"]
+        args.alt_locations_file_name = cls.files["alt_loci"]
+        args.out_file_name = "graph"
+        methods.create_graph(args)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.old_dir)
+        shutil.rmtree(cls.tmp_dir)
+
+    def _assert_same_positions(self, trans, array_trans, inverse):
+        random.seed(0)
+        graph = trans.graph2 if inverse else trans.graph1
+        for block in graph.blocks:
+            length = graph.blocks[block].length()
+            for offset in [0, length - 1] + random.sample(range(length), min(10, length)):
+                position = Position(block, offset)
+                self.assertEqual(
+                    array_trans.translate_position(position, inverse),
+                    trans.translate_position(position, inverse))
+
+    def test_create_graph_translation(self):
+        trans = Translation.from_file("graph")
+        ArrayTranslation.from_translation(trans).to_file("graph.arrays")
+        array_trans = load_translation("graph.arrays")
+        self.assertIsInstance(array_trans, ArrayTranslation)
+        self.assertEqual(array_trans.graph2.blocks, trans.graph2.blocks)
+        self._assert_same_positions(trans, array_trans, False)
+        self._assert_same_positions(trans, array_trans, True)
+
+        random.seed(1)
+        for block in trans.graph1.blocks:
+            length = trans.graph1.blocks[block].length()
+            for _ in range(20):
+                start = random.randint(0, length - 1)
+                end = random.randint(start + 1, length)
+                interval = Interval(start, end, [block], trans.graph1)
+                self.assertEqual(array_trans.translate(interval).notation(),
+                                 trans.translate(interval).notation())
+
+        # Can be used instead of Translation by liftover and coordinates
+        tables = create_tables(trans)
+        array_tables = create_tables(array_trans)
+        for block, table in tables.items():
+            self.assertEqual(array_tables[block].region_paths,
+                             table.region_paths)
+            self.assertEqual(list(array_tables[block].starts), list(table.starts))
+        self.assertEqual(
+            list(CoordinateTable.from_translation(array_trans).sequence_offsets),
+            list(CoordinateTable.from_translation(trans).sequence_offsets))
+
+    def test_merged_alt_locus_translation(self):
+        text_graph = create_initial_grch38_graph(self.files["chrom_sizes"])
+        graph, name_trans = grch38_graph_to_numeric(text_graph)
+        alt_id = [b for b in text_graph.blocks if "alt" in b][0]
+        trans, complex_graph = merge_alt_using_cigar(
+            graph, name_trans, alt_id, self.files["alignments_dir"])
+        array_trans = ArrayTranslation.from_translation(trans)
+        self._assert_same_positions(trans, array_trans, False)
+        self._assert_same_positions(trans, array_trans, True)
+
+        # Intervals on graph2 are translated to multipath intervals on graph1
+        random.seed(2)
+        n_multipath = 0
+        for block in trans.graph2.blocks:
+            length = trans.graph2.blocks[block].length()
+            for _ in range(5):
+                start = random.randint(0, length - 1)
+                interval = Interval(start, random.randint(start + 1, length),
+                                    [block], trans.graph2)
+                expected = trans.translate_interval(interval.copy(), True)
+                result = array_trans.translate_interval(interval, True)
+                self.assertIs(type(result), type(expected))
+                if hasattr(expected, "start_positions"):
+                    n_multipath += 1
+                    self.assertEqual(result.start_positions,
+                                     expected.start_positions)
+                    self.assertEqual(result.end_positions,
+                                     expected.end_positions)
+                    self.assertEqual(result.region_paths, expected.region_paths)
+                else:
+                    self.assertEqual(result.get_single_path_intervals(),
+                                     expected.get_single_path_intervals())
+        self.assertGreater(n_multipath, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
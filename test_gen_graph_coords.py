@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Maximum time (in microseconds) spent importing modules when running a
+# light-weight subcommand, not counting modules imported by python itself
+IMPORT_TIME_BUDGET = 50000
+
+
+def import_times(args):
+    """
+    Run python with -X importtime
+
+    :return: dict{module name: self import time in microseconds}
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime"] + args,
+                             cwd=REPO_DIR, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, universal_newlines=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, _, module = line[len("import time:"):].split("|")
+        times[module.strip()] = int(self_time)
+    return times
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_html_alt_loci_select_import_budget(self):
+        baseline = import_times(["-c", "pass"])
+        times = import_times(["gen_graph_coords.py", "html_alt_loci_select"])
+        for module in ["methods", "offsetbasedgraph", "numpy", "visualizehtml"]:
+            self.assertNotIn(module, times)
+
+        total = sum(t for module, t in times.items() if module not in baseline)
+        self.assertLess(total, IMPORT_TIME_BUDGET)
+
+
+if __name__ == "__main__":
+    unittest.main()
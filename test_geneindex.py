@@ -0,0 +1,116 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from offsetbasedgraph import Translation
+import methods
+from generecords import create_gene_dicts, read_gene_records
+import geneindex
+from geneindex import GeneIndex, GeneLocation, create_gene_index, \
+    load_gene_index
+from synthetic import create_synthetic_data
+from webtool import gene_search_html, html_gene_search
+
+
+class TestGeneIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_dir = os.getcwd()
+        cls.tmp_dir = tempfile.mkdtemp()
+        os.chdir(cls.tmp_dir)
+        cls.files = create_synthetic_data(
+            "synthetic", n_chromosomes=2, chrom_size=100000,
+            alt_loci_per_chromosome=3, min_locus_length=1000,
+            max_locus_length=5000, overlap=0.5, cigar_operations=9,
+            genes_per_locus=2, sequence_cache_dir="data/tmp")
+        args = lambda: None
+        args.chrom_sizes_file_name = cls.files["chrom_sizes"]
+        args.alt_locations_file_name = cls.files["alt_loci"]
+        args.out_file_name = "graph"
+        methods.create_graph(args)
+        args.translation_file_name = "graph"
+        args.genes_file_name = cls.files["genes"]
+        args.out_file_name = "gene_index.json"
+        create_gene_index(args)
+        cls.index = GeneIndex.from_file("gene_index.json")
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.old_dir)
+        shutil.rmtree(cls.tmp_dir)
+
+    def test_same_loci_as_gene_dicts(self):
+        genes = read_gene_records(self.files["genes"])
+        alt_loci_genes, _, parallel_genes = create_gene_dicts(
+            genes, self.files["alt_loci"])
+        trans = Translation.from_file("graph")
+        expected = set()
+        for gene_dict in (alt_loci_genes, parallel_genes):
+            for alt_id, alt_genes in gene_dict.items():
+                for gene in alt_genes:
+                    expected.add((gene.name, alt_id, str(
+                        trans.translate(gene.transcription_region).notation())))
+        found = set((entry.name, entry.alt_locus, entry.notation)
+                    for entry in self.index.entries)
+        self.assertEqual(found, expected)
+        for name, alt_id, _ in expected:
+            self.assertIn(alt_id, [entry.alt_locus for entry
+                                   in self.index.lookup(name.lower())])
+
+    def test_prefix_search(self):
+        names = sorted(set(entry.name for entry in self.index.entries))
+        prefix = names[0][:-1]
+        expected = [name for name in names if name.lower().startswith(prefix.lower())]
+        self.assertEqual(sorted(set(self.index.complete(prefix, limit=1000))),
+                         sorted(set(expected) | set(
+                             entry.name2 for entry in self.index.entries
+                             if entry.name2.lower().startswith(prefix.lower()))))
+        self.assertEqual(len(self.index.complete(prefix, limit=2)), 2)
+        self.assertTrue(all(entry.name.lower().startswith(prefix.lower()) or
+                            entry.name2.lower().startswith(prefix.lower())
+                            for entry in self.index.search(prefix, limit=5)))
+        self.assertEqual(self.index.search("no_such_gene"), [])
+        self.assertEqual(self.index.lookup("no_such_gene"), [])
+
+    def test_loaded_once(self):
+        self.assertIs(load_gene_index("gene_index.json"),
+                      load_gene_index("gene_index.json"))
+
+    def test_reloaded_when_file_changes(self):
+        shutil.copy("gene_index.json", "changed_index.json")
+        index = load_gene_index("changed_index.json")
+        os.utime("changed_index.json", (0, 0))
+        self.assertIsNot(load_gene_index("changed_index.json"), index)
+        # The index read earlier is replaced, not kept
+        self.assertEqual(len([key for key in geneindex._loaded
+                              if key.endswith("changed_index.json")]), 1)
+
+    def test_html_gene_search(self):
+        entry = self.index.entries[0]
+        args = lambda: None
+        args.prefix = entry.name
+        args.index_file_name = "gene_index.json"
+        args.limit = 20
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            html_gene_search(args)
+        self.assertIn("run('%s')" % entry.alt_locus, out.getvalue())
+
+    def test_html_gene_search_escapes_names(self):
+        GeneIndex.from_locations([
+            GeneLocation("gene<b>1</b>", "", "chr1_a'lt", "chr1", 0, 10, ""),
+            GeneLocation("gene2", "G&2", "chr1_alt", "chr1", 0, 10, "")
+        ]).to_file("escape_index.json")
+        out = gene_search_html("escape_index.json", "g", 10)
+        self.assertNotIn("<b>", out)
+        self.assertIn("gene&lt;b&gt;1&lt;/b&gt; on chr1_a&#x27;lt", out)
+        self.assertIn("run('chr1_a\\&#x27;lt')", out)
+        self.assertNotIn(" ()", out)
+        self.assertIn("gene2 (G&amp;2) on chr1_alt", out)
+
+
+if __name__ == "__main__":
+    unittest.main()
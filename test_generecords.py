@@ -0,0 +1,70 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from offsetbasedgraph import Translation
+from offsetbasedgraph.graphutils import create_gene_dicts as \
+    create_gene_dicts_intervals
+from offsetbasedgraph.graphutils import get_gene_objects_as_intervals, \
+    translate_single_gene_to_aligned_graph
+import methods
+from generecords import GeneRecord, create_gene_dicts, read_gene_records
+from synthetic import create_synthetic_data
+
+
+class TestGeneRecords(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_dir = os.getcwd()
+        cls.tmp_dir = tempfile.mkdtemp()
+        os.chdir(cls.tmp_dir)
+        cls.files = create_synthetic_data(
+            "synthetic", n_chromosomes=2, chrom_size=100000,
+            alt_loci_per_chromosome=3, min_locus_length=1000,
+            max_locus_length=5000, overlap=0.5, cigar_operations=9,
+            genes_per_locus=2, sequence_cache_dir="data/tmp")
+        args = lambda: None
+        args.chrom_sizes_file_name = cls.files["chrom_sizes"]
+        args.alt_locations_file_name = cls.files["alt_loci"]
+        args.out_file_name = "graph"
+        methods.create_graph(args)
+        cls.records = read_gene_records(cls.files["genes"])
+        cls.genes = get_gene_objects_as_intervals(cls.files["genes"])
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.old_dir)
+        shutil.rmtree(cls.tmp_dir)
+
+    def test_same_as_genes(self):
+        trans = Translation.from_file("graph")
+        for record, gene in zip(self.records, self.genes):
+            self.assertEqual(record.to_gene(), gene)
+            self.assertEqual(record.transcript_length, gene.transcript_length)
+            self.assertEqual(record.translate(trans), gene.translate(trans))
+        self.assertEqual(pickle.loads(pickle.dumps(self.records)), self.records)
+
+    def test_gene_dicts(self):
+        dicts = create_gene_dicts(self.records, self.files["alt_loci"])
+        expected = create_gene_dicts_intervals(self.genes, self.files["alt_loci"])
+        for d, expected_d in zip(dicts, expected):
+            self.assertEqual(
+                {k: [g.name for g in v] for k, v in d.items()},
+                {k: [g.name for g in v] for k, v in expected_d.items() if v})
+
+    def test_not_changed_by_translation(self):
+        trans = Translation.from_file("graph")
+        record = self.records[0]
+        first = translate_single_gene_to_aligned_graph(record, trans)
+        second = translate_single_gene_to_aligned_graph(record, trans)
+        self.assertEqual(record.transcription_region.end_position.offset,
+                         self.genes[0].transcription_region.end_position.offset)
+        self.assertEqual(first.interval.end_pos, second.interval.end_pos)
+        with self.assertRaises(AttributeError):
+            record.end = 0
+
+
+if __name__ == "__main__":
+    unittest.main()
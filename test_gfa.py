@@ -0,0 +1,69 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from offsetbasedgraph import Translation
+import methods
+from gfa import read_gfa, translation_from_gfa, write_gfa
+from synthetic import create_synthetic_data
+
+
+class TestGFA(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_dir = os.getcwd()
+        cls.tmp_dir = tempfile.mkdtemp()
+        os.chdir(cls.tmp_dir)
+        files = create_synthetic_data(
+            "synthetic", n_chromosomes=2, chrom_size=100000,
+            alt_loci_per_chromosome=3, min_locus_length=1000,
+            max_locus_length=5000, overlap=0.5, cigar_operations=9,
+            genes_per_locus=2, sequence_cache_dir="data/tmp")
+        args = lambda: None
+        args.chrom_sizes_file_name = files["chrom_sizes"]
+        args.alt_locations_file_name = files["alt_loci"]
+        args.out_file_name = "graph"
+        methods.create_graph(args)
+        cls.trans = Translation.from_file("graph")
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.old_dir)
+        shutil.rmtree(cls.tmp_dir)
+
+    def test_write_and_read(self):
+        out = io.StringIO()
+        n_segments, n_links, n_paths = write_gfa(self.trans, out)
+        self.assertEqual(n_segments, len(self.trans.graph2.blocks))
+        self.assertEqual(n_paths, len(self.trans.graph1.blocks))
+
+        graph, paths = read_gfa(io.StringIO(out.getvalue()), chunk_size=5)
+        trans = translation_from_gfa(graph, paths)
+        self.assertEqual(trans, self.trans)
+        self.assertEqual(trans.graph1.blocks, self.trans.graph1.blocks)
+        self.assertEqual(graph.blocks, self.trans.graph2.blocks)
+        for block in graph.blocks:
+            self.assertEqual(sorted(graph.adj_list[block]),
+                             sorted(self.trans.graph2.adj_list[block]))
+
+    def test_unsupported_links(self):
+        lines = ["H\tVN:Z:1.0\n", "S\ta\tACGT\n", "S\tb\t*\tLN:i:3\n",
+                 "L\ta\t+\tb\t-\t0M\n"]
+        with self.assertRaises(ValueError):
+            read_gfa(lines)
+        graph, paths = read_gfa(lines[:3])
+        self.assertEqual(graph.blocks["a"].length(), 4)
+
+    def test_links_before_segments(self):
+        lines = ["L\tb\t+\ta\t+\t0M\n", "S\ta\tACGT\n", "S\tb\t*\tLN:i:3\n"]
+        graph, paths = read_gfa(lines, chunk_size=1)
+        self.assertEqual(graph.blocks["b"].length(), 3)
+        self.assertEqual(graph.adj_list["b"], ["a"])
+        with self.assertRaises(ValueError):
+            read_gfa(lines[:2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import io
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from offsetbasedgraph import Interval, Position, Translation
+import methods
+from coordinates import CoordinateTable, HIERARCHICAL, SEQUENTIAL
+from generecords import read_gene_records
+from liftover import create_tables, translate_genes, translate_records, \
+    NOT_TRANSLATED
+from synthetic import create_synthetic_data
+
+
+class TestLiftover(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_dir = os.getcwd()
+        cls.tmp_dir = tempfile.mkdtemp()
+        os.chdir(cls.tmp_dir)
+        cls.files = files = create_synthetic_data(
+            "synthetic", n_chromosomes=2, chrom_size=100000,
+            alt_loci_per_chromosome=3, min_locus_length=1000,
+            max_locus_length=5000, overlap=0.5, cigar_operations=9,
+            genes_per_locus=2, sequence_cache_dir="data/tmp")
+        args = lambda: None
+        args.chrom_sizes_file_name = files["chrom_sizes"]
+        args.alt_locations_file_name = files["alt_loci"]
+        args.out_file_name = "graph"
+        methods.create_graph(args)
+        cls.trans = Translation.from_file("graph")
+        cls.tables = create_tables(cls.trans)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.old_dir)
+        shutil.rmtree(cls.tmp_dir)
+
+    def _random_records(self, n):
+        random.seed(1)
+        records = []
+        for _ in range(n):
+            chromosome = random.choice(sorted(self.trans.graph1.blocks))
+            length = self.trans.graph1.blocks[chromosome].length()
+            start = random.randint(0, length - 1)
+            end = random.randint(start + 1, min(length, start + 20000))
+            records.append((chromosome, start, end))
+        return records
+
+    def test_same_as_translation(self):
+        records = self._random_records(300)
+        for chromosome, start, end in records:
+            expected = self.trans.translate(
+                Interval(start, end, [chromosome], self.trans.graph1)).notation()
+            notation = self.tables[chromosome].notations([start], [end])[0]
+            self.assertEqual(notation, expected)
+
+    def test_translate_records(self):
+        records = self._random_records(100) + [("chr1", 0, 10 ** 9),
+                                               ("chrUnknown", 0, 10)]
+        lines = ["#header\n"] + ["%s\t%d\t%d\tname%d\n" % (r + (i,))
+                                 for i, r in enumerate(records)]
+        outputs = []
+        for processes in [1, 2]:
+            out = io.StringIO()
+            n_records, n_not_translated = translate_records(
+                self.tables, lines, out, chunk_size=7, processes=processes)
+            self.assertEqual(n_records, len(records))
+            self.assertEqual(n_not_translated, 2)
+            outputs.append(out.getvalue())
+
+        self.assertEqual(outputs[0], outputs[1])
+        out_lines = outputs[0].splitlines()
+        self.assertEqual(len(out_lines), len(records))
+        self.assertTrue(out_lines[0].startswith(lines[1].strip() + "\t"))
+        self.assertTrue(out_lines[-1].endswith("\t" + NOT_TRANSLATED))
+
+        # Workers are stopped when a line can not be parsed
+        with self.assertRaises(ValueError):
+            translate_records(self.tables, lines + ["chr1\tstart\tend\n"],
+                              io.StringIO(), chunk_size=7, processes=2)
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_translate_genes(self):
+        genes = read_gene_records(self.files["genes"])
+        translated = translate_genes(self.tables, genes, self.trans.graph2)
+        expected = [g.translate(self.trans) for g in genes]
+        self.assertEqual(translated, expected)
+        for gene, expected_gene in zip(translated, expected):
+            self.assertEqual(gene.transcription_region.notation(),
+                             expected_gene.transcription_region.notation())
+
+        # Selection on gene columns gives the genes selected after translation
+        for min_length, max_genes in [(100, 40), (3000, 2)]:
+            selected = methods._select_genes_to_visualize(
+                genes, self.tables, min_length, max_genes)
+            expected_selected = [
+                g for g in expected if not g.multiple_alt_loci() and
+                g.transcription_region.length() > min_length][:max_genes]
+            self.assertEqual([g.name for g in selected],
+                             [g.name for g in expected_selected])
+
+    def test_graph_to_linear(self):
+        table = CoordinateTable.from_translation(self.trans)
+        table.to_file("graph.coordinates")
+        table = CoordinateTable.from_file("graph.coordinates")
+        records = self._random_records(300)
+        positions = [self.trans.translate(Position(chromosome, start))
+                     for chromosome, start, end in records]
+        blocks = [p.region_path_id for p in positions] + ["unknown"]
+        offsets = [p.offset for p in positions] + [0]
+
+        sequences, linear_offsets, valid = table.to_linear(
+            blocks, offsets, HIERARCHICAL)
+        self.assertFalse(valid[-1])
+        for i, (chromosome, start, end) in enumerate(records):
+            self.assertTrue(valid[i])
+            # Positions on alt loci in merged blocks are given on main
+            if "alt" not in chromosome or "alt" in sequences[i]:
+                self.assertEqual((sequences[i], linear_offsets[i]),
+                                 (chromosome, start))
+
+        sequences, linear_offsets, valid = table.to_linear(
+            blocks, offsets, SEQUENTIAL)
+        self.assertEqual(list(sequences[:-1]), blocks[:-1])
+        self.assertEqual(list(linear_offsets[:-1]), offsets[:-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,293 @@
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import zlib
+from offsetbasedgraph import Translation
+import methods
+from batch import run_batch
+from cache import DiskCache
+from generecords import create_gene_dicts, read_gene_records
+from sharedgraph import SharedGraph
+from synthetic import create_synthetic_data
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_put(self):
+        cache = DiskCache(self.tmp_dir)
+        key = cache.key("test", 1)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, {"a": [1, 2, 3]})
+        self.assertEqual(cache.get(key), {"a": [1, 2, 3]})
+
+    def test_corrupt_entry_is_removed(self):
+        cache = DiskCache(self.tmp_dir)
+        for i, data in enumerate([b"not compressed",
+                                  zlib.compress(b"not a pickle"),
+                                  zlib.compress(pickle.dumps([1, 2]))[:-4],
+                                  zlib.compress(b"")]):
+            key = cache.key("corrupt", i)
+            with open(cache._file_name(key), "wb") as f:
+                f.write(data)
+            self.assertEqual(cache.get(key, "default"), "default")
+            self.assertFalse(os.path.exists(cache._file_name(key)))
+
+    def test_failed_put_removes_temporary_file(self):
+        cache = DiskCache(self.tmp_dir)
+        key = cache.key("test", 1)
+
+        def fail(*args):
+            raise OSError("Disk full")
+
+        replace = os.replace
+        os.replace = fail
+        try:
+            with self.assertRaises(OSError):
+                cache.put(key, [1, 2, 3])
+        finally:
+            os.replace = replace
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def test_least_recently_used_is_evicted(self):
+        cache = DiskCache(self.tmp_dir)
+        keys = [cache.key(i) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put(key, os.urandom(1000))
+            os.utime(cache._file_name(key), (i, i))
+
+        # Use first entry, so that second is least recently used
+        cache.get(keys[0])
+        cache.max_size = cache.size() - 1
+        cache.evict()
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[2]))
+
+
+class TestMethodsOnSyntheticData(unittest.TestCase):
+
+    def setUp(self):
+        self.old_dir = os.getcwd()
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+        self.files = create_synthetic_data(
+            "synthetic", n_chromosomes=1, chrom_size=100000,
+            alt_loci_per_chromosome=3, min_locus_length=1000,
+            max_locus_length=5000, cigar_operations=9,
+            genes_per_locus=2, sequence_cache_dir="data/tmp")
+
+    def tearDown(self):
+        os.chdir(self.old_dir)
+        shutil.rmtree(self.tmp_dir)
+
+    def _multipath_args(self, interval_type, **kwargs):
+        args = lambda: None
+        args.chrom_sizes_file_name = self.files["chrom_sizes"]
+        args.alt_locations_file_name = self.files["alt_loci"]
+        args.ncbi_alignments_dir = self.files["alignments_dir"]
+        args.genes_file_name = self.files["genes"]
+        args.interval_type = interval_type
+        for key, value in kwargs.items():
+            setattr(args, key, value)
+        return args
+
+    def test_fuzzy_analysis_reuses_cache(self):
+        args = self._multipath_args("fuzzy", processes=2, cache_dir="cache")
+        methods.analyse_multipath_genes2(args)
+        n_cached = len(os.listdir("cache"))
+        self.assertEqual(n_cached, 6)
+
+        # Second run should not merge any alt loci
+        def fail(*args, **kwargs):
+            raise AssertionError("merge_alt_using_cigar should not be called")
+
+        merge_alt_using_cigar = methods.merge_alt_using_cigar
+        methods.merge_alt_using_cigar = fail
+        try:
+            args.processes = 1
+            methods.analyse_multipath_genes2(args)
+        finally:
+            methods.merge_alt_using_cigar = merge_alt_using_cigar
+
+        self.assertEqual(len(os.listdir("cache")), n_cached)
+
+    def test_critical_analysis_shares_merged_graph_cache(self):
+        methods.analyse_multipath_genes2(
+            self._multipath_args("fuzzy", processes=1, cache_dir="cache"))
+        n_cached = len(os.listdir("cache"))
+        merged = []
+
+        def fail(*args, **kwargs):
+            merged.append(args[2])
+            raise AssertionError("merge_alt_using_cigar should not be called")
+
+        merge_alt_using_cigar = methods.merge_alt_using_cigar
+        methods.merge_alt_using_cigar = fail
+        try:
+            methods.analyse_multipath_genes2(
+                self._multipath_args("critical", cache_dir="cache"))
+        finally:
+            methods.merge_alt_using_cigar = merge_alt_using_cigar
+
+        self.assertEqual(merged, [])
+        self.assertEqual(len(os.listdir("cache")), n_cached)
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork",
+                         "Workers must get the patched function")
+    def test_fuzzy_analysis_frees_shared_memory_on_error(self):
+        def fail(*args, **kwargs):
+            raise ValueError("failed task")
+
+        unlinked = []
+        unlink = SharedGraph.unlink
+        analyse = methods._analyse_fuzzy_genes_for_alt
+        SharedGraph.unlink = lambda shared: unlinked.append(unlink(shared))
+        methods._analyse_fuzzy_genes_for_alt = fail
+        try:
+            with self.assertRaises(ValueError):
+                methods.analyse_multipath_genes2(
+                    self._multipath_args("fuzzy", processes=2))
+        finally:
+            SharedGraph.unlink = unlink
+            methods._analyse_fuzzy_genes_for_alt = analyse
+        self.assertEqual(len(unlinked), 1)
+
+    def test_shared_graph(self):
+        from offsetbasedgraph import Position
+        from offsetbasedgraph.graphcreators import \
+            create_initial_grch38_graph, convert_to_numeric_graph
+        from nametable import NameTable
+        text_graph = create_initial_grch38_graph(self.files["chrom_sizes"])
+        graph, name_trans = convert_to_numeric_graph(text_graph)
+        names = NameTable.from_chrom_sizes(self.files["chrom_sizes"])
+        arrays = SharedGraph.from_name_table(names)
+        arrays.to_file("graph.arrays")
+        shared = arrays.to_shared_memory()
+        try:
+            for attached in [SharedGraph.attach(shared.handle()),
+                             SharedGraph.from_file("graph.arrays")]:
+                self.assertFalse(attached.arrays["lengths"].flags.writeable)
+                self.assertEqual(attached.graph().blocks, graph.blocks)
+                attached_trans = attached.name_translation()
+                for name in text_graph.blocks:
+                    position = Position(name, 10)
+                    self.assertEqual(attached_trans.translate(position),
+                                     name_trans.translate(position))
+                alt_id = [b for b in text_graph.blocks if "alt" in b][0]
+                locus_graph, locus_trans = attached.locus_graphs(alt_id)
+                locus_ids = [names.ids[alt_id.split("_")[0]], names.ids[alt_id]]
+                self.assertEqual(sorted(locus_graph.blocks), sorted(locus_ids))
+                self.assertEqual(locus_graph._next_id(), len(graph.blocks))
+                self.assertIs(locus_trans.graph2, locus_graph)
+                attached.close()
+        finally:
+            shared.unlink()
+
+    def test_gene_notations(self):
+        args = lambda: None
+        args.chrom_sizes_file_name = self.files["chrom_sizes"]
+        args.alt_locations_file_name = self.files["alt_loci"]
+        args.out_file_name = "graph"
+        methods.create_graph(args)
+        trans = Translation.from_file("graph")
+        genes = read_gene_records(self.files["genes"])
+        alt_loci_genes, _, main_genes = create_gene_dicts(genes, self.files["alt_loci"])
+
+        args.translation_file_name = "graph"
+        args.genes = self.files["genes"]
+        args.alt_locus = "all"
+        outputs = []
+        for processes in (1, 2):
+            args.processes = processes
+            args.out_file_name = "notations%d.tsv" % processes
+            methods.print_gene_notations(args)
+            with open(args.out_file_name) as f:
+                outputs.append(f.read())
+        self.assertEqual(outputs[0], outputs[1])
+
+        rows = [line.split("\t") for line in outputs[0].strip().split("\n")[1:]]
+        expected = [(alt_id, g) for alt_id in sorted(alt_loci_genes)
+                    for g in alt_loci_genes[alt_id] + main_genes[alt_id]]
+        self.assertEqual(len(rows), len(expected))
+        for row, (alt_id, g) in zip(rows, expected):
+            self.assertEqual(row[:2], [alt_id, g.name])
+            self.assertEqual(row[5], g.transcription_region.notation())
+            self.assertEqual(row[6], g.translate(trans).transcription_region.notation())
+
+        # Workers are stopped if writing the results fails
+        def fail(*args, **kwargs):
+            raise IOError("disk full")
+
+        add_gene = methods.result_store.add_gene
+        methods.result_store.add_gene = fail
+        try:
+            with self.assertRaises(IOError):
+                methods.print_gene_notations(args)
+        finally:
+            methods.result_store.add_gene = add_gene
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_batch_loads_translation_once(self):
+        alt_loci = sorted(l.split()[0] for l in open(self.files["alt_loci"]))
+        graph_args = [self.files["chrom_sizes"], self.files["alt_loci"], "graph"]
+        jobs = [{"id": "graph", "command": "create_graph", "args": graph_args}]
+        for alt_locus in alt_loci:
+            jobs.append({"command": "print_gene_notations",
+                         "args": ["graph", self.files["alt_loci"], alt_locus,
+                                  self.files["genes"]]})
+        jobs.append({"id": "invalid", "command": "print_gene_notations",
+                     "args": []})
+        with open("jobs.jsonl", "w") as f:
+            f.writelines(json.dumps(job) + "\n" for job in jobs)
+
+        args = lambda: None
+        args.manifest_file_name = "jobs.jsonl"
+        args.out_dir = "batch_out"
+        args.processes = 1
+        try:
+            run_batch(args)
+            loaded = [key for key in methods._shared_state
+                      if key[0] == "translation"]
+        finally:
+            methods._shared_state = None
+        self.assertEqual(len(loaded), 1)
+
+        for job_id in ["graph", "job1", "job2", "job3"]:
+            with open(os.path.join("batch_out", job_id + ".status")) as f:
+                self.assertEqual(json.load(f)["status"], "ok")
+        with open(os.path.join("batch_out", "job1.out")) as f:
+            self.assertTrue(f.read().startswith("alt_locus\tgene\t"))
+        with open(os.path.join("batch_out", "invalid.status")) as f:
+            self.assertEqual(json.load(f)["status"], "failed")
+
+    def test_shared_translation_reloaded_when_file_changes(self):
+        args = lambda: None
+        args.chrom_sizes_file_name = self.files["chrom_sizes"]
+        args.alt_locations_file_name = self.files["alt_loci"]
+        args.out_file_name = "graph"
+        methods.create_graph(args)
+        methods.enable_shared_state()
+        try:
+            trans = methods._load_translation("graph")
+            self.assertIs(methods._load_translation("graph"), trans)
+            os.utime("graph", (0, 0))
+            self.assertIsNot(methods._load_translation("graph"), trans)
+            # The translation read earlier is replaced, not kept
+            self.assertEqual(len([key for key in methods._shared_state
+                                  if key[0] == "translation"]), 1)
+        finally:
+            methods._shared_state = None
+
+
+if __name__ == "__main__":
+    unittest.main()
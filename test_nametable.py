@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+from offsetbasedgraph import Interval, Translation
+from offsetbasedgraph.graphcreators import connect_without_flanks, \
+    convert_to_numeric_graph, convert_to_text_graph, \
+    create_initial_grch38_graph, grch38_graph_to_numeric, merge_alt_using_cigar
+import methods
+from nametable import NameTable
+from synthetic import create_synthetic_data
+
+
+class TestNameTable(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_dir = os.getcwd()
+        cls.tmp_dir = tempfile.mkdtemp()
+        os.chdir(cls.tmp_dir)
+        cls.files = create_synthetic_data(
+            "synthetic", n_chromosomes=2, chrom_size=100000,
+            alt_loci_per_chromosome=3, min_locus_length=1000,
+            max_locus_length=5000, overlap=0.5, cigar_operations=9,
+            genes_per_locus=2, sequence_cache_dir="data/tmp")
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.old_dir)
+        shutil.rmtree(cls.tmp_dir)
+
+    def _edges(self, graph):
+        return {b: sorted(edges) for b, edges in graph.adj_list.items() if edges}
+
+    def test_same_translation_as_text_conversion(self):
+        # Translation created by create_graph before NameTable was used
+        graph = create_initial_grch38_graph(self.files["chrom_sizes"])
+        numeric_graph, name_trans = convert_to_numeric_graph(graph)
+        new_graph, numeric_trans = connect_without_flanks(
+            numeric_graph, self.files["alt_loci"], name_trans)
+        name_graph, new_name_trans = convert_to_text_graph(
+            new_graph, name_trans, numeric_trans)
+        expected = name_trans + numeric_trans + new_name_trans
+        expected.graph2 = name_graph
+
+        args = lambda: None
+        args.chrom_sizes_file_name = self.files["chrom_sizes"]
+        args.alt_locations_file_name = self.files["alt_loci"]
+        args.out_file_name = "graph"
+        methods.create_graph(args)
+        trans = Translation.from_file("graph")
+
+        self.assertEqual(trans, expected)
+        self.assertEqual(trans.graph2.blocks, expected.graph2.blocks)
+        self.assertEqual(self._edges(trans.graph2),
+                         self._edges(expected.graph2))
+        self.assertEqual(self._edges(trans.graph2),
+                         self._edges(trans.graph2.copy()))
+
+    def test_same_genes_on_merged_alt_locus(self):
+        text_graph = create_initial_grch38_graph(self.files["chrom_sizes"])
+        graph, name_trans = grch38_graph_to_numeric(text_graph)
+        names = NameTable.from_chrom_sizes(self.files["chrom_sizes"])
+        alt_id = [b for b in names.names if "alt" in b][0]
+        main_id = alt_id.split("_")[0]
+        trans, _ = merge_alt_using_cigar(
+            graph, name_trans, alt_id, self.files["alignments_dir"])
+        names_trans, _ = merge_alt_using_cigar(
+            names.graph2, names, alt_id, self.files["alignments_dir"])
+        self.assertIsNot(names_trans, names)
+        full_trans = name_trans + trans
+        names_full_trans = names.compose(names_trans)
+
+        # Ids differ, so compare the lengths of the region paths
+        for block in (main_id, alt_id):
+            for start in range(0, names.lengths[names.ids[block]] - 100, 997):
+                interval = Interval(start, start + 100, [block], names.graph1)
+                expected = full_trans.translate(interval)
+                translated = names_full_trans.translate(interval)
+                self.assertEqual(
+                    [expected.graph.blocks[rp].length()
+                     for rp in expected.region_paths],
+                    [translated.graph.blocks[rp].length()
+                     for rp in translated.region_paths])
+                self.assertEqual(translated.start_position.offset,
+                                 expected.start_position.offset)
+                self.assertEqual(translated.end_position.offset,
+                                 expected.end_position.offset)
+
+
+if __name__ == "__main__":
+    unittest.main()
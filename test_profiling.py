@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from profiling import Profiler, peak_rss_kb
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.profiler = Profiler()
+        self.profiler.enable()
+        with self.profiler.stage("analysis"):
+            for alt_locus in ("chr1_KI270762v1_alt", "chr1_KI270766v1_alt"):
+                with self.profiler.stage("cigar merge", alt_locus=alt_locus):
+                    time.sleep(0.01)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_disabled_profiler_records_nothing(self):
+        profiler = Profiler()
+        with profiler.stage("analysis"):
+            pass
+        self.assertEqual(profiler.stages, [])
+
+    def test_stages(self):
+        stages = self.profiler.stages
+        self.assertEqual([(s["name"], s["depth"]) for s in stages],
+                         [("analysis", 0), ("cigar merge", 1), ("cigar merge", 1)])
+        self.assertEqual(stages[1]["info"], {"alt_locus": "chr1_KI270762v1_alt"})
+        self.assertGreaterEqual(stages[1]["wall_time"], 0.01)
+        self.assertGreaterEqual(stages[0]["wall_time"],
+                                stages[1]["wall_time"] + stages[2]["wall_time"])
+        if peak_rss_kb() is not None:
+            for stage in stages:
+                self.assertGreater(stage["process_peak_rss_kb"], 0)
+                self.assertGreaterEqual(stage["peak_rss_increase_kb"], 0)
+
+        summary = self.profiler.summary()
+        self.assertEqual(summary["cigar merge"]["count"], 2)
+        self.assertAlmostEqual(summary["cigar merge"]["wall_time"],
+                               stages[1]["wall_time"] + stages[2]["wall_time"])
+
+    def test_stage_recorded_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.profiler.stage("failing"):
+                raise ValueError()
+        self.assertIn("wall_time", self.profiler.stages[-1])
+        with self.profiler.stage("after"):
+            pass
+        self.assertEqual(self.profiler.stages[-1]["depth"], 0)
+
+    def test_json_trace(self):
+        file_name = os.path.join(self.tmp_dir, "profile.json")
+        self.profiler.to_file(file_name)
+        with open(file_name) as f:
+            trace = json.load(f)
+        self.assertEqual(len(trace["stages"]), 3)
+        self.assertEqual(set(trace["summary"]), {"analysis", "cigar merge"})
+        self.assertIn("process_peak_rss_kb", trace)
+
+    def test_chrome_trace(self):
+        file_name = os.path.join(self.tmp_dir, "profile.json")
+        self.profiler.to_file(file_name, "chrome")
+        with open(file_name) as f:
+            events = json.load(f)["traceEvents"]
+        self.assertEqual([e["name"] for e in events],
+                         ["analysis", "cigar merge", "cigar merge"])
+        for event in events:
+            self.assertEqual(event["ph"], "X")
+            self.assertIsInstance(event["ts"], int)
+            self.assertIsInstance(event["dur"], int)
+        self.assertEqual(events[2]["args"]["alt_locus"], "chr1_KI270766v1_alt")
+        self.assertLessEqual(events[0]["ts"], events[1]["ts"])
+        self.assertGreaterEqual(events[1]["dur"], 10000)
+        self.assertIn("cpu_time", events[1]["args"])
+        self.assertIn("peak_rss_increase_kb", events[1]["args"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import io
+import unittest
+from unittest import mock
+from progress import ProgressReporter
+
+
+class TestProgressReporter(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch("progress.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.stream = io.StringIO()
+
+    def _reporter(self, enabled=True):
+        return ProgressReporter("Translating main genes", 10, interval=0.5,
+                                stream=self.stream, enabled=enabled)
+
+    def test_no_update_within_interval(self):
+        progress = self._reporter()
+        self.now = 100.2
+        progress.update()
+        self.now = 100.4
+        progress.update()
+        self.assertEqual(self.stream.getvalue(), "")
+        self.assertEqual(progress.n, 2)
+
+    def test_update_after_interval(self):
+        progress = self._reporter()
+        self.now = 101.0
+        progress.update(2)
+        self.assertEqual(
+            self.stream.getvalue(),
+            "\r  Translating main genes: 20 % finished "
+            "(2.0 genes/s, ETA 0:00:04)" + " " * 10)
+
+        # The next update is only written an interval after the last one
+        self.stream.truncate(0)
+        self.stream.seek(0)
+        self.now = 101.3
+        progress.update()
+        self.assertEqual(self.stream.getvalue(), "")
+
+    def test_status(self):
+        progress = self._reporter()
+        progress.update(4)
+        self.assertEqual(progress.rate(102.0), 2.0)
+        self.assertEqual(progress._status(102.0),
+                         "Translating main genes: 40 % finished "
+                         "(2.0 genes/s, ETA 0:00:03)")
+        # No ETA when finished or when nothing is done
+        progress.update(6)
+        self.assertEqual(progress._status(105.0),
+                         "Translating main genes: 100 % finished "
+                         "(2.0 genes/s)")
+        self.assertEqual(self._reporter()._status(100.0),
+                         "Translating main genes: 0 % finished "
+                         "(0.0 genes/s)")
+
+    def test_finish(self):
+        progress = self._reporter()
+        progress.update(10)
+        self.stream.truncate(0)
+        self.stream.seek(0)
+        self.now = 105.0
+        progress.finish()
+        self.assertEqual(self.stream.getvalue(),
+                         "\r  Translating main genes: 10 genes in 5.0 s "
+                         "(2.0 genes/s)" + " " * 30 + "\n")
+
+    def test_disabled_writes_only_summary(self):
+        progress = self._reporter(enabled=False)
+        for i in range(10):
+            self.now += 1
+            progress.update()
+        self.assertEqual(self.stream.getvalue(), "")
+        progress.finish()
+        self.assertEqual(self.stream.getvalue(),
+                         "  Translating main genes: 10 genes in 10.0 s "
+                         "(1.0 genes/s)\n")
+
+    def test_disabled_when_not_terminal(self):
+        progress = self._reporter(enabled=None)
+        self.assertFalse(progress.enabled)
+        self.now = 102.0
+        progress.update(10)
+        progress.finish()
+        self.assertEqual(self.stream.getvalue(),
+                         "  Translating main genes: 10 genes in 2.0 s "
+                         "(5.0 genes/s)\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
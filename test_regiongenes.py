@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+from offsetbasedgraph.graphutils import get_alt_loci_positions
+from regiongenes import extract_region_genes, genes_in_regions, read_regions
+from synthetic import create_synthetic_data
+
+
+class TestRegionGenes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_dir = os.getcwd()
+        cls.tmp_dir = tempfile.mkdtemp()
+        os.chdir(cls.tmp_dir)
+        cls.files = create_synthetic_data(
+            "synthetic", n_chromosomes=3, chrom_size=100000,
+            alt_loci_per_chromosome=4, min_locus_length=1000,
+            max_locus_length=8000, overlap=0.5, cigar_operations=9,
+            genes_per_locus=3)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.old_dir)
+        shutil.rmtree(cls.tmp_dir)
+
+    def _scan(self, alt_id, info):
+        # Genes of one alt locus found by reading all genes
+        genes = []
+        with open(self.files["genes"]) as f:
+            f.readline()
+            for line in f:
+                columns = line.split("\t")
+                if columns[2] == alt_id or (
+                        columns[2] == info["main_chr"] and
+                        int(columns[4]) >= info["start"] and
+                        int(columns[5]) <= info["end"]):
+                    genes.append(line)
+        return genes
+
+    def test_same_as_scanning_genes(self):
+        regions = read_regions(self.files["alt_loci"])
+        with open(self.files["genes"]) as f:
+            header, gene_lines = genes_in_regions(f, regions)
+        self.assertTrue(header.startswith("#bin"))
+        infos = get_alt_loci_positions(self.files["alt_loci"])
+        self.assertEqual(sorted(gene_lines), sorted(infos))
+        for alt_id, info in infos.items():
+            self.assertEqual(gene_lines[alt_id], self._scan(alt_id, info))
+        self.assertTrue(any(
+            len(lines) > len(self._scan(alt_id, {"main_chr": None}))
+            for alt_id, lines in gene_lines.items()))
+
+    def test_writes_file_per_locus(self):
+        args = lambda: None
+        args.genes_file_name = self.files["genes"]
+        args.alt_locations_file_name = self.files["alt_loci"]
+        args.out_dir = "region_genes"
+        extract_region_genes(args)
+        infos = get_alt_loci_positions(self.files["alt_loci"])
+        self.assertEqual(sorted(os.listdir("region_genes")),
+                         sorted("genes_%s.txt" % alt_id for alt_id in infos))
+        for alt_id, info in infos.items():
+            with open(os.path.join("region_genes", "genes_%s.txt" % alt_id)) as f:
+                f.readline()
+                self.assertEqual(f.readlines(), self._scan(alt_id, info))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from offsetbasedgraph.graphutils import analyze_genes_on_merged_graph
+from gen_graph_coords import main
+from generecords import read_gene_records
+import methods
+from results import ResultStore, diff_results
+from synthetic import create_synthetic_data
+
+
+def _run(argv):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        main(argv)
+    return out.getvalue()
+
+
+class TestResults(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_dir = os.getcwd()
+        cls.tmp_dir = tempfile.mkdtemp()
+        os.chdir(cls.tmp_dir)
+        cls.files = create_synthetic_data(
+            "synthetic", n_chromosomes=1, chrom_size=100000,
+            alt_loci_per_chromosome=3, min_locus_length=1000,
+            max_locus_length=5000, cigar_operations=9,
+            genes_per_locus=3, sequence_cache_dir="data/tmp")
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.old_dir)
+        shutil.rmtree(cls.tmp_dir)
+
+    def _multipath(self, results_file_name, interval_type):
+        return _run(["--results", results_file_name, "analyse_multipath_genes",
+                     self.files["chrom_sizes"], self.files["alt_loci"],
+                     self.files["alignments_dir"], self.files["genes"],
+                     interval_type])
+
+    def test_critical_results(self):
+        self._multipath("critical.sqlite", "critical")
+        out = self._multipath("critical.sqlite", "critical")
+        connection = sqlite3.connect("critical.sqlite")
+        runs = list(connection.execute("SELECT run_id, command, status FROM runs"))
+        self.assertEqual(runs, [(1, "analyse_multipath_genes", "ok"),
+                                (2, "analyse_multipath_genes", "ok")])
+        total = connection.execute(
+            "SELECT value FROM locus_results WHERE run_id = 2 AND "
+            "alt_locus IS NULL AND metric = 'equal'").fetchone()[0]
+        self.assertIn("Equal: %d," % total, out)
+        per_locus = connection.execute(
+            "SELECT SUM(value) FROM locus_results WHERE run_id = 2 AND "
+            "alt_locus IS NOT NULL AND metric = 'equal'").fetchone()[0]
+        per_gene = connection.execute(
+            "SELECT SUM(value) FROM gene_results WHERE run_id = 2 AND "
+            "metric = 'equal'").fetchone()[0]
+        self.assertEqual(per_locus, total)
+        self.assertEqual(per_gene, total)
+        self.assertGreater(connection.execute(
+            "SELECT COUNT(*) FROM gene_results WHERE run_id = 2").fetchone()[0], 0)
+        connection.close()
+
+        args = lambda: None
+        args.results_file_name = "critical.sqlite"
+        args.run1 = args.run2 = None
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            diff_results(args)
+        # Times differ, nothing else
+        lines = out.getvalue().strip().split("\n")
+        self.assertTrue(all(line.split("\t")[2] == "time" for line in lines[1:-1]))
+
+    def test_diff_shows_changed_values(self):
+        self._multipath("similarity.sqlite", "similarity")
+        self._multipath("similarity.sqlite", "similarity")
+        connection = sqlite3.connect("similarity.sqlite")
+        with connection:
+            connection.execute(
+                "UPDATE gene_results SET value = -1 WHERE rowid = "
+                "(SELECT MIN(rowid) FROM gene_results WHERE run_id = 2 "
+                "AND metric = 'best_overlap')")
+        connection.close()
+        out = _run(["diff_results", "similarity.sqlite", "--run1", "1", "--run2", "2"])
+        changed = [line for line in out.split("\n") if "best_overlap" in line]
+        self.assertEqual(len(changed), 1)
+        self.assertEqual(changed[0].split("\t")[-1], "-1.0")
+
+        # Only the missing run id is given a default
+        self._multipath("similarity.sqlite", "similarity")
+        for run_args, header in [(["--run1", "1"], "run 1\trun 3"),
+                                 (["--run2", "2"], "run 1\trun 2"),
+                                 ([], "run 2\trun 3")]:
+            out = _run(["diff_results", "similarity.sqlite"] + run_args)
+            self.assertTrue(out.split("\n")[0].endswith(header), out)
+
+    def test_check_duplicate_genes(self):
+        _run(["create_graph", self.files["chrom_sizes"], self.files["alt_loci"], "graph"])
+        out = _run(["--results", "duplicates.sqlite", "check_duplicate_genes",
+                    "graph", self.files["genes"]])
+        expected = io.StringIO()
+        with contextlib.redirect_stdout(expected):
+            analyze_genes_on_merged_graph(read_gene_records(self.files["genes"]),
+                                          methods._load_translation("graph"))
+        self.assertIn(expected.getvalue(), out)
+        connection = sqlite3.connect("duplicates.sqlite")
+        n_alt_genes = len([g for g in read_gene_records(self.files["genes"])
+                           if "alt" in g.chrom])
+        self.assertEqual(connection.execute(
+            "SELECT COUNT(*) FROM gene_results WHERE metric = 'score'").fetchone()[0],
+            n_alt_genes)
+        connection.close()
+
+    def test_batched_inserts(self):
+        store = ResultStore()
+        store.batch_size = 3
+        store.add_locus("a", "n", 1)  # Not enabled
+        store.enable("batched.sqlite", "test", [])
+        gene = read_gene_records(self.files["genes"])[0]
+        connection = sqlite3.connect("batched.sqlite")
+        for i in range(4):
+            store.add_gene("a", gene, "n", i)
+        self.assertEqual(connection.execute(
+            "SELECT COUNT(*) FROM gene_results").fetchone()[0], 3)
+        store.close()
+        self.assertEqual(connection.execute(
+            "SELECT COUNT(*) FROM gene_results").fetchone()[0], 4)
+        self.assertEqual(connection.execute(
+            "SELECT status FROM runs").fetchone()[0], "ok")
+        connection.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+from offsetbasedgraph import Translation
+from offsetbasedgraph.GRCH38 import AltLoci
+from arraytranslation import load_translation
+import methods
+from segmentedgraph import chromosome_segments, is_segmented_file
+from synthetic import create_synthetic_data
+
+
+class TestSegmentedGraph(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_dir = os.getcwd()
+        cls.tmp_dir = tempfile.mkdtemp()
+        os.chdir(cls.tmp_dir)
+        cls.files = create_synthetic_data(
+            "synthetic", n_chromosomes=5, chrom_size=100000,
+            alt_loci_per_chromosome=6, min_locus_length=1000,
+            max_locus_length=5000, overlap=0.5, cigar_operations=9,
+            genes_per_locus=1, sequence_cache_dir="data/tmp")
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.old_dir)
+        shutil.rmtree(cls.tmp_dir)
+
+    def _create_graph(self, out_file_name, segmented):
+        args = lambda: None
+        args.chrom_sizes_file_name = self.files["chrom_sizes"]
+        args.alt_locations_file_name = self.files["alt_loci"]
+        args.out_file_name = out_file_name
+        args.segmented = segmented
+        methods.create_graph(args)
+
+    def _edges(self, graph):
+        return {b: edges for b, edges in graph.adj_list.items() if edges}
+
+    def test_same_graph_as_monolithic(self):
+        self._create_graph("graph", False)
+        self._create_graph("graph.segments", True)
+        self.assertTrue(is_segmented_file("graph.segments"))
+        self.assertFalse(is_segmented_file("graph"))
+
+        expected = Translation.from_file("graph")
+        trans = load_translation("graph.segments")
+        self.assertEqual(trans, expected)
+        self.assertEqual(trans.graph2.blocks, expected.graph2.blocks)
+        self.assertEqual(self._edges(trans.graph2), self._edges(expected.graph2))
+        # Same names for merged blocks
+        self.assertEqual(list(trans._b_to_a), list(expected._b_to_a))
+
+    def test_alt_loci_must_be_grouped(self):
+        alt_loci = AltLoci.from_file(self.files["alt_loci"]).alt_loci
+        segments = chromosome_segments(alt_loci)
+        self.assertEqual(len(segments), 5)
+        self.assertEqual([a for _, loci in segments for a in loci], alt_loci)
+        with self.assertRaises(ValueError):
+            chromosome_segments([alt_loci[0], alt_loci[-1], alt_loci[1]])
+
+
+if __name__ == "__main__":
+    unittest.main()
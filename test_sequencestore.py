@@ -0,0 +1,103 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from offsetbasedgraph.graphcreators import merge_alt_using_cigar
+from offsetbasedgraph.cigar_align import clean_cigar as clean_cigar_strings
+from nametable import NameTable
+from sequencestore import SequenceStore, clean_cigar, \
+    merge_alt_using_sequence_store, parse_cigar, write_store_from_fasta
+from synthetic import create_synthetic_data
+
+
+class TestSequenceStore(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_dir = os.getcwd()
+        cls.tmp_dir = tempfile.mkdtemp()
+        os.chdir(cls.tmp_dir)
+        cls.files = create_synthetic_data(
+            "synthetic", n_chromosomes=2, chrom_size=100000,
+            alt_loci_per_chromosome=3, min_locus_length=1000,
+            max_locus_length=5000, overlap=0.0, cigar_operations=9,
+            genes_per_locus=2, sequence_cache_dir="data/tmp")
+
+        # FASTA with the cached sequences (N outside alt loci regions)
+        sequences = {}
+        for line in open(cls.files["chrom_sizes"]):
+            name, length = line.split()
+            sequences[name] = ["N"] * int(length)
+        for file_name in os.listdir("data/tmp"):
+            name, start, end = file_name[9:-6].rsplit("_", 2)
+            sequence = open(os.path.join("data/tmp", file_name)).read()
+            sequences[name][int(start) - 1:int(end)] = sequence
+        with open("synthetic.fa", "w") as f:
+            for name, sequence in sequences.items():
+                f.write(">%s\n" % name)
+                for i in range(0, len(sequence), 60):
+                    f.write("".join(sequence[i:i + 60]) + "\n")
+        write_store_from_fasta(open("synthetic.fa"), "synthetic.2bit")
+        cls.sequences = {name: "".join(s) for name, s in sequences.items()}
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.old_dir)
+        shutil.rmtree(cls.tmp_dir)
+
+    def test_random_slices(self):
+        store = SequenceStore.from_file("synthetic.2bit")
+        random.seed(0)
+        for name, sequence in self.sequences.items():
+            self.assertEqual(store.length(name), len(sequence))
+            for _ in range(50):
+                start = random.randint(0, len(sequence))
+                end = random.randint(start, min(len(sequence), start + 3000))
+                self.assertEqual(store.sequence(name, start, end),
+                                 sequence[start:end])
+        with self.assertRaises(IndexError):
+            store.codes("chr1", 0, len(self.sequences["chr1"]) + 1)
+
+    def test_other_characters(self):
+        sequence = "ACGTNNNNRYRRacgtnnyK" * 3
+        write_store_from_fasta([">seq\n", sequence[:25] + "\n",
+                                sequence[25:] + "\n"], "iupac.2bit")
+        store = SequenceStore.from_file("iupac.2bit")
+        self.assertEqual(store.sequence("seq", 0, len(sequence)), sequence.upper())
+        self.assertEqual(store.sequence("seq", 7, 13), "NRYRRA")
+        # Different characters are different codes, as when comparing strings
+        codes = store.codes("seq", 0, 20)
+        self.assertEqual(len(set(codes[[4, 8, 9, 19]])), 4)
+        self.assertEqual(codes[8], codes[10])
+
+    def test_same_cigar_and_graph_as_strings(self):
+        store = SequenceStore.from_file("synthetic.2bit")
+        names = NameTable.from_chrom_sizes(self.files["chrom_sizes"])
+        for alt_id in [name for name in names.names if "alt" in name]:
+            with open(os.path.join(self.files["alignments_dir"],
+                                   "%s.alignment" % alt_id)) as f:
+                d = f.read().split(",")
+            main_id = alt_id.split("_")[0]
+            alt_seq = self.sequences[alt_id][int(d[2]) - 1:int(d[3])]
+            main_seq = self.sequences[main_id][int(d[0]) - 1:int(d[1])]
+            self.assertEqual(
+                clean_cigar(parse_cigar(d[-1]),
+                            store.codes(alt_id, int(d[2]) - 1, int(d[3])),
+                            store.codes(main_id, int(d[0]) - 1, int(d[1])),
+                            chunk_size=50),
+                clean_cigar_strings(d[-1], alt_seq, main_seq))
+
+            # New graphs, since block ids depend on earlier merges
+            names = NameTable.from_chrom_sizes(self.files["chrom_sizes"])
+            trans, graph = merge_alt_using_sequence_store(
+                names.graph2, names, alt_id, self.files["alignments_dir"], store)
+            names = NameTable.from_chrom_sizes(self.files["chrom_sizes"])
+            expected_trans, expected_graph = merge_alt_using_cigar(
+                names.graph2, names, alt_id, self.files["alignments_dir"])
+            self.assertEqual(trans, expected_trans)
+            self.assertEqual(graph.blocks, expected_graph.blocks)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import methods
+from generecords import create_gene_dicts, read_gene_records
+from nametable import NameTable
+from sharedgraph import LoadedGraphs
+from similarity import block_offsets, exon_segments, similarity_matrices, \
+    best_match_histogram
+from synthetic import create_synthetic_data
+
+
+def _bases(exons, graph):
+    # Set of (block, offset) covered by exons
+    bases = set()
+    for exon in exons:
+        for i, rp in enumerate(exon.region_paths):
+            start = exon.start_position.offset if i == 0 else 0
+            end = exon.end_position.offset if i == len(exon.region_paths) - 1 \
+                else graph.blocks[rp].length()
+            bases.update((rp, offset) for offset in range(start, end))
+    return bases
+
+
+class TestSimilarity(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_dir = os.getcwd()
+        cls.tmp_dir = tempfile.mkdtemp()
+        os.chdir(cls.tmp_dir)
+        cls.files = create_synthetic_data(
+            "synthetic", n_chromosomes=1, chrom_size=100000,
+            alt_loci_per_chromosome=3, min_locus_length=1000,
+            max_locus_length=5000, cigar_operations=9,
+            genes_per_locus=4, sequence_cache_dir="data/tmp")
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.old_dir)
+        shutil.rmtree(cls.tmp_dir)
+
+    def test_same_as_comparing_bases(self):
+        genes = read_gene_records(self.files["genes"])
+        alt_loci_genes, _, main_genes = create_gene_dicts(
+            genes, self.files["alt_loci"])
+        n_overlapping = 0
+        for alt_id in alt_loci_genes:
+            names = NameTable.from_chrom_sizes(self.files["chrom_sizes"])
+            trans, graph = methods._merge_alt_locus(
+                LoadedGraphs(names.graph2, names), alt_id,
+                self.files["alignments_dir"])
+            full_trans = names.compose(trans)
+            offsets = block_offsets(graph)
+            exons = [[[full_trans.translate(e) for e in g.exons] for g in gs]
+                     for gs in (alt_loci_genes[alt_id], main_genes[alt_id])]
+            overlap, jaccard = similarity_matrices(
+                *[[exon_segments(e, graph, offsets) for e in gene_exons]
+                  for gene_exons in exons])
+
+            for i, alt_exons in enumerate(exons[0]):
+                alt_bases = _bases(alt_exons, graph)
+                for j, main_exons in enumerate(exons[1]):
+                    main_bases = _bases(main_exons, graph)
+                    shared = len(alt_bases & main_bases)
+                    self.assertEqual(overlap[i, j], shared)
+                    self.assertAlmostEqual(
+                        jaccard[i, j], shared / len(alt_bases | main_bases))
+                    n_overlapping += shared > 0
+            self.assertEqual(best_match_histogram(jaccard).sum(),
+                             len(exons[0]))
+        self.assertGreater(n_overlapping, 0)
+
+    def test_merged_segments(self):
+        from offsetbasedgraph import Block, Graph, Interval
+        graph = Graph({"a": Block(10), "b": Block(5), "c": Block(10)},
+                      {"a": ["b", "c"], "b": ["c"]})
+        offsets = block_offsets(graph)
+        exons = [Interval(8, 2, ["a", "b"], graph), Interval(1, 4, ["b"], graph),
+                 Interval(2, 3, ["a"], graph), Interval(0, 0, ["c"], graph)]
+        starts, ends = exon_segments(exons, graph, offsets)
+        self.assertEqual(list(starts), [2, 8])
+        self.assertEqual(list(ends), [3, 14])
+        overlap, jaccard = similarity_matrices([(starts, ends)], [])
+        self.assertEqual(overlap.shape, (1, 0))
+        self.assertEqual(list(best_match_histogram(jaccard)),
+                         [1] + [0] * 9)
+
+    def test_analysis_prints_each_locus(self):
+        args = lambda: None
+        args.chrom_sizes_file_name = self.files["chrom_sizes"]
+        args.alt_locations_file_name = self.files["alt_loci"]
+        args.ncbi_alignments_dir = self.files["alignments_dir"]
+        args.genes_file_name = self.files["genes"]
+        args.interval_type = "similarity"
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            methods.analyse_multipath_genes2(args)
+        # Merging also prints
+        rows = [line.split("\t") for line in out.getvalue().split("\n")
+                if "\t" in line]
+        self.assertEqual(rows[0][:2], ["alt_locus", "alt_transcripts"])
+        rows = rows[1:]
+        self.assertEqual(len(rows), 3)
+        for row in rows:
+            self.assertEqual(sum(int(n) for n in row[5:]), int(row[1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+from offsetbasedgraph.graphutils import get_alt_loci_positions, \
+    get_gene_objects_as_intervals, create_gene_dicts
+from offsetbasedgraph.graphcreators import create_initial_grch38_graph, \
+    grch38_graph_to_numeric, merge_alt_using_cigar
+from synthetic import create_synthetic_data, random_cigar, cigar_lengths
+
+
+class TestSynthetic(unittest.TestCase):
+
+    def setUp(self):
+        self.old_dir = os.getcwd()
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+        self.files = create_synthetic_data(
+            "synthetic", n_chromosomes=2, chrom_size=100000,
+            alt_loci_per_chromosome=3, min_locus_length=1000,
+            max_locus_length=5000, overlap=0.5, cigar_operations=9,
+            genes_per_locus=2, sequence_cache_dir="data/tmp")
+
+    def tearDown(self):
+        os.chdir(self.old_dir)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_random_cigar(self):
+        cigar = random_cigar(1000, 101)
+        self.assertEqual(len(cigar), 101)
+        self.assertEqual(cigar[0][0], "M")
+        self.assertEqual(cigar[-1][0], "M")
+        self.assertEqual(cigar_lengths(cigar)[0], 1000)
+
+    def test_files_are_consistent(self):
+        sizes = {}
+        with open(self.files["chrom_sizes"]) as f:
+            for line in f:
+                name, size = line.split()
+                sizes[name] = int(size)
+
+        loci = get_alt_loci_positions(self.files["alt_loci"])
+        self.assertEqual(len(loci), 6)
+        for alt_id, info in loci.items():
+            self.assertEqual(sizes[alt_id], info["length"])
+            with open(os.path.join(self.files["alignments_dir"],
+                                   "%s.alignment" % alt_id)) as f:
+                main_start, main_end, alt_start, alt_end, cigar = \
+                    f.read().split(",")
+            self.assertEqual(int(main_start), info["start"])
+            self.assertEqual(int(main_end), info["end"])
+            self.assertEqual(int(alt_end), sizes[alt_id])
+
+        genes = get_gene_objects_as_intervals(self.files["genes"])
+        alt_loci_genes, gene_name_dict, main_genes = create_gene_dicts(
+            genes, self.files["alt_loci"])
+        for alt_id in loci:
+            self.assertEqual(len(alt_loci_genes[alt_id]), 2)
+            self.assertTrue(len(main_genes[alt_id]) >= 2)
+
+    def test_merge_alt_using_cigar_offline(self):
+        text_graph = create_initial_grch38_graph(self.files["chrom_sizes"])
+        graph, name_trans = grch38_graph_to_numeric(text_graph)
+        alt_id = [b for b in text_graph.blocks if "alt" in b][0]
+        trans, complex_graph = merge_alt_using_cigar(
+            graph, name_trans, alt_id, self.files["alignments_dir"])
+        self.assertTrue(len(complex_graph.blocks) > len(graph.blocks))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import contextlib
+import io
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from offsetbasedgraph import Graph
+from offsetbasedgraph.graphutils import create_subgraph_around_alt_locus
+import methods
+from arraytranslation import ArrayTranslation
+from synthetic import create_synthetic_data
+from visualizationlayout import LocusLayout
+from visualizehtml import VisualizeHtml
+
+
+class TestLocusLayout(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_dir = os.getcwd()
+        cls.tmp_dir = tempfile.mkdtemp()
+        os.chdir(cls.tmp_dir)
+        cls.files = files = create_synthetic_data(
+            "synthetic", n_chromosomes=2, chrom_size=100000,
+            alt_loci_per_chromosome=3, min_locus_length=1000,
+            max_locus_length=5000, overlap=0.5, cigar_operations=9,
+            genes_per_locus=2, sequence_cache_dir="data/tmp")
+        args = lambda: None
+        args.chrom_sizes_file_name = files["chrom_sizes"]
+        args.alt_locations_file_name = files["alt_loci"]
+        args.out_file_name = "graph"
+        args.segmented = False
+        methods.create_graph(args)
+        with open(files["alt_loci"]) as f:
+            cls.alt_locus = [line.split()[0] for line in f
+                             if not line.startswith("#")][1]
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.old_dir)
+        shutil.rmtree(cls.tmp_dir)
+
+    def _subgraph(self):
+        trans = methods._load_translation("graph")
+        subgraph, _, _ = create_subgraph_around_alt_locus(
+            trans.graph2, trans.copy(), self.alt_locus, 200000,
+            alt_loci_fn=self.files["alt_loci"])
+        return subgraph
+
+    def test_distances_same_as_walking_back(self):
+        subgraph = self._subgraph()
+        layout = LocusLayout.from_graph(subgraph, None)
+        for i, block in enumerate(layout.blocks):
+            length, n_blocks = 0, 0
+            while block != layout.start_block:
+                previous = subgraph.reverse_adj_list[block]
+                block = max(previous[:2], key=lambda b: subgraph.blocks[b].length())
+                length += subgraph.blocks[block].length()
+                n_blocks += 1
+            self.assertEqual(layout.distances[i], length)
+            self.assertEqual(layout.n_paddings[i], n_blocks)
+
+    def test_same_html_with_layout(self):
+        subgraph = self._subgraph()
+        levels = Graph.level_dict(subgraph.blocks)
+        layout = pickle.loads(pickle.dumps(LocusLayout.from_graph(subgraph, None)))
+        subgraph.start_block = layout.start_block
+        for width in (400, 800):
+            expected = VisualizeHtml(subgraph, 0, layout.total_length, 0, levels,
+                                     "", width, [])
+            html = VisualizeHtml(None, 0, layout.total_length, 0, None, "",
+                                 width, [], layout=layout)
+            self.assertEqual(str(html), str(expected))
+
+    def test_layout_is_cached(self):
+        args = lambda: None
+        args.translation_file_name = "graph"
+        args.genes = self.files["genes"]
+        args.alt_locations_file_name = self.files["alt_loci"]
+        args.alt_locus = self.alt_locus
+        args.cache_dir = "layout_cache"
+
+        outputs = []
+        for _ in range(2):
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                methods.visualize_alt_locus(args, True)
+            outputs.append(out.getvalue())
+        self.assertEqual(len(os.listdir("layout_cache")), 1)
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn("data-rpid", outputs[0])
+
+        # Layout is computed again when the translation file is written again
+        os.utime("graph", (0, 0))
+        with contextlib.redirect_stdout(io.StringIO()):
+            methods.visualize_alt_locus(args, True)
+        self.assertEqual(len(os.listdir("layout_cache")), 2)
+
+    def test_same_html_with_compact_translation(self):
+        ArrayTranslation.from_translation(
+            methods._load_translation("graph")).to_file("graph.arrays")
+        args = lambda: None
+        args.genes = self.files["genes"]
+        args.alt_locations_file_name = self.files["alt_loci"]
+        args.alt_locus = self.alt_locus
+        outputs = []
+        for file_name in ("graph", "graph.arrays"):
+            args.translation_file_name = file_name
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                methods.visualize_alt_locus(args, True)
+            outputs.append(out.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, \
+    ThreadPoolExecutor
+from functools import partial
+from urllib.error import HTTPError
+from urllib.request import urlopen
+from geneindex import GeneIndex, GeneLocation
+from visualizationserver import Scheduler, SchedulerBusy, create_server
+
+
+class BlockingFunction(object):
+    """Function returning its argument when released"""
+
+    def __init__(self):
+        self.calls = []
+        self.released = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, value):
+        with self._lock:
+            self.calls.append(value)
+        self.released.wait(5)
+        if value == "fail":
+            raise ValueError(value)
+        return "html for %s" % value
+
+
+def _crash_or_render(value):
+    if value == "crash":
+        os._exit(1)  # As a worker killed when out of memory
+    return "html for %s" % value
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.function = BlockingFunction()
+        self.scheduler = None
+
+    def tearDown(self):
+        self.function.released.set()
+        if self.scheduler is not None:
+            self.scheduler.shutdown()
+
+    def _scheduler(self, max_concurrent, max_queue):
+        self.scheduler = Scheduler(partial(ThreadPoolExecutor, 4), self.function,
+                                   max_concurrent, max_queue)
+        return self.scheduler
+
+    def test_identical_requests_share_computation(self):
+        scheduler = self._scheduler(2, 10)
+        futures = [scheduler.submit(("a", "genes"), "a") for _ in range(5)]
+        other = scheduler.submit(("b", "genes"), "b")
+        self.function.released.set()
+        self.assertEqual([f.result(5) for f in futures], ["html for a"] * 5)
+        self.assertEqual(other.result(5), "html for b")
+        self.assertEqual(sorted(self.function.calls), ["a", "b"])
+        metrics = scheduler.metrics.snapshot()
+        self.assertEqual(metrics["requests"], 6)
+        self.assertEqual(metrics["coalesced"], 4)
+        self.assertEqual(metrics["completed"], 2)
+
+        # Finished computations are not reused
+        self.assertEqual(scheduler.submit(("a", "genes"), "a").result(5), "html for a")
+        self.assertEqual(len(self.function.calls), 3)
+
+    def test_bounded_concurrency_and_queue(self):
+        scheduler = self._scheduler(1, 2)
+        futures = [scheduler.submit(key, key) for key in ("a", "b", "c")]
+        self.assertEqual(scheduler.metrics.running, 1)
+        self.assertEqual(scheduler.metrics.queue_depth, 2)
+        with self.assertRaises(SchedulerBusy):
+            scheduler.submit("d", "d")
+        # Requests for computations already queued are accepted
+        self.assertIs(scheduler.submit("c", "c"), futures[2])
+
+        self.function.released.set()
+        self.assertEqual([f.result(5) for f in futures],
+                         ["html for a", "html for b", "html for c"])
+        metrics = scheduler.metrics.snapshot()
+        self.assertEqual(metrics["rejected"], 1)
+        self.assertEqual(metrics["max_queue_depth"], 2)
+        self.assertEqual(metrics["queue_depth"], 0)
+        self.assertEqual(metrics["running"], 0)
+        self.assertEqual(len(scheduler.metrics.wait_times), 3)
+
+    def test_errors_given_to_all_requests(self):
+        scheduler = self._scheduler(1, 1)
+        futures = [scheduler.submit("fail", "fail") for _ in range(2)]
+        self.function.released.set()
+        for future in futures:
+            self.assertRaises(ValueError, future.result, 5)
+        self.assertEqual(scheduler.metrics.failed, 1)
+        self.assertEqual(scheduler.submit("a", "a").result(5), "html for a")
+
+    def test_crashed_worker(self):
+        self.scheduler = scheduler = Scheduler(
+            partial(ProcessPoolExecutor, 1), _crash_or_render, 1, 2)
+        futures = [scheduler.submit("crash", "crash") for _ in range(2)]
+        queued = scheduler.submit("a", "a")
+        for future in futures:
+            self.assertRaises(BrokenExecutor, future.result, 10)
+        # Queued and later computations run in a new worker process
+        self.assertEqual(queued.result(10), "html for a")
+        self.assertEqual(scheduler.submit("b", "b").result(10), "html for b")
+        self.assertEqual(scheduler.metrics.running, 0)
+        self.assertEqual(scheduler.metrics.failed, 1)
+        self.assertEqual(scheduler._in_flight, {})
+
+
+class TestServer(unittest.TestCase):
+
+    def setUp(self):
+        self.function = BlockingFunction()
+        self.function.released.set()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.index_file_name = os.path.join(self.tmp_dir, "gene_index.json")
+        GeneIndex.from_locations([GeneLocation(
+            "NM_007294", "BRCA1", "chr17_KI270909v1_alt", "chr17", 0, 10,
+            "")]).to_file(self.index_file_name)
+        self.scheduler = Scheduler(partial(ThreadPoolExecutor, 2), self.function, 1, 1)
+        self.server = create_server(self.scheduler, {"chr1_KI270762v1_alt"}, 0,
+                                    gene_index_file_name=self.index_file_name)
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.scheduler.shutdown()
+        shutil.rmtree(self.tmp_dir)
+
+    def _get(self, path):
+        with urlopen(self.url + path, timeout=5) as response:
+            return json.loads(response.read().decode("utf8"))
+
+    def test_visualize_and_metrics(self):
+        result = self._get("/visualize?alt_locus=chr1_KI270762v1_alt")
+        self.assertEqual(result, {"stdout": "html for chr1_KI270762v1_alt",
+                                  "stderr": ""})
+        metrics = self._get("/metrics")
+        self.assertEqual(metrics["requests"], 1)
+        self.assertIsNotNone(metrics["latencies"]["p50"])
+
+        with self.assertRaises(HTTPError) as e:
+            self._get("/visualize?alt_locus=../../etc")
+        self.assertEqual(e.exception.code, 404)
+
+    def test_gene_search(self):
+        result = self._get("/gene_search?prefix=brc")
+        self.assertIn("run('chr17_KI270909v1_alt')", result["stdout"])
+        self.assertEqual(self._get("/gene_search?prefix=xyz")["stdout"],
+                         "<ul class='gene_search_results'></ul>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+Layout of the visualization of the graph around an alt locus.
+
+The blocks and edges shown for an alt locus only depend on the graph, not on
+the genes shown or the width of the visualization. LocusLayout holds
+everything VisualizeHtml needs about the graph: the blocks (with length and
+level), the start block, where each block starts and the edges drawn as
+arrows (as pairs of block indexes).
+
+Positions are stored independent of the width: a block is drawn at
+
+    (distance * width / total_length) + n_paddings * padding
+
+pixels, where distance is the length (in base pairs) of the longest path
+back to the start block and n_paddings is the number of blocks on that path.
+Distances are found once for every block (reusing the distance of the block
+before it), so a visualization only scales the stored values and draws the
+genes. Layouts are stored as numpy arrays (small pickles in the DiskCache,
+see methods.visualize_alt_locus).
+"""
+
+import numpy as np
+
+
+def _longest_previous_block(graph, block):
+    # Same choice of block back as VisualizeHtml used (the longer of the
+    # first two blocks with an edge to block)
+    previous = graph.reverse_adj_list[block]
+    if len(previous) > 1 and \
+            graph.blocks[previous[1]].length() > graph.blocks[previous[0]].length():
+        return previous[1]
+    return previous[0]
+
+
+def distances_to_start(graph, start_block):
+    """
+    :return: dict{block: (base pairs, number of blocks)} on the path back
+        to start_block (choosing the longest previous block)
+    """
+    distances = {start_block: (0, 0)}
+    for block in graph.blocks:
+        path = []
+        while block not in distances:
+            path.append(block)
+            block = _longest_previous_block(graph, block)
+        length, n_blocks = distances[block]
+        for path_block in reversed(path):
+            length += graph.blocks[block].length()
+            n_blocks += 1
+            distances[path_block] = (length, n_blocks)
+            block = path_block
+    return distances
+
+
+class LocusLayout(object):
+
+    def __init__(self, blocks, lengths, levels, distances, n_paddings,
+                 edges, start_block, start_position):
+        """
+        :param blocks: Block ids (in the order they are drawn)
+        :param lengths, levels, distances, n_paddings: One value per block
+        :param edges: Array with (from, to) block index for every edge
+        :param start_position: Position on GRCh38 of the start block
+            (region path id, offset)
+        """
+        self.blocks = list(blocks)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.levels = np.asarray(levels, dtype=np.int64)
+        self.distances = np.asarray(distances, dtype=np.int64)
+        self.n_paddings = np.asarray(n_paddings, dtype=np.int64)
+        self.edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.start_block = start_block
+        self.start_position = start_position
+        self.indexes = {block: i for i, block in enumerate(self.blocks)}
+
+    @classmethod
+    def from_graph(cls, graph, start_position, levels=None, start_block=None):
+        """
+        :param graph: Subgraph around the alt locus
+        :param start_position: Position on GRCh38 of the start of the subgraph
+        :param levels: dict{block: level} (default Graph.level_dict)
+        :param start_block: Default is the first block without edges in
+        """
+        from offsetbasedgraph import Graph
+        if levels is None:
+            levels = Graph.level_dict(graph.blocks)
+        if start_block is None:
+            start_block = next((b for b in graph.blocks
+                                if len(graph.reverse_adj_list[b]) == 0), None)
+        assert start_block is not None
+
+        blocks = list(graph.blocks)
+        indexes = {block: i for i, block in enumerate(blocks)}
+        distances = distances_to_start(graph, start_block)
+        edges = [(indexes[b], indexes[edge]) for b in blocks
+                 for edge in graph.adj_list[b]]
+        return cls(blocks,
+                   [graph.blocks[b].length() for b in blocks],
+                   [levels[b] for b in blocks],
+                   [distances[b][0] for b in blocks],
+                   [distances[b][1] for b in blocks],
+                   edges, start_block,
+                   (start_position.region_path_id, start_position.offset)
+                   if start_position is not None else (None, 0))
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["indexes"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.indexes = {block: i for i, block in enumerate(self.blocks)}
+
+    @property
+    def total_length(self):
+        return int(self.lengths.sum())
+
+    def __contains__(self, block):
+        return block in self.indexes
+
+    def x_positions(self, width_ratio, padding, min_offset=0):
+        """
+        :return: Array with left pixel position of every block
+        """
+        return (self.distances - min_offset) * width_ratio + \
+            self.n_paddings * padding
+
+    def hierarchical_offsets(self, width_ratio, padding):
+        """
+        :return: Offsets on GRCh38 shown for the blocks (the distance back to
+            the start block, including padding, from the start position)
+        """
+        return self.distances + self.n_paddings * (padding / width_ratio) + \
+            self.start_position[1]
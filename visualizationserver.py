@@ -0,0 +1,283 @@
+"""
+Server for the visualizations of the web tool, with request scheduling.
+
+python_runner.php used to start one visualize_alt_locus_wrapper process for
+every request, so many users opening alt loci at the same time could start
+any number of processes. The server (visualization_server subcommand) runs
+the visualizations in a process pool in front of which a Scheduler:
+
+* Gives requests for a visualization that is being computed (same alt locus
+  and genes file) the result of that computation (single flight), instead
+  of computing it again.
+* Runs at most max_concurrent computations at a time. Other requests wait
+  in a queue of at most max_queue computations, and requests are rejected
+  (HTTP 503, python_runner.php reports that the server is busy) when the
+  queue is full.
+
+A worker process that dies (e.g. killed when out of memory) breaks a
+ProcessPoolExecutor. The requests of the computations that were running get
+an error, and the Scheduler creates a new executor for the next computations.
+
+Results are not kept after a computation is finished (the graph and layout
+of each alt locus are in the DiskCache). Number of requests, coalesced and
+rejected requests, queue depth, time waiting in the queue and latency are
+available as json at /metrics.
+
+The server also answers gene searches (html_gene_search), so that the gene
+index is only read once instead of by a new process for every search.
+
+    GET /visualize?alt_locus=chr1_KI270762v1_alt  -> {"stdout": html, "stderr": ""}
+    GET /gene_search?prefix=BRC  -> {"stdout": html, "stderr": ""}
+    GET /metrics
+"""
+
+import collections
+import json
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Future
+from functools import partial
+
+N_LATENCIES = 1000  # Latencies kept for percentiles
+
+
+class SchedulerBusy(Exception):
+    pass
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class SchedulerMetrics(object):
+
+    def __init__(self):
+        self.requests = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.running = 0
+        self.wait_times = collections.deque(maxlen=N_LATENCIES)
+        self.compute_times = collections.deque(maxlen=N_LATENCIES)
+        self.latencies = collections.deque(maxlen=N_LATENCIES)
+
+    def snapshot(self):
+        """
+        :return: dict with counts, current and max queue depth and
+            percentiles (seconds) of recent wait, compute and request times
+        """
+        d = {name: getattr(self, name) for name in
+             ("requests", "coalesced", "rejected", "completed", "failed",
+              "running", "queue_depth", "max_queue_depth")}
+        for name in ("wait_times", "compute_times", "latencies"):
+            values = list(getattr(self, name))
+            d[name] = {"p50": _percentile(values, 0.5),
+                       "p95": _percentile(values, 0.95),
+                       "max": max(values) if values else None}
+        return d
+
+
+class Scheduler(object):
+    """
+    >>> scheduler = Scheduler(create_executor, render_alt_locus, 2, 20)
+    >>> html = scheduler.submit(key, alt_locus).result()
+    """
+
+    def __init__(self, create_executor, function, max_concurrent, max_queue):
+        """
+        :param create_executor: Function returning the concurrent.futures
+            Executor the function is run in (called again if it is broken)
+        :param max_concurrent: Maximum number of computations running
+        :param max_queue: Maximum number of computations waiting
+        """
+        self.create_executor = create_executor
+        self.executor = create_executor()
+        self.function = function
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.metrics = SchedulerMetrics()
+        # Reentrant, since callbacks run at once for finished computations
+        self._lock = threading.RLock()
+        self._in_flight = {}
+        self._queue = collections.deque()
+
+    def submit(self, key, *args):
+        """
+        :param key: Requests with the same key share one computation
+        :return: Future with the result of function(*args)
+        :raises SchedulerBusy: If the queue is full
+        """
+        with self._lock:
+            self.metrics.requests += 1
+            if key in self._in_flight:
+                self.metrics.coalesced += 1
+                return self._in_flight[key]
+            if self.metrics.running >= self.max_concurrent and \
+                    len(self._queue) >= self.max_queue:
+                self.metrics.rejected += 1
+                raise SchedulerBusy("%d visualizations running and %d waiting" %
+                                    (self.metrics.running, len(self._queue)))
+            future = Future()
+            self._in_flight[key] = future
+            self._queue.append((key, args, future, time.monotonic()))
+            self._start_next()
+        return future
+
+    def shutdown(self):
+        with self._lock:
+            self.executor.shutdown(wait=False)
+
+    def _replace_executor(self, broken):
+        # Called with the lock held. Several computations fail when an
+        # executor breaks, only replace it once
+        if self.executor is broken:
+            broken.shutdown(wait=False)
+            self.executor = self.create_executor()
+
+    def _submit(self, args):
+        executor = self.executor
+        try:
+            return executor, executor.submit(self.function, *args)
+        except BrokenExecutor:
+            self._replace_executor(executor)
+            return self.executor, self.executor.submit(self.function, *args)
+
+    def _start_next(self):
+        while self.metrics.running < self.max_concurrent and self._queue:
+            key, args, future, queued = self._queue.popleft()
+            self.metrics.running += 1
+            started = time.monotonic()
+            self.metrics.wait_times.append(started - queued)
+            try:
+                executor, computation = self._submit(args)
+            except Exception as e:
+                self.metrics.running -= 1
+                self.metrics.failed += 1
+                del self._in_flight[key]
+                future.set_exception(e)
+                continue
+            computation.add_done_callback(
+                partial(self._finished, key, future, started, executor))
+        self.metrics.queue_depth = len(self._queue)
+        self.metrics.max_queue_depth = max(self.metrics.max_queue_depth,
+                                           self.metrics.queue_depth)
+
+    def _finished(self, key, future, started, executor, computation):
+        error = computation.exception()
+        with self._lock:
+            self.metrics.running -= 1
+            self.metrics.compute_times.append(time.monotonic() - started)
+            if error is None:
+                self.metrics.completed += 1
+            else:
+                self.metrics.failed += 1
+            del self._in_flight[key]
+            if isinstance(error, BrokenExecutor):
+                self._replace_executor(executor)
+        # Give the result to the requests before starting other computations
+        if error is None:
+            future.set_result(computation.result())
+        else:
+            future.set_exception(error)
+        with self._lock:
+            self._start_next()
+
+
+def render_alt_locus(alt_locus, cache_dir):
+    """
+    :return: Html from visualize_alt_locus_wrapper (run in worker process)
+    """
+    import contextlib
+    import io
+    from gen_graph_coords import create_parser
+    import methods
+    args = create_parser().parse_args(
+        ["visualize_alt_locus_wrapper", alt_locus, "--cache_dir", cache_dir])
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        methods.visualize_alt_locus_wrapper(args)
+    return out.getvalue()
+
+
+def create_server(scheduler, alt_loci, port, timeout=300, host="127.0.0.1",
+                  gene_index_file_name="data/gene_index.json"):
+    """
+    :param alt_loci: Alt locus ids that can be visualized
+    :param gene_index_file_name: Gene index used for gene searches
+    :return: ThreadingHTTPServer (call serve_forever)
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+    from methods import visualization_genes_file
+    from webtool import gene_search_html
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _reply(self, status, data, headers=()):
+            body = json.dumps(data).encode("utf8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/metrics":
+                return self._reply(200, scheduler.metrics.snapshot())
+            if url.path == "/gene_search":
+                prefix = parse_qs(url.query).get("prefix", [""])[0]
+                try:
+                    html = gene_search_html(gene_index_file_name, prefix, 20)
+                except Exception as e:
+                    return self._reply(500, {"stdout": "", "stderr": repr(e)})
+                return self._reply(200, {"stdout": html, "stderr": ""})
+            if url.path != "/visualize":
+                return self._reply(404, {"stdout": "", "stderr": "Not found"})
+
+            alt_locus = parse_qs(url.query).get("alt_locus", [""])[0]
+            if alt_locus not in alt_loci:
+                return self._reply(404, {"stdout": "", "stderr":
+                                         "Unknown alt locus %s" % alt_locus})
+            start = time.monotonic()
+            try:
+                future = scheduler.submit(
+                    (alt_locus, visualization_genes_file(alt_locus)), alt_locus)
+                html = future.result(timeout)
+            except SchedulerBusy as e:
+                return self._reply(503, {"stdout": "", "stderr": str(e)},
+                                   [("Retry-After", "5")])
+            except Exception as e:
+                return self._reply(500, {"stdout": "", "stderr": repr(e)})
+            scheduler.metrics.latencies.append(time.monotonic() - start)
+            self._reply(200, {"stdout": html, "stderr": ""})
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def visualization_server(args):
+    from concurrent.futures import ProcessPoolExecutor
+    from webtool import read_alt_loci_positions
+    alt_loci = set(read_alt_loci_positions(args.alt_locations_file_name))
+    scheduler = Scheduler(partial(ProcessPoolExecutor, args.max_concurrent),
+                          partial(render_alt_locus, cache_dir=args.cache_dir),
+                          args.max_concurrent, args.max_queue)
+    server = create_server(scheduler, alt_loci, args.port, args.timeout,
+                           gene_index_file_name=args.index_file_name)
+    print("Serving visualizations on port %d (%d concurrent, queue of %d)" % (
+        server.server_address[1], args.max_concurrent, args.max_queue))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        scheduler.shutdown()
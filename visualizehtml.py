@@ -9,7 +9,11 @@ class VisualizeHtml(object):
     Attempt to make a simple html visualization
     """
 
-    def __init__(self, graph, minOffset, maxOffset, id, levels, description='', width=800, genes=[], start_position=None, trans=None):
+    def __init__(self, graph, minOffset, maxOffset, id, levels, description='', width=800, genes=[], start_position=None, trans=None, layout=None):
+        """
+        :param layout: LocusLayout of graph (see visualizationlayout.py).
+            Created from graph, levels and graph.start_block if None
+        """
 
 
         self.padding = 50  # Gap between blocks
@@ -34,6 +38,11 @@ class VisualizeHtml(object):
         self.levels = levels
         self.trans = trans
         self.start_position = start_position
+        if layout is None:
+            from visualizationlayout import LocusLayout
+            layout = LocusLayout.from_graph(graph, start_position, levels,
+                                            getattr(graph, "start_block", None))
+        self.layout = layout
 
         self.width = width
         self.maxOffset = maxOffset
@@ -111,7 +120,7 @@ class VisualizeHtml(object):
         self.html_blocks = {}  # Dict with blocks as keys. Includes only html for block
         self.html_intervals = {}  # Html for all genes. Key is blocks and interval number
         self.html_exons = {}   # Neste dict, key is block and interval
-        for b in self.graph.blocks:
+        for b in self.layout.blocks:
             self.html_intervals[b] = {}
             self.html_exons[b] = {}
 
@@ -212,10 +221,9 @@ class VisualizeHtml(object):
         self.exon_cnt += 1
         block = interval.region_paths[0]
         #print(interval)
-        if block not in self.graph.blocks:
+        if block not in self.layout:
             return
 
-        assert(block in self.graph.blocks)
         # Find parent interval start in this
         parent_start = 0
         if parent_interval.start_position.region_path_id == block:
@@ -323,33 +331,31 @@ class VisualizeHtml(object):
             self.html_exons[block][self.gene_counter] += html + "</div>"
 
 
-    def _coordinate(self, rp):
+    def _coordinate(self, i, hier_offset):
         """
-        Returns the hierarhcial and sequential coordinates of a region path
+        Returns the hierarhcial and sequential coordinates of block i in the layout
         """
-
-        length = self.graph.blocks[rp].length()
-        # Translate rp back to get GRCh38 hier. coordinates
-        from offsetbasedgraph import Interval, Graph
+        from offsetbasedgraph import Graph
+        layout = self.layout
+        rp = layout.blocks[i]
 
         hier_id = str(rp)
         hier_of = 0
 
         origin = Graph.block_origin(rp)
         if origin == "main" or origin == "merged":
-            dist_back = self._distance_to_start(rp)
-            hier_id = self.start_position.region_path_id
-            hier_of = dist_back + self.start_position.offset
+            hier_id = layout.start_position[0]
+            hier_of = float(hier_offset)
+            if layout.n_paddings[i] == 0:
+                hier_of = int(layout.distances[i]) + layout.start_position[1]
 
-        return (str(rp), "0", str(hier_id), str(hier_of), str(length))
+        return (str(rp), "0", str(hier_id), str(hier_of), str(layout.lengths[i]))
 
-    def _plot(self, xstart, xend, level, color, rp_id):
+    def _plot(self, x, width, level, color, rp_id, coordinate):
 
         html = ""
 
         y = self.block_height * 2 * ( level + 1)
-        x = self.gap_pixels + (xstart - self.minOffset) * self.width_ratio
-        width = (xend - xstart) * self.width_ratio
 
         html += "<div class='block' style='position: absolute;"
         html += "left: %.2fpx;" % x
@@ -361,10 +367,10 @@ class VisualizeHtml(object):
         html += " data-rpid='%s'" % (rp_id)
         html += " data-rpname='%s'" % (self._pretty_alt_loci_name(rp_id))
         html += " data-graph-id='%d'" % (self.vis_id)
-        html += " data-coordinate='%s'" % ','.join(self._coordinate(rp_id))
+        html += " data-coordinate='%s'" % ','.join(coordinate)
         html += ">"
 
-        return x + width, y, width, x, html
+        return y, html
 
 
     def _plot_level(self, block):
@@ -390,10 +396,6 @@ class VisualizeHtml(object):
 
 
 
-    def _scale(self, n):
-        return n
-        return np.log(n+1)
-
     def _plot_arrow(self, xstart, ystart, xend, yend):
         """ Plots and arrow
         """
@@ -435,72 +437,28 @@ class VisualizeHtml(object):
 
         self.html_arrows += "</div>"
 
-    def _get_longest_previous_block(self, block):
-        back_block = block
-        g = self.graph
-        if len(g.reverse_adj_list[back_block]) > 1 and \
-                g.blocks[g.reverse_adj_list[back_block][1]].length() > \
-                g.blocks[g.reverse_adj_list[back_block][0]].length():
-            back_block = g.reverse_adj_list[back_block][1]
-        else:
-            back_block = g.reverse_adj_list[back_block][0]
-
-        return back_block
-
-    def _distance_to_start(self, b):
-        # Find distance back to start
-        g = self.graph
-
-        if b == g.start_block:
-            return 0
-        back_block = self._get_longest_previous_block(b)
-        #print("Finding back for %s" % b)
-        distance = 0
-        while True:
-            block_size = self._scale(g.blocks[back_block].length())
-            distance += self.padding / self.width_ratio + block_size
-            if back_block == g.start_block:
-                break
-
-            # Choose longest path back
-            back_block = self._get_longest_previous_block(back_block)
-
-        return distance
-
     def visualize_v2(self):
-        # Try to visualize more complex graphs
-        block = self.graph.start_block #self.graph.blocks[self.graph.start_block]
-        #self.offset_counter = self._scale(list(block.linear_references.values())[0].start)
-        self.offset_counter = self._scale(0)
-
+        # Block positions and arrows from the layout, scaled to the width
+        layout = self.layout
+        xs = self.gap_pixels + layout.x_positions(self.width_ratio, self.padding,
+                                                  self.minOffset)
+        hier_offsets = layout.hierarchical_offsets(self.width_ratio, self.padding)
+        widths = layout.lengths * self.width_ratio
 
         # Find x position of all blocks
         self.block_positions = {}
-        for b in self.graph.blocks:
-            start = self._distance_to_start(b)
-            end = start + self._scale(self.graph.blocks[b].length())
-
-            # Plot rp
-            xend, y, width, xstart, html = self._plot(start, end, self.levels[b], self.colors[self.levels[b] + 1], b)
+        for i, b in enumerate(layout.blocks):
+            level = int(layout.levels[i])
+            y, html = self._plot(xs[i], widths[i], level, self.colors[level + 1], b,
+                                 self._coordinate(i, hier_offsets[i]))
             self.html_blocks[b] = html
-
-            self.block_positions[b] = (xstart, y, width)
-            #print("<p>PLotted %s at %d,%d with width %d, ending at %d</p>" % (b, xstart, y, width, xend))
-
+            self.block_positions[b] = (xs[i], y, widths[i])
 
         # Plot arrows using all edges
-        g = self.graph
-        for b in g.blocks:
-            for edge in self.graph.adj_list[b]:
-                length = g.blocks[b].length()
-                xstart = self.block_positions[b][0] + self._scale(length) * self.width_ratio
-                ystart = self.block_positions[b][1]
-                xend = self.block_positions[edge][0]
-                yend = self.block_positions[edge][1]
-                self._plot_arrow(xstart, ystart, xend, yend)
-
-
-        return
+        for i, j in layout.edges:
+            ystart = self.block_positions[layout.blocks[i]][1]
+            yend = self.block_positions[layout.blocks[j]][1]
+            self._plot_arrow(xs[i] + widths[i], ystart, xs[j], yend)
 
     def __str__(self):
         html = self.html
@@ -34,6 +34,28 @@ if(isset($_GET["method"])){
 	}
 	$arguments = htmlspecialchars($arguments);
 
+	// Visualizations are run by the visualization server (visualization_server
+	// subcommand) if it is running, which limits the number of computations.
+	// Gene searches are also run by the server, which reads the gene index once.
+	// A process is only started if the server is not running (connection
+	// refused), not if the server is slow to answer
+	$server_paths = array("visualize_alt_locus_wrapper" => "/visualize?alt_locus=",
+						  "html_gene_search" => "/gene_search?prefix=");
+	if(isset($server_paths[$method])){
+		$socket = @fsockopen("127.0.0.1", 8095, $errno, $errstr, 2);
+		if($socket !== FALSE){
+			fclose($socket);
+			// Longer than the --timeout (300 s) the server waits for a visualization
+			$context = stream_context_create(array("http" => array("ignore_errors" => true, "timeout" => 330)));
+			$response = @file_get_contents("http://127.0.0.1:8095" . $server_paths[$method] . urlencode($arguments),
+										   false, $context);
+			if($response === FALSE){
+				$response = json_encode(array("stdout" => "", "stderr" => "No response from the visualization server"));
+			}
+			exit($response);
+		}
+	}
+
 	//echo "<p>Arguments: " . $arguments . "</p>";
 	//$command = "python3.4 /home/ivarandknut/checkout_genomic_intervals/interface.py $method $arguments";
 	//$command = "python3 /home/ivarandknut/python-projects/OffsetBasedGraph/examples/gene_experiment.py $method $arguments";
@@ -0,0 +1,75 @@
+"""
+Light-weight methods used by the web tool (web-gui). These are run on every
+web request, so this module should not import offsetbasedgraph or numpy.
+"""
+
+import html
+from collections import OrderedDict
+
+
+def read_alt_loci_positions(alt_loci_file_name):
+    """
+    Same as offsetbasedgraph.graphutils.get_alt_loci_positions,
+    without importing offsetbasedgraph
+
+    :returns: dict{alt_loci_id: info (dict)}
+    """
+    alt_loci = {}
+    with open(alt_loci_file_name) as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            l = line.split()
+            alt_loci[l[0]] = {
+                "main_chr": l[1],
+                "start": int(l[2]),
+                "end": int(l[3]),
+                "length": int(l[4])
+            }
+    return alt_loci
+
+
+def html_alt_loci_select(args):
+    # Prints all regions as an html select field
+    html_out = """<select name='region'
+               class='form-control' style='width: 320px;'>"""
+    loci = read_alt_loci_positions("data/grch38_alt_loci.txt")
+    loci = OrderedDict(sorted(loci.items(), key=lambda t: t[0]))
+
+    for locus in loci:
+        region = loci[locus]
+        if region["end"] - region["start"] < 40000000000:
+            html_out += "<option value='%s'>%s (%s:%d-%d)</option>" % \
+                        (locus,
+                         locus,
+                         region["main_chr"], \
+                         region["start"], region["end"])
+    html_out += "</select>"
+    print(html_out)
+
+
+def gene_search_html(index_file_name, prefix, limit):
+    # Returns genes with names starting with prefix as html links
+    # to the alt loci they are on or parallel to
+    from geneindex import load_gene_index
+    index = load_gene_index(index_file_name)
+    html_out = "<ul class='gene_search_results'>"
+    for gene in index.search(prefix, limit=limit):
+        # Names come from the genes file, so they are escaped. The alt locus
+        # is escaped as a javascript string before escaping it as html
+        js_alt_locus = gene.alt_locus.replace("\\", "\\\\").replace("'", "\\'")
+        name = html.escape(gene.name)
+        if gene.name2:
+            name += " (%s)" % html.escape(gene.name2)
+        html_out += "<li><a href='javascript:void(0);' onclick=\"run('%s');\">" \
+                    "%s on %s</a></li>" % \
+                    (html.escape(js_alt_locus), name,
+                     html.escape(gene.alt_locus))
+    html_out += "</ul>"
+    return html_out
+
+
+def html_gene_search(args):
+    # The web tool runs the search in the visualization server if it is
+    # running (see visualizationserver.py), where the index is only read once
+    print(gene_search_html(args.index_file_name, args.prefix, args.limit))